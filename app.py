@@ -1,13 +1,27 @@
 import streamlit as st
 import os
-import re
-import requests
-from typing import List
-from apify_client import ApifyClient
-from openai import OpenAI
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
 import streamlit.components.v1 as components
-import markdown
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import html
+from yt.cache import get_response_cache, response_cache_key
+from yt.chunking import CHARS_PER_TOKEN, split_transcript
+from yt.chat import CHAT_MODE, chat_history_for
+from yt.catalog import describe_model, fetch_model_context_lengths, fetch_openrouter_models, get_model_catalog
+from yt.library import TRANSCRIPT_LIBRARY, get_transcript_library
+from yt.jobs import coalesced_summary, get_job_queue, get_single_flight
+from yt.llm import DEFAULT_MODEL, HEDGE_DELAY_SECONDS
+from yt.metrics import get_metrics
+from yt.compression import format_budget_report
+from yt.pipeline import BATCH_STATUS_ICONS, BatchRun, answer_variant, generate_answer, parse_url_list, prepare_source
+from yt.segments import get_transcript_segments, link_timestamps
+from yt.store import deep_size, get_stored_transcript, get_transcript_store, store_transcript, transcript_digest
+from yt.summarize import SummaryError, answer_in_chat, summarize_long_text
+from yt.transcripts import cached_transcript, extract_video_id, load_transcript
 
 # Load environment variables from .env file if it exists
 try:
@@ -159,8 +173,33 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+PARTIAL_RERUNS = os.getenv("PARTIAL_RERUNS", "true").lower() in ("1", "true", "yes")
+RENDERED_HTML_CACHE_ENTRIES = int(os.getenv("RENDERED_HTML_CACHE_ENTRIES", 64))
+
+
+def partial_rerun(fn):
+    """Let widgets inside ``fn`` rerun only ``fn`` instead of the whole page (Streamlit 1.33+)"""
+    fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    return fragment(fn) if PARTIAL_RERUNS and fragment else fn
+
+
+@st.cache_data(max_entries=RENDERED_HTML_CACHE_ENTRIES, show_spinner=False)
+def render_markdown(text: str) -> str:
+    """Answer markdown as HTML, shared by every session showing the same (e.g. cached) answer"""
+    # Imported on first use so a page load that never shows an answer does not pay for it
+    import markdown
+
+    return markdown.markdown(text, extensions=['tables'])
+
+
 def render_copyable_block(content_html: str, block_id: str, height: int = 400, scrolling: bool = False) -> None:
     """Render a styled block with a copy button."""
+    components.html(copyable_block_html(content_html, block_id, height, scrolling), height=height, scrolling=scrolling)
+
+
+@st.cache_data(max_entries=RENDERED_HTML_CACHE_ENTRIES, show_spinner=False)
+def copyable_block_html(content_html: str, block_id: str, height: int, scrolling: bool) -> str:
+    """HTML document for a copyable block; reruns reuse it instead of formatting it again"""
     container_styles = ["padding-right: 40px;"]
     if scrolling:
         max_height = max(height - 40, 200)
@@ -173,6 +212,7 @@ def render_copyable_block(content_html: str, block_id: str, height: int = 400, s
     container_style_attr = " ".join(container_styles)
 
     html_content = f"""
+<base target="_blank">
 <div style="position: relative;">
     <div class="success-message" id="{block_id}" style="{container_style_attr}">
         {content_html}
@@ -199,7 +239,7 @@ function copyBlock(blockId) {{
 }}
 </script>
     """
-    components.html(html_content, height=height, scrolling=scrolling)
+    return html_content
 
 
 def format_transcript_html(transcript_text: str) -> str:
@@ -208,15 +248,22 @@ def format_transcript_html(transcript_text: str) -> str:
     return f"<pre style='white-space: pre-wrap; margin: 0; font-family: -apple-system, BlinkMacSystemFont, sans-serif;'>{safe_text}</pre>"
 
 
+TRANSCRIPT_HISTORY_MAX_ENTRIES = int(os.getenv("TRANSCRIPT_HISTORY_MAX_ENTRIES", 10))
+TRANSCRIPT_HTML_CACHE_ENTRIES = 3
+CHAT_HISTORY_MAX_ENTRIES = int(os.getenv("CHAT_HISTORY_MAX_ENTRIES", 50))
+
+
 def update_transcript_history(url: str, transcript: str, title: str, channel: str, date: str) -> None:
-    """Keep a single transcript entry per YouTube URL."""
+    """Keep a single transcript entry per YouTube URL, evicting the oldest beyond the cap."""
     if not transcript:
         return
 
+    # The session keeps only the store key; the text itself is held once per video for all sessions
     history = st.session_state.get('transcript_history', [])
     entry = {
         "url": url,
-        "transcript": transcript,
+        "key": store_transcript(url, transcript),
+        "digest": transcript_digest(transcript),
         "title": title or "YouTube Video",
         "channel": channel or "Unknown Channel",
         "date": date
@@ -224,14 +271,65 @@ def update_transcript_history(url: str, transcript: str, title: str, channel: st
 
     for idx, item in enumerate(history):
         if item["url"] == url:
+            if item.get("digest") != entry["digest"]:
+                st.session_state.get('transcript_html_cache', {}).pop(url, None)
             history[idx] = entry
             break
     else:
         history.append(entry)
 
+    html_cache = st.session_state.get('transcript_html_cache', {})
+    while len(history) > TRANSCRIPT_HISTORY_MAX_ENTRIES:
+        html_cache.pop(history.pop(0)["url"], None)
+
     st.session_state.transcript_history = history
 
 
+def transcript_pages_html(url: str, transcript_text: str) -> List[str]:
+    """Escaped HTML for each page of a transcript, kept for the few most recently opened entries"""
+    cache = st.session_state.setdefault('transcript_html_cache', OrderedDict())
+    if url in cache:
+        cache.move_to_end(url)
+        return cache[url]
+
+    pages = split_transcript(transcript_text, TRANSCRIPT_PAGE_CHARS // CHARS_PER_TOKEN) if transcript_text else [""]
+    cache[url] = [format_transcript_html(page) for page in pages]
+    while len(cache) > TRANSCRIPT_HTML_CACHE_ENTRIES:
+        cache.popitem(last=False)
+    return cache[url]
+
+
+def remember_chat_answer(question: str, answer: str) -> None:
+    """Append a Q&A pair (as markdown, not rendered HTML), dropping the oldest beyond the cap"""
+    st.session_state.chat_history.append({
+        'question': question,
+        'answer': answer,
+        'timestamp': st.session_state.get('chat_count', 0) + 1
+    })
+    st.session_state.chat_count = st.session_state.get('chat_count', 0) + 1
+    del st.session_state.chat_history[:-CHAT_HISTORY_MAX_ENTRIES]
+
+
+def session_memory_report() -> Dict[str, int]:
+    """Approximate bytes held by each session state key, largest first"""
+    sizes = {key: deep_size(value) for key, value in st.session_state.items()}
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+def format_hedge_report(report: Dict[str, object]) -> str:
+    """One-line summary of which model won a hedged request and what each attempt saw"""
+    details = []
+    for attempt in report["attempts"]:
+        timing = f"first token {attempt['first_token_seconds']}s" if attempt["first_token_seconds"] is not None else f"{attempt['seconds']}s"
+        details.append(f"{attempt['model']}: {attempt['outcome']} ({timing})")
+    return f"🏁 Answered by {report['model']} — " + "; ".join(details)
+
+
+TRANSCRIPT_PAGE_CHARS = 20000
+TRANSCRIPT_CHARS_PER_LINE = 90
+
+
+@partial_rerun
 def display_transcript_history_section() -> None:
     """Render collapsible transcript blocks with copy buttons."""
     history = st.session_state.get('transcript_history', [])
@@ -249,311 +347,179 @@ def display_transcript_history_section() -> None:
 
         with st.expander(subtitle, expanded=False):
             st.markdown(f"[Open on YouTube]({entry.get('url')})")
-            transcript_text = entry.get("transcript", "")
-            lines = transcript_text.count('\n') + 1 if transcript_text else 1
+            # Collapsed expanders still run their body, so the heavy block waits for this toggle
+            if not st.toggle("Show transcript", key=f"show_transcript_{entry.get('url')}"):
+                continue
+
+            transcript_text = get_stored_transcript(entry["key"])
+            if transcript_text is None:
+                st.caption("⚠️ This transcript is no longer cached. Submit the video again to reload it.")
+                continue
+            pages = transcript_pages_html(entry.get("url"), transcript_text)
+            page = 0
+            if len(pages) > 1:
+                page = st.number_input(f"Page (of {len(pages)})", min_value=1, max_value=len(pages), key=f"transcript_page_{entry.get('url')}") - 1
+                st.download_button("Download full transcript", transcript_text, file_name=f"{title}.txt", key=f"transcript_download_{entry.get('url')}")
+
+            # Cleaned transcripts are one long line, so estimate wrapped lines from the page length
+            page_chars = len(transcript_text) if len(pages) == 1 else TRANSCRIPT_PAGE_CHARS
+            lines = max(transcript_text.count('\n') + 1, page_chars // TRANSCRIPT_CHARS_PER_LINE + 1)
             base_height = min(600, 120 + lines * 18)
             scrolling = lines > 35
-            transcript_html = format_transcript_html(transcript_text)
-            render_copyable_block(transcript_html, f"transcript-{idx}", height=base_height, scrolling=scrolling)
-
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def fetch_openrouter_models(api_key: str) -> List[str]:
-    """Fetch free/low-cost models from OpenRouter API for Google, DeepSeek, and Qwen vendors"""
-    url = "https://openrouter.ai/api/v1/models"
-    headers = {"Authorization": f"Bearer {api_key}"}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        vendors = ["google", "deepseek", "qwen"]  # Gemini (google), Deepseek, Qwen (includes Qwen3 variants)
-
-        # First try to get completely free models
-        free_models = [
-            model["id"] for model in data["data"]
-            if any(vendor in model["id"].lower() for vendor in vendors)
-            and model.get("pricing", {}).get("prompt") == "0"
-            and model.get("pricing", {}).get("completion") == "0"
-        ]
-
-        # If no free models, include very low-cost models (under $0.001 per token)
-        if not free_models:
-            low_cost_models = [
-                model["id"] for model in data["data"]
-                if any(vendor in model["id"].lower() for vendor in vendors)
-                and model.get("pricing", {}).get("prompt", "0") != "0"
-                and model.get("pricing", {}).get("completion", "0") != "0"
-                and float(model.get("pricing", {}).get("prompt", "0") or "0") < 0.001
-                and float(model.get("pricing", {}).get("completion", "0") or "0") < 0.001
-            ]
-            return low_cost_models
-
-        return free_models
-    return []
-
-def extract_transcript_apify(youtube_url):
-        """Extract transcript, video title, and channel name from YouTube video using Apify"""
-        try:
-            # Initialize the ApifyClient with API token from environment variable
-            api_token = os.getenv("APIFY_API_TOKEN")
-            client = ApifyClient(api_token)
-
-            # Prepare the Actor input
-            run_input = {
-                "startUrls": [youtube_url],
-                "language": "Default",
-                "includeTimestamps": "No",
-            }
-
-            # Run the Actor and wait for it to finish
-            run = client.actor("dB9f4B02ocpTICIEY").call(run_input=run_input)
-
-            # Check if the run was successful
-            if not run or not run.get("defaultDatasetId"):
-                st.error("❌ Apify actor failed to process the video.")
-                return None, None, None
-
-            # Fetch and process results
-            transcript_text = ""
-            video_title = None
-            channel_name = None
-            video_date = None
-
-            for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                # Extract video title if available
-                if 'videoTitle' in item and item['videoTitle']:
-                    video_title = item['videoTitle']
-
-                # Extract channel name if available
-                if 'channelName' in item and item['channelName']:
-                    channel_name = item['channelName']
-
-                # Extract video date if available
-                if 'videoDate' in item and item['videoDate']:
-                    video_date = item['videoDate']
-
-                # Extract transcript content
-                if 'transcript' in item and item['transcript']:
-                    transcript_text += item['transcript'] + "\n"
-                elif 'text' in item and item['text']:
-                    transcript_text += item['text'] + "\n"
-
-            if not transcript_text.strip():
-                st.error("❌ No transcript found in the video.")
-                return None, video_title or "YouTube Video", channel_name or "Unknown Channel", video_date
-
-            return transcript_text, video_title or "YouTube Video", channel_name or "Unknown Channel", video_date
-
+            render_copyable_block(pages[page], f"transcript-{idx}", height=base_height, scrolling=scrolling)
+
+
+def get_session_transcript(youtube_url):
+    """Return this session's transcript tuple if it is for the same video, else None"""
+    # Check if we have cached data for this video (any URL form of it)
+    video_id = extract_video_id(youtube_url)
+    cached_info = st.session_state.cached_video_info
+    if (cached_info and
+        (cached_info.get('url') == youtube_url or (video_id and cached_info.get('video_id') == video_id))):
+        # An evicted transcript returns None, so the caller simply loads it again
+        transcript = get_stored_transcript(cached_info['key'])
+        if transcript:
+            return (transcript,
+                    cached_info['title'],
+                    cached_info['channel'],
+                    cached_info['date'])
+    return None
+
+
+def remember_session_transcript(youtube_url, result) -> None:
+    """Make a freshly loaded transcript the session's current video"""
+    transcript, title, channel, date = result
+    st.session_state.cached_video_info = {
+        'url': youtube_url,
+        'key': store_transcript(youtube_url, transcript),
+        'video_id': extract_video_id(youtube_url),
+        'title': title,
+        'channel': channel,
+        'date': date
+    }
 
-        except Exception as e:
-            st.error(f"❌ Error extracting transcript: {str(e)}")
-            return None, "YouTube Video", "Unknown Channel", None
 
+JOB_POLL_INTERVAL_SECONDS = 1.0
+
+
+def display_batch_section(api_key: Optional[str]) -> None:
+    """Batch tab: summarize a list of videos concurrently and show results as they finish"""
+    with st.form("batch_form"):
+        urls_text = st.text_area(
+            "YouTube URLs",
+            placeholder="Paste one YouTube link per line...",
+            height=160
+        )
+        batch_question = st.text_input(
+            "Question for every video (Optional)",
+            placeholder="Leave empty to summarize each video"
+        )
+        run_clicked = st.form_submit_button("Summarize all", type="primary")
+
+    if run_clicked:
+        urls = parse_url_list(urls_text)
+        invalid = [url for url in urls if not extract_video_id(url)]
+        urls = [url for url in urls if extract_video_id(url)]
+        if invalid:
+            st.warning(f"⚠️ Skipping {len(invalid)} link(s) that are not YouTube videos.")
+        if not urls:
+            st.error("⚠️ Please enter at least one valid YouTube URL")
+            return
 
-def summarize_text(text, model="google/gemini-2.0-flash-exp:free", video_title=None, channel_name=None, video_date=None, custom_prompt=None, available_models=None):
-        """Summarize text using OpenRouter API with automatic model switching on rate limits"""
+        available_models = fetch_openrouter_models(api_key) if api_key else []
+        context_lengths = fetch_model_context_lengths(api_key) if api_key else {}
         try:
-            # Get API key from environment
-            api_key = os.getenv("OPENROUTER_API_KEY")
-            if not api_key:
-                st.error("❌ OpenRouter API key not found. Please set the OPENROUTER_API_KEY environment variable.")
-                return None
-
-            # Initialize OpenRouter client
-            client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=api_key,
-            )
-
-            # Prepare the prompt
-            if custom_prompt and custom_prompt.strip():
-                # Use custom prompt with transcript context
-                if video_title and channel_name:
-                    prompt = f"""You are analyzing a YouTube video from the channel "{channel_name}" titled: "{video_title}"
-
-Transcript:
-{text}
-
-User Question: {custom_prompt.strip()}"""
-                elif video_title:
-                    prompt = f"""You are analyzing a YouTube video titled: "{video_title}"
-
-Transcript:
-{text}
-
-User Question: {custom_prompt.strip()}"""
-                else:
-                    prompt = f"""Transcript:
-{text}
-
-User Question: {custom_prompt.strip()}"""
-            else:
-                # Use default summarization prompts
-                if video_title and channel_name:
-                    prompt = f"""You are analyzing a YouTube video from the channel "{channel_name}" titled: "{video_title}"
-
-Please provide a concise summary of the following transcript:
-
-{text}
-
-Create a clear summary that captures the main points and key information."""
-                elif video_title:
-                    prompt = f"""You are analyzing a YouTube video titled: "{video_title}"
-
-Please provide a concise summary of the following transcript:
-
-{text}
-
-Create a clear summary that captures the main points and key information."""
-                else:
-                    prompt = f"""Please provide a concise summary of the following transcript:
-
-{text}
-
-Create a clear summary that captures the main points and key information."""
-
-            if custom_prompt and custom_prompt.strip():
-                spinner_text = "Answering your question..."
-            else:
-                spinner_text = "Generating summary..."
-
-            # Try models in order if rate limited
-            models_to_try = [model]
-            if available_models and model in available_models:
-                # Add other available models as fallbacks
-                for fallback_model in available_models:
-                    if fallback_model != model and fallback_model not in models_to_try:
-                        models_to_try.append(fallback_model)
-
-            for attempt, current_model in enumerate(models_to_try):
-                try:
-                    with st.spinner(f"{spinner_text} (trying {current_model})" if attempt > 0 else spinner_text):
-                        completion = client.chat.completions.create(
-                            model=current_model,
-                            messages=[
-                                {
-                                    "role": "user",
-                                    "content": prompt
-                                }
-                            ]
-                        )
-
-                        if not completion or not completion.choices:
-                            if attempt < len(models_to_try) - 1:
-                                st.warning(f"⚠️ Model {current_model} did not return a valid response. Trying next model...")
-                                continue
-                            else:
-                                st.error("❌ All models failed to return a valid response. Please try again later.")
-                                return None
-
-                        summary = completion.choices[0].message.content.strip()
-                        if summary:
-                            if attempt > 0:
-                                st.success(f"✅ Successfully used {current_model} after {current_model} failed!")
-                            return summary
-                        else:
-                            if attempt < len(models_to_try) - 1:
-                                st.warning(f"⚠️ Model {current_model} returned empty response. Trying next model...")
-                                continue
-                            else:
-                                return "Summary could not be generated."
-
-                except Exception as e:
-                    error_str = str(e)
-                    
-                    # Handle rate limit errors (429)
-                    if "429" in error_str or "rate" in error_str.lower():
-                        if attempt < len(models_to_try) - 1:
-                            st.warning(f"⚠️ Model {current_model} is rate limited. Trying next model...")
-                            continue
-                        else:
-                            st.error("❌ All models are currently rate limited. Please try again later.")
-                            return None
-                    
-                    # Handle 404 errors
-                    elif "404" in error_str and "data policy" in error_str.lower():
-                        if attempt < len(models_to_try) - 1:
-                            st.warning(f"⚠️ Model {current_model} has data policy restrictions. Trying next model...")
-                            continue
-                        else:
-                            st.error("❌ All models have data policy restrictions. Please try again later.")
-                            return None
-                    elif "404" in error_str:
-                        if attempt < len(models_to_try) - 1:
-                            st.warning(f"⚠️ Model {current_model} not found. Trying next model...")
-                            continue
-                        else:
-                            st.error("❌ All models not found or not available.")
-                            return None
-                    else:
-                        if attempt < len(models_to_try) - 1:
-                            st.warning(f"⚠️ Model {current_model} failed: {error_str}. Trying next model...")
-                            continue
-                        else:
-                            st.error(f"❌ All models failed. Last error: {error_str}")
-                            return None
-
-            return None
-
-        except Exception as e:
-            st.error(f"❌ Unexpected error: {str(e)}")
-            return None
-
-
-
-
-
-def extract_transcript_and_title(youtube_url):
-    """Extract transcript from YouTube video using Apify and get video title and channel"""
-    try:
-        # Extract transcript, title, channel, and date using Apify
-        result = extract_transcript_apify(youtube_url)
-        if not result or not result[0]:
-            video_title = result[1] if result and len(result) > 1 else "YouTube Video"
-            channel_name = result[2] if result and len(result) > 2 else "Unknown Channel"
-            video_date = result[3] if result and len(result) > 3 else None
-            return None, video_title, channel_name, video_date
+            batch = BatchRun(urls, st.session_state.selected_model, batch_question, available_models, context_lengths)
+        except SummaryError as e:
+            st.error(f"❌ {str(e)}")
+            return
 
-        transcript_text, video_title, channel_name, video_date = result
+        st.session_state.batch_results = []
+        progress_bar = st.progress(0)
+        status_area = st.empty()
+        results_area = st.container()
+        pending = set(batch.futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                st.session_state.batch_results.append(result)
+                with results_area:
+                    display_batch_result(result)
+
+            finished = len(batch.futures) - len(pending)
+            progress_bar.progress(finished / len(batch.futures), text=f"{finished} of {len(batch.futures)} videos finished")
+            status_area.markdown("\n".join(
+                f"- {BATCH_STATUS_ICONS[status]} {status.capitalize()} — {url}"
+                for url, status in batch.statuses.items()
+                if status not in ("done", "failed")
+            ))
+
+        status_area.empty()
+        return
 
-        # Clean up the transcript text (remove extra whitespace)
-        transcript = re.sub(r'\s+', ' ', transcript_text).strip()
+    for result in st.session_state.get('batch_results', []):
+        display_batch_result(result)
 
-        if not transcript:
-            return None, video_title, channel_name, video_date
 
-        return transcript, video_title, channel_name, video_date
+def display_batch_result(result: Dict[str, Optional[str]]) -> None:
+    """Render one finished batch item"""
+    title = result.get("title") or result["url"]
+    channel = result.get("channel") or "Unknown Channel"
+    icon = BATCH_STATUS_ICONS[result["status"]]
+    with st.expander(f"{icon} {title} — {channel}", expanded=False):
+        st.markdown(f"[Open on YouTube]({result['url']})")
+        if result.get("error"):
+            st.markdown(f'<div class="error-message">❌ {html.escape(result["error"])}</div>', unsafe_allow_html=True)
+        else:
+            st.markdown(result["summary"])
+
+
+@partial_rerun
+def display_library_section() -> None:
+    """Library tab: search every transcript extracted so far and open one without extracting it again"""
+    library = get_transcript_library()
+    query = st.text_input(
+        "Search transcripts",
+        placeholder='e.g. gradient descent "learning rate" optim*',
+        key='library_query',
+        help='Every word and "quoted phrase" must appear in the title, channel or transcript; end a word with * to match a prefix.'
+    )
+    results = library.search(query) if query.strip() else library.recent()
+    stats = library.stats()
+    st.caption(
+        f"{stats['entries']} video(s) in the library ({stats['bytes'] / 1024 / 1024:.1f} MB). "
+        + ("Best matches first." if query.strip() else "Most recently extracted first.")
+    )
+    if query.strip() and not results:
+        st.info("No transcripts match that search.")
+
+    for result in results:
+        st.markdown(f"**[{result['title'] or result['url']}]({result['url']})** — {result['channel'] or 'Unknown Channel'}")
+        if result['snippet']:
+            # Dollar signs in speech would otherwise be read as LaTeX
+            st.caption(result['snippet'].replace("$", "\\$"))
+        if st.button("Open", key=f"library_open_{result['video_id']}", help="Make this the current video without extracting it again"):
+            open_library_video(result['url'], result['video_id'])
+
+
+def open_library_video(url: str, video_id: str) -> None:
+    """Make a library video the session's current one, ready for questions on the Single video tab"""
+    entry = cached_transcript(video_id)
+    if not entry:
+        st.error("⚠️ This transcript is no longer in the library.")
+        return
+    result = (entry['transcript'], entry['title'], entry['channel'], entry['date'])
+    if url != st.session_state.get('last_url'):
+        st.session_state.chat_history = []
+        st.session_state.summary_data = None
+    remember_session_transcript(url, result)
+    update_transcript_history(url, *result)
+    st.session_state.current_url = url
+    st.session_state.last_url = url
+    st.session_state.form_counter = st.session_state.get('form_counter', 0) + 1
+    st.rerun()
 
-    except Exception as e:
-        st.error(f"❌ Error processing video: {str(e)}")
-        return None, "YouTube Video", "Unknown Channel", None
-
-def get_or_extract_transcript(youtube_url):
-    """Get cached transcript if same URL, otherwise extract new one"""
-    # Check if we have cached data for this URL
-    if (st.session_state.cached_transcript and 
-        st.session_state.cached_video_info and 
-        st.session_state.cached_video_info.get('url') == youtube_url):
-        
-        st.info("📋 Using cached transcript from previous analysis")
-        return (st.session_state.cached_transcript, 
-                st.session_state.cached_video_info['title'],
-                st.session_state.cached_video_info['channel'],
-                st.session_state.cached_video_info['date'])
-    
-    # Extract new transcript
-    result = extract_transcript_and_title(youtube_url)
-    if result and result[0]:
-        transcript, title, channel, date = result
-        # Cache the results
-        st.session_state.cached_transcript = transcript
-        st.session_state.cached_video_info = {
-            'url': youtube_url,
-            'title': title,
-            'channel': channel,
-            'date': date
-        }
-        st.info("🔄 New transcript extracted and cached")
-    
-    return result
 
 def main():
     # Initialize session state
@@ -561,18 +527,140 @@ def main():
         'summary_data': None,
         'current_url': "",
         'current_question': "",
-        'selected_model': "google/gemini-2.0-flash-exp:free",
-        'cached_transcript': None,
+        'selected_model': DEFAULT_MODEL,
         'cached_video_info': None,
         'chat_history': [],
         'last_question': "",
         'last_url': "",
-        'transcript_history': []
+        'transcript_history': [],
+        'stream_responses': True,
+        'use_retrieval': True,
+        'chat_mode': CHAT_MODE,
+        'batch_results': [],
+        'hedge_requests': os.getenv("HEDGED_REQUESTS", "").lower() in ("1", "true", "yes"),
+        'use_timestamps': os.getenv("TRANSCRIPT_TIMESTAMPS", "").lower() in ("1", "true", "yes"),
+        'hedge_report': None,
+        'pending_request': None
     }
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
+    tabs = st.tabs(["Single video", "Batch"] + (["Library"] if TRANSCRIPT_LIBRARY else []))
+    with tabs[0]:
+        display_single_video_section()
+    with tabs[1]:
+        st.caption("Summarize many videos at once with the model selected on the Single video tab.")
+        display_batch_section(os.getenv("OPENROUTER_API_KEY"))
+    if TRANSCRIPT_LIBRARY:
+        with tabs[2]:
+            display_library_section()
+
+    display_shared_work_stats()
+    display_memory_report()
+    if METRICS_PANEL:
+        display_metrics_panel()
+
+    # Background jobs are still running: check on them again shortly
+    if st.session_state.pop('poll_jobs', False):
+        time.sleep(JOB_POLL_INTERVAL_SECONDS)
+        st.rerun()
+
+
+def display_shared_work_stats() -> None:
+    """Show how much upstream work was shared between sessions instead of repeated"""
+    flights = get_single_flight().stats()
+    coalesced = {kind: counts["coalesced"] for kind, counts in flights.items() if counts["coalesced"]}
+    if not coalesced and not get_job_queue().deduplicated:
+        return
+    with st.expander("🤝 Shared work across sessions", expanded=False):
+        st.caption(
+            f"Coalesced {coalesced.get('transcript', 0)} transcript extraction(s) and "
+            f"{coalesced.get('summary', 0)} answer(s) into calls already in flight; "
+            f"{get_job_queue().deduplicated} submission(s) joined an existing background job."
+        )
+        st.json({"single_flight": flights, "jobs": get_job_queue().stats()}, expanded=False)
+
+
+def display_memory_report() -> None:
+    """Show this session's memory use next to the transcript store shared by all sessions"""
+    with st.expander("🧠 Memory use", expanded=False):
+        sizes = session_memory_report()
+        store = get_transcript_store().stats()
+        st.caption(
+            f"This session holds about {sum(sizes.values()) / 1024:.0f} KB. "
+            f"Shared transcript store: {store['entries']} transcript(s) in {store['bytes'] / 1024 / 1024:.1f} MB "
+            f"({store['compression_ratio']}× compressed, {store['evictions']} evicted)."
+        )
+        st.json({"session_bytes": sizes, "transcript_store": store}, expanded=False)
+
+
+METRICS_PANEL = os.getenv("METRICS_PANEL", "false").lower() in ("1", "true", "yes")
+
+
+def display_metrics_panel() -> None:
+    """Admin view of per-stage timings, cache hit rates, fallbacks, tokens and upstream errors"""
+    with st.expander("📈 Pipeline metrics", expanded=False):
+        metrics = get_metrics()
+        snapshot = metrics.snapshot()
+        totals = {}
+        for counter in snapshot["counters"]:
+            totals[counter["name"]] = totals.get(counter["name"], 0) + counter["value"]
+        hit_rates = ", ".join(f"{cache} {rate:.0%}" for cache, rate in snapshot["cache_hit_rates"].items()) or "no lookups yet"
+        st.caption(
+            f"Cache hit rates: {hit_rates}. "
+            f"{totals.get('yt_model_fallbacks_total', 0):.0f} fallback answer(s), "
+            f"{totals.get('yt_upstream_errors_total', 0):.0f} upstream error(s), "
+            f"~{totals.get('yt_tokens_total', 0):,.0f} tokens since the server started."
+        )
+        if snapshot["stages"]:
+            st.dataframe(snapshot["stages"], hide_index=True)
+        st.json(snapshot["counters"], expanded=False)
+        st.download_button("Download Prometheus metrics", metrics.prometheus_text(), file_name="metrics.prom", mime="text/plain")
+
+
+@partial_rerun
+def display_model_settings(api_key: Optional[str]) -> None:
+    """Model picker and answer options; changing them reruns only this part of the page"""
+    if api_key:
+        models = fetch_openrouter_models(api_key)
+        if models:
+            selected_model = st.selectbox(
+                "AI Model",
+                models,
+                index=models.index(st.session_state.selected_model) if st.session_state.selected_model in models else 0,
+                help="Select an AI model for analysis. Some free models may have data policy restrictions - if one fails, the app will automatically try a known working model."
+            )
+            st.session_state.selected_model = selected_model
+            model_details = describe_model(get_model_catalog(api_key).get(selected_model))
+            if model_details:
+                st.caption(model_details)
+        elif get_model_catalog(api_key).last_error:
+            st.warning(f"⚠️ Could not load the model list ({get_model_catalog(api_key).last_error}). Using default model.")
+        else:
+            st.warning("No free or low-cost models available from selected vendors. Using default model.")
+    else:
+        st.warning("OpenRouter API key not found. Using default model.")
+
+    st.checkbox(
+        "Stream answers as they are generated",
+        key='stream_responses',
+        help="Show the response token by token instead of waiting for the full answer."
+    )
+    st.checkbox(
+        "Hedge slow models",
+        key='hedge_requests',
+        help=f"If the model has not started answering within {HEDGE_DELAY_SECONDS:.0f}s, also ask the next-best model and keep whichever answers first."
+    )
+    st.checkbox(
+        "Link answers to moments in the video",
+        key='use_timestamps',
+        help="Extract the transcript with timestamps and cite them as [m:ss] links that open the video at that moment."
+    )
+
+
+def display_single_video_section() -> None:
+    """Summarize or ask questions about one video at a time"""
     # Create a form to handle Enter key and button clicks
     form_key = f"url_form_{st.session_state.get('form_counter', 0)}"
     with st.form(form_key):
@@ -599,25 +687,24 @@ def main():
                 label_visibility="collapsed",
                 key=f"custom_question_input_{st.session_state.get('form_counter', 0)}"
             )
+            st.checkbox(
+                "Answer from the most relevant parts of the transcript",
+                key='use_retrieval',
+                help="Send only the transcript excerpts that match your question. Uncheck to send the whole transcript."
+            )
+            st.checkbox(
+                "Follow up on earlier questions about this video",
+                key='chat_mode',
+                help="Send the whole transcript and the chat history, so the model sees the conversation so far. Providers can reuse the unchanged transcript between questions."
+            )
+            force_regenerate = st.checkbox(
+                "Regenerate instead of reusing a cached answer",
+                key=f"force_regenerate_{st.session_state.get('form_counter', 0)}"
+            )
 
     # Model selection (outside form to prevent reset)
     api_key = os.getenv("OPENROUTER_API_KEY")
-    if api_key:
-        models = fetch_openrouter_models(api_key)
-        if models:
-            selected_model = st.selectbox(
-                "AI Model",
-                models,
-                index=models.index(st.session_state.selected_model) if st.session_state.selected_model in models else 0,
-                help="Select an AI model for analysis. Some free models may have data policy restrictions - if one fails, the app will automatically try a known working model."
-            )
-            st.session_state.selected_model = selected_model
-        else:
-            st.warning("No free or low-cost models available from selected vendors. Using default model.")
-    else:
-        st.warning("OpenRouter API key not found. Using default model.")
-
-
+    display_model_settings(api_key)
 
     # Display current video context if available
     if st.session_state.cached_video_info:
@@ -638,26 +725,34 @@ def main():
             with st.expander(f"Q{i+1}: {chat['question'][:50]}{'...' if len(chat['question']) > 50 else ''}", expanded=False):
                 st.markdown(f"**Question:** {chat['question']}")
                 st.markdown(f"**Answer:**")
-                st.markdown(chat['answer'], unsafe_allow_html=True)
-
-    # Display summary below the form if available
-    if st.session_state.summary_data:
-
-        summary_data = st.session_state.summary_data
-        summary_html = summary_data['html']
-        summary_text = summary_data['text']
-        displayed_question = summary_data.get('question', '')
-        num_lines = summary_text.count('\n') + 1
+                st.markdown(chat['answer'])
+
+    # Display summary below the form if available (the slot is reused for streaming)
+    summary_area = st.empty()
+    if st.session_state.summary_data and not submitted:
+        with summary_area.container():
+            summary_data = st.session_state.summary_data
+            summary_html = summary_data['html']
+            summary_text = summary_data['text']
+            displayed_question = summary_data.get('question', '')
+            num_lines = summary_text.count('\n') + 1
+
+            # Display results header
+            if displayed_question and displayed_question.strip():
+                st.markdown("### Answer to Your Question")
+            else:
+                st.markdown("### Summary")
 
-        # Display results header
-        if displayed_question and displayed_question.strip():
-            st.markdown("### Answer to Your Question")
-        else:
-            st.markdown("### Summary")
+            if summary_data.get('hedge'):
+                st.caption(format_hedge_report(summary_data['hedge']))
+            if summary_data.get('budget'):
+                st.caption(format_budget_report(summary_data['budget']))
+            if summary_data.get('cached'):
+                st.caption("⚡ Reused an identical earlier answer. Tick \"Regenerate\" under the question box for a fresh one.")
 
-        # Summary output with copy button (shared styling)
-        estimated_height = 800 + num_lines * 30
-        render_copyable_block(summary_html, "summary-text", height=estimated_height, scrolling=False)
+            # Summary output with copy button (shared styling)
+            estimated_height = 800 + num_lines * 30
+            render_copyable_block(summary_html, "summary-text", height=estimated_height, scrolling=False)
 
     # Show transcript history under results
     display_transcript_history_section()
@@ -687,80 +782,243 @@ def main():
             st.error("⚠️ Please enter a valid YouTube URL")
             return
 
-        # Progress bar
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        # Check if URL changed - if so, clear cache and chat history
+        if has_new_url:
+            st.session_state.cached_video_info = None
+            st.session_state.chat_history = []
+            st.session_state.current_url = url
+
+        # Update tracking variables immediately to prevent stale responses
+        st.session_state.last_question = current_custom_prompt
+        st.session_state.last_url = url
+
+        # The slow work runs on background workers; this request advances on every rerun
+        st.session_state.pending_request = {
+            'url': url,
+            'question': current_custom_prompt,
+            'model': st.session_state.selected_model,
+            'force_regenerate': force_regenerate,
+            'use_retrieval': bool(current_custom_prompt.strip()) and st.session_state.use_retrieval,
+            'timestamps': st.session_state.use_timestamps,
+            'history': [(chat['question'], chat['answer']) for chat in st.session_state.chat_history] if st.session_state.chat_mode and current_custom_prompt.strip() and st.session_state.chat_history else None,
+            'stage': 'transcript',
+            'job_id': None,
+            'started_at': time.time()
+        }
 
-        try:
-            # Check if URL changed - if so, clear cache and chat history
-            if has_new_url:
-                st.session_state.cached_transcript = None
-                st.session_state.cached_video_info = None
-                st.session_state.chat_history = []
-                st.session_state.current_url = url
-            
-            # Update tracking variables immediately to prevent stale responses
-            st.session_state.last_question = current_custom_prompt
-            st.session_state.last_url = url
-            
-            # Clear any existing summary to ensure fresh response
-            if 'summary_data' in st.session_state:
-                del st.session_state.summary_data
-            
-            status_text.text("Getting transcript...")
-            progress_bar.progress(25)
-
-            result = get_or_extract_transcript(url)
-            if not result or not result[0]:
-                return
+    if st.session_state.pending_request:
+        advance_pending_request(summary_area, api_key)
+
+
+def submit_pending_job(pending, kind: str, job_id: str, fn, *args, reuse_finished: bool = True) -> Dict[str, object]:
+    """Start (or join) a background job for the session's request and remember its id"""
+    job = get_job_queue().submit(job_id, kind, fn, *args, reuse_finished=reuse_finished)
+    pending['job_id'] = job_id
+    return job
+
+
+def poll_pending_job(pending, kind: str, job_id: str, fn, *args, reuse_finished: bool = True) -> Dict[str, object]:
+    """Current snapshot of the request's job, resubmitting it if it was pruned"""
+    if pending['job_id'] == job_id:
+        job = get_job_queue().get(job_id)
+        if job:
+            return job
+    return submit_pending_job(pending, kind, job_id, fn, *args, reuse_finished=reuse_finished)
+
+
+def advance_pending_request(summary_area, api_key: Optional[str]) -> None:
+    """Move the session's in-flight request forward: poll background jobs, then answer and finish"""
+    pending = st.session_state.pending_request
+    url = pending['url']
+    question = pending['question']
+    elapsed = time.time() - pending['started_at']
 
-            transcript, video_title, channel_name, video_date = result
-            progress_bar.progress(60)
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+
+    try:
+        if pending['stage'] == 'transcript':
+            result = get_session_transcript(url)
+            if result and pending['timestamps'] and get_transcript_segments(extract_video_id(url)) is None:
+                # The session's copy was extracted without timestamps
+                result = None
+            if not result:
+                job_id = f"transcript{'+timestamps' if pending['timestamps'] else ''}:{extract_video_id(url) or url}"
+                job = poll_pending_job(pending, "transcript", job_id, load_transcript, url, pending['timestamps'])
+                if job["status"] in ("queued", "running"):
+                    status_text.text(f"Getting transcript... ({elapsed:.0f}s, keeps running in the background)")
+                    progress_bar.progress(25)
+                    st.session_state.poll_jobs = True
+                    return
+                if job["status"] == "failed":
+                    st.session_state.pending_request = None
+                    st.error(f"❌ {str(job['error'])}")
+                    return
+                result = job["result"]
+                remember_session_transcript(url, result)
 
             # Persist transcript for later viewing
-            update_transcript_history(url, transcript, video_title, channel_name, video_date)
-
-            # Generate response
-            status_text.text("Answering your question..." if current_custom_prompt.strip() else "Creating summary...")
-            
-            # Get available models for fallback
-            available_models = []
-            if api_key:
-                available_models = fetch_openrouter_models(api_key)
-            
-            summary = summarize_text(transcript, st.session_state.selected_model, video_title, channel_name, video_date, current_custom_prompt, available_models)
-
-            if not summary:
+            update_transcript_history(url, *result)
+            pending.update(stage='answer', job_id=None)
+
+        session_transcript = get_session_transcript(url)
+        if session_transcript is None:
+            # Evicted from the shared store and gone from the disk cache since it was loaded
+            pending.update(stage='transcript', job_id=None)
+            st.session_state.poll_jobs = True
+            return
+        transcript, video_title, channel_name, video_date = session_transcript
+        progress_bar.progress(60)
+
+        # Generate response
+        status_text.text("Answering your question..." if question.strip() else "Creating summary...")
+
+        # Get available models for fallback
+        available_models = []
+        if api_key:
+            available_models = fetch_openrouter_models(api_key)
+        context_lengths = fetch_model_context_lengths(api_key) if api_key else {}
+
+        # Follow-ups send the whole transcript and the conversation, unless that is too long for one prompt
+        history = chat_history_for(transcript, pending.get('history'), pending['model'], context_lengths)
+        use_retrieval = pending['use_retrieval'] and history is None
+
+        # Reuse an identical earlier answer (same video, question, model and prompt templates)
+        video_id = extract_video_id(url)
+        response_cache = get_response_cache()
+        cache_key = None
+        if video_id:
+            cache_key = response_cache_key(video_id, question, pending['model'], answer_variant(use_retrieval, pending['timestamps'], history))
+            if pending['stage'] == 'answer' and not pending['force_regenerate']:
+                summary = response_cache.get(cache_key)
+                if summary is not None:
+                    finish_pending_request(summary, from_cache=True)
+                    return
+
+        if not st.session_state.stream_responses or pending['stage'] == 'answer_job':
+            # Without streaming nothing needs this script run, so answer on a background worker
+            job = poll_pending_job(
+                pending, "answer", f"answer:{cache_key or pending['started_at']}", generate_answer,
+                url, transcript, video_title, channel_name, question, pending['model'],
+                available_models, context_lengths, use_retrieval, cache_key, pending['timestamps'], None, history,
+                reuse_finished=not pending['force_regenerate']
+            )
+            pending['stage'] = 'answer_job'
+            if job["status"] in ("queued", "running"):
+                status_text.text(f"{'Answering your question' if question.strip() else 'Creating summary'}... ({elapsed:.0f}s, keeps running in the background)")
+                st.session_state.poll_jobs = True
+                return
+            if job["status"] == "failed":
+                st.session_state.pending_request = None
+                st.error(f"❌ {str(job['error'])}")
                 return
+            finish_pending_request(job["result"], from_cache=False)
+            return
+
+        # Stream tokens into the summary slot; the final HTML is rendered after the rerun
+        with summary_area.container():
+            st.markdown("### Answer to Your Question" if question.strip() else "### Summary")
+            stream_placeholder = st.empty()
+
+        # Questions only need the matching excerpts; summaries still read the whole transcript
+        source_text, cite_timestamps, budget_report = prepare_source(transcript, question, video_id, use_retrieval, pending['timestamps'], pending['model'], context_lengths)
+
+        st.session_state.hedge_report = None
+        try:
+            summary = stream_answer(cache_key, source_text, pending['model'], video_title, channel_name, video_date, question, available_models, stream_placeholder, context_lengths, st.session_state.hedge_requests, cite_timestamps, history)
+        except SummaryError as e:
+            st.session_state.pending_request = None
+            summary_area.empty()
+            st.error(f"❌ {str(e)}")
+            return
+        if cite_timestamps:
+            summary = link_timestamps(summary, video_id)
+
+        if cache_key:
+            response_cache.put(cache_key, summary, pending['model'])
+        finish_pending_request(summary, from_cache=False, hedge_report=st.session_state.hedge_report, budget_report=budget_report)
+
+    except Exception as e:
+        st.session_state.pending_request = None
+        st.markdown(f'<div class="error-message">❌ Error: {str(e)}</div>', unsafe_allow_html=True)
+    finally:
+        progress_bar.empty()
+        status_text.empty()
+
+
+def stream_answer(cache_key, text, model, video_title, channel_name, video_date, custom_prompt, available_models, stream_placeholder, context_lengths, hedge, cite_timestamps=False, history=None) -> str:
+    """Stream a summary or answer into the page, showing fallbacks; raises SummaryError when every model fails
+
+    With ``history`` the question is answered as the next turn of the conversation. Only the
+    model call is coalesced on ``cache_key``: a session asking for an answer that another session
+    is already streaming waits for its text, and every session renders the outcome itself.
+    """
+    progress = st.empty()
 
-            summary_html = markdown.markdown(summary, extensions=['tables'])
-            progress_bar.progress(100)
-            status_text.text("Complete!")
+    def show_text(text_so_far: str, final: bool) -> None:
+        if not text_so_far:
+            stream_placeholder.empty()
+        else:
+            stream_placeholder.markdown(text_so_far if final else text_so_far + " ▌")
 
-            # Store summary data
-            st.session_state.summary_data = {
-                'html': summary_html,
-                'text': summary,
-                'question': current_custom_prompt if current_custom_prompt.strip() else ''
-            }
+    def show_status(level: str, message: str) -> None:
+        if level == "success":
+            st.success(f"✅ {message}")
+        else:
+            st.warning(f"⚠️ {message}")
 
-            # Add to chat history if there's a question
-            if current_custom_prompt.strip():
-                st.session_state.chat_history.append({
-                    'question': current_custom_prompt,
-                    'answer': summary_html,
-                    'timestamp': st.session_state.get('chat_count', 0) + 1
-                })
-                st.session_state.chat_count = st.session_state.get('chat_count', 0) + 1
+    def show_progress(done: int, total: int) -> None:
+        if done == 0:
+            progress.progress(0, text=f"Reading {total} transcript sections...")
+        else:
+            progress.progress(done / total, text=f"Read {done} of {total} transcript sections")
 
-            st.rerun()
+    def remember_hedge(report: Dict[str, object]) -> None:
+        st.session_state.hedge_report = report
 
-        except Exception as e:
-            st.markdown(f'<div class="error-message">❌ Error: {str(e)}</div>', unsafe_allow_html=True)
-        finally:
-            progress_bar.empty()
-            status_text.empty()
+    try:
+        with st.spinner("Answering your question..." if custom_prompt and custom_prompt.strip() else "Generating summary..."):
+            if history is not None:
+                return coalesced_summary(
+                    cache_key, answer_in_chat, text, custom_prompt, history, model, video_title, channel_name,
+                    available_models, show_text, hedge, show_status, remember_hedge, cite_timestamps
+                )
+            return coalesced_summary(
+                cache_key, summarize_long_text, text, model, video_title, channel_name, video_date, custom_prompt,
+                available_models, show_text, context_lengths, hedge, show_status, remember_hedge, show_progress, cite_timestamps
+            )
+    finally:
+        progress.empty()
+
+
+def finish_pending_request(summary: str, from_cache: bool, hedge_report=None, budget_report=None) -> None:
+    """Store the finished answer for display, add it to the chat history and rerun"""
+    question = st.session_state.pending_request['question']
+    st.session_state.pending_request = None
+    with get_metrics().span("markdown_render"):
+        summary_html = render_markdown(summary)
+
+    # Store summary data
+    st.session_state.summary_data = {
+        'html': summary_html,
+        'text': summary,
+        'question': question if question.strip() else '',
+        'cached': from_cache,
+        'hedge': hedge_report,
+        'budget': budget_report
+    }
+
+    # Add to chat history if there's a question
+    if question.strip():
+        remember_chat_answer(question, summary)
+
+    st.rerun()
 
 
 if __name__ == "__main__":
-    main()
+    # `streamlit run app.py` renders the UI; `python app.py ...` runs the headless CLI
+    if get_script_run_ctx() is not None:
+        main()
+    else:
+        from yt.cli import main as run_cli
+        sys.exit(run_cli(prog="python app.py"))
@@ -0,0 +1,4 @@
+"""Offline benchmarks: the transcript → summary → HTML path against local fake Apify and OpenRouter servers
+
+Run ``python -m benchmarks --help``; nothing here touches the network.
+"""
@@ -0,0 +1,313 @@
+"""Local stand-ins for the Apify actor/dataset API and the OpenRouter API
+
+Both servers speak just enough of the real wire format for ``apify_client`` and the ``openai``
+client to work unchanged, with latency, token rates, transcript sizes and 429 responses set by
+``FakeSettings``.
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+FAKE_MODELS = ("google/bench-flash:free", "deepseek/bench-chat:free", "qwen/bench-instruct:free")
+WORDS = (
+    "the model learns from data and we look at how the training loop works in practice with a small "
+    "example so you can see each step of the process before we move on to the next part of the video "
+    "where the results are compared against a baseline that uses fewer parameters and less compute"
+).split()
+VIDEO_ID = re.compile(r'(?:v=|youtu\.be/)([A-Za-z0-9_-]{11})')
+
+
+class FakeSettings:
+    """Knobs shared by both fake servers"""
+
+    def __init__(self, apify_latency: float = 1.0, transcript_words: int = 3000, llm_latency: float = 0.3,
+                 token_rate: float = 200.0, completion_tokens: int = 200, rate_limit: float = 0.0,
+                 retry_after: float = 1.0, context_length: int = 32768, seed: int = 0):
+        self.apify_latency = apify_latency          # seconds an actor run takes to finish
+        self.transcript_words = transcript_words    # words in each video's transcript
+        self.llm_latency = llm_latency              # seconds before the first completion token
+        self.token_rate = token_rate                # completion tokens per second
+        self.completion_tokens = completion_tokens  # tokens in each completion
+        self.rate_limit = rate_limit                # share of completions answered with 429
+        self.retry_after = retry_after              # Retry-After seconds sent with each 429
+        self.context_length = context_length        # context window advertised by /models
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counts[name] += amount
+
+    def should_rate_limit(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.rate_limit
+
+
+def fake_transcript(video_id: str, words: int) -> str:
+    """Deterministic caption-like text for a video, different for every video ID"""
+    generator = random.Random(video_id)
+    sentences, total = [], 0
+    while total < words:
+        length = generator.randint(8, 20)
+        sentence = " ".join(generator.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        total += length
+    return "\n".join(sentences)
+
+
+def fake_completion(tokens: int) -> List[str]:
+    """Markdown summary split into roughly one-token pieces"""
+    pieces = ["## Summary\n\n"]
+    for index in itertools.count(1):
+        if len(pieces) >= tokens:
+            break
+        pieces.append(f"- **Point {index}**" if len(pieces) % 12 == 1 else " detail")
+        if len(pieces) % 12 == 0:
+            pieces.append("\n")
+    return pieces
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, settings: FakeSettings, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), handler)
+        self.settings = settings
+        self.state_lock = threading.Lock()
+        self.runs: Dict[str, dict] = {}
+        self.datasets: Dict[str, List[dict]] = {}
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        self.thread = threading.Thread(target=self.serve_forever, name=self.RequestHandlerClass.__name__, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def settings(self) -> FakeSettings:
+        return self.server.settings
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else None
+
+    def send_json(self, payload, status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_text(self, text: str) -> None:
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_found(self) -> None:
+        self.send_json({"error": {"type": "record-not-found", "message": f"No route for {self.path}"}}, 404)
+
+
+def iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class FakeApifyHandler(FakeHandler):
+    """POST /v2/acts/{id}/runs (or /v2/actors/...), GET /v2/actor-runs/{id}[/log] and GET /v2/datasets/{id}/items"""
+
+    def run_payload(self, run: dict) -> dict:
+        finished = time.time() >= run["finishes_at"]
+        return {"data": {
+            "id": run["id"],
+            "actId": run["act_id"],
+            "userId": "bench-user",
+            "startedAt": iso(run["started_at"]),
+            "finishedAt": iso(run["finishes_at"]) if finished else None,
+            "status": "SUCCEEDED" if finished else "RUNNING",
+            "statusMessage": "Finished" if finished else "Extracting transcripts",
+            "isStatusMessageTerminal": finished,
+            "meta": {"origin": "API"},
+            "stats": {},
+            "options": {"build": "latest", "timeoutSecs": 3600, "memoryMbytes": 1024, "diskMbytes": 2048},
+            "buildId": "bench-build",
+            "defaultDatasetId": run["dataset_id"],
+            "defaultKeyValueStoreId": f"{run['id']}-store",
+            "defaultRequestQueueId": f"{run['id']}-queue",
+        }}
+
+    def do_POST(self):
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        if len(parts) != 4 or parts[:2] not in (["v2", "acts"], ["v2", "actors"]) or parts[3] != "runs":
+            return self.not_found()
+
+        run_input = self.read_json() or {}
+        self.settings.count("apify_runs")
+        items = []
+        for start_url in run_input.get("startUrls", []):
+            url = start_url.get("url") if isinstance(start_url, dict) else start_url
+            match = VIDEO_ID.search(url or "")
+            video_id = match.group(1) if match else (url or "unknown")[-11:]
+            items.append({
+                "url": url,
+                "videoTitle": f"Benchmark video {video_id}",
+                "channelName": "Benchmark Channel",
+                "videoDate": "2024-01-01",
+                "transcript": fake_transcript(video_id, self.settings.transcript_words),
+            })
+
+        with self.server.state_lock:
+            run_id = f"run{len(self.server.runs) + 1}"
+            dataset_id = f"{run_id}-dataset"
+            now = time.time()
+            run = {"id": run_id, "act_id": parts[2], "dataset_id": dataset_id, "started_at": now, "finishes_at": now + self.settings.apify_latency}
+            self.server.runs[run_id] = run
+            self.server.datasets[dataset_id] = items
+        self.send_json(self.run_payload(run), 201)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        parts = [part for part in parsed.path.split("/") if part]
+        query = parse_qs(parsed.query)
+
+        if len(parts) >= 3 and parts[:2] == ["v2", "actor-runs"]:
+            run = self.server.runs.get(parts[2])
+            if run is None:
+                return self.not_found()
+            if parts[3:] == ["log"]:
+                # The client follows the run log while waiting; it stays empty
+                return self.send_text("")
+            # waitForFinish blocks until the run ends or the wait runs out, like the real API
+            wait = float(query.get("waitForFinish", ["0"])[0] or 0)
+            time.sleep(max(0.0, min(wait, run["finishes_at"] - time.time())))
+            return self.send_json(self.run_payload(run))
+
+        if len(parts) == 4 and parts[:2] == ["v2", "datasets"] and parts[3] == "items":
+            items = self.server.datasets.get(parts[2])
+            if items is None:
+                return self.not_found()
+            offset = int(query.get("offset", ["0"])[0] or 0)
+            limit = int(query.get("limit", [str(len(items))])[0] or len(items))
+            page = items[offset:offset + limit]
+            self.settings.count("apify_item_pages")
+            return self.send_json(page, headers={
+                "X-Apify-Pagination-Total": str(len(items)),
+                "X-Apify-Pagination-Offset": str(offset),
+                "X-Apify-Pagination-Count": str(len(page)),
+                "X-Apify-Pagination-Limit": str(limit),
+                "X-Apify-Pagination-Desc": "false",
+            })
+
+        return self.not_found()
+
+
+class FakeOpenRouterHandler(FakeHandler):
+    """GET /models and POST /chat/completions (plain JSON or server-sent events)"""
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip("/").endswith("/models"):
+            self.settings.count("models_requests")
+            return self.send_json({"data": [
+                {"id": model, "name": model, "context_length": self.settings.context_length, "pricing": {"prompt": "0", "completion": "0"}}
+                for model in FAKE_MODELS
+            ]})
+        return self.not_found()
+
+    def do_POST(self):
+        if not urlparse(self.path).path.rstrip("/").endswith("/chat/completions"):
+            return self.not_found()
+        request = self.read_json() or {}
+        model = request.get("model", FAKE_MODELS[0])
+        prompt_chars = sum(len(message.get("content") or "") for message in request.get("messages", []))
+
+        if self.settings.should_rate_limit():
+            self.settings.count("rate_limited")
+            return self.send_json(
+                {"error": {"code": 429, "message": "Rate limit exceeded: free-models-per-min"}}, 429,
+                {"Retry-After": f"{self.settings.retry_after:g}"}
+            )
+
+        self.settings.count("completions")
+        self.settings.count("prompt_tokens", prompt_chars // 4)
+        pieces = fake_completion(self.settings.completion_tokens)
+        time.sleep(self.settings.llm_latency)
+        completion_id = f"gen-{time.time_ns()}"
+        if request.get("stream"):
+            return self.stream(completion_id, model, pieces)
+
+        time.sleep(len(pieces) / self.settings.token_rate)
+        self.send_json({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(pieces)}}],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(pieces), "total_tokens": prompt_chars // 4 + len(pieces)},
+        })
+
+    def stream(self, completion_id: str, model: str, pieces: List[str]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        interval = 1 / self.settings.token_rate
+        try:
+            for piece in pieces + [None]:
+                delta = {"content": piece} if piece is not None else {}
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None if piece is not None else "stop"}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if piece is not None:
+                    time.sleep(interval)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_fake_apify(settings: FakeSettings) -> FakeServer:
+    return FakeServer(FakeApifyHandler, settings).start()
+
+
+def start_fake_openrouter(settings: FakeSettings) -> FakeServer:
+    return FakeServer(FakeOpenRouterHandler, settings).start()
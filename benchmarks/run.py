@@ -0,0 +1,186 @@
+"""Benchmark harness: concurrent sessions through load_transcript → summarize_long_text → markdown
+
+The fake servers are started and every URL, key and cache path is pointed at them (and at a
+temporary directory) before ``yt`` is imported, because its clients read those settings at
+import time.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .fakes import FakeSettings, start_fake_apify, start_fake_openrouter
+
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+STAGES = ("transcript", "summarize", "render")
+COUNTERS = ("apify_runs", "completions", "rate_limited", "prompt_tokens")
+
+
+def build_parser(prog: str = "benchmarks") -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Benchmark the summary pipeline offline against fake Apify and OpenRouter servers.")
+    parser.add_argument("-n", "--sessions", type=int, default=20, help="Sessions per concurrency level, each for a different video")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 4, 8], help="Concurrent sessions to measure")
+    parser.add_argument("--transcript-words", type=int, default=3000, help="Words in each fake transcript")
+    parser.add_argument("--apify-latency", type=float, default=1.0, help="Seconds each fake actor run takes")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds before the first completion token")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Completion tokens per second")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="Tokens in each completion")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Share of completions answered with 429 (0-1)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with each 429")
+    parser.add_argument("--context-length", type=int, default=32768, help="Context window of the fake models")
+    parser.add_argument("--stream", action="store_true", help="Stream completions the way the web UI does")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for 429 injection")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per concurrency level")
+    return parser
+
+
+def point_at_fakes(apify_url: str, openrouter_url: str, cache_dir: str) -> None:
+    """Route every upstream call and cache file of the yt package to the fakes and a scratch directory"""
+    os.environ.update({
+        "APIFY_API_TOKEN": "bench-token",
+        "APIFY_API_URL": apify_url,
+        "OPENROUTER_API_KEY": "bench-key",
+        "OPENROUTER_BASE_URL": f"{openrouter_url}/api/v1",
+        "TRANSCRIPT_CACHE_PATH": os.path.join(cache_dir, "transcripts.sqlite3"),
+        "TRANSCRIPT_LIBRARY_PATH": os.path.join(cache_dir, "library.sqlite3"),
+        "RESPONSE_CACHE_PATH": os.path.join(cache_dir, "responses.sqlite3"),
+        "MODEL_CATALOG_PATH": os.path.join(cache_dir, "models.json"),
+    })
+
+
+def run_session(url: str, model: str, available_models: List[str], context_lengths: Dict[str, int], stream: bool) -> Dict[str, object]:
+    """One user's request: extract the transcript, summarize it and render the summary as HTML"""
+    import markdown
+    from yt.summarize import summarize_long_text
+    from yt.transcripts import load_transcript
+
+    fallbacks = []
+    timings = {}
+    started = time.perf_counter()
+    try:
+        transcript, title, channel, date = load_transcript(url)
+        timings["transcript"] = time.perf_counter() - started
+
+        stage_started = time.perf_counter()
+        summary = summarize_long_text(
+            transcript, model, title, channel, date,
+            available_models=available_models,
+            on_text=(lambda text, final: None) if stream else None,
+            context_lengths=context_lengths,
+            on_status=lambda level, message: fallbacks.append(message)
+        )
+        timings["summarize"] = time.perf_counter() - stage_started
+
+        stage_started = time.perf_counter()
+        markdown.markdown(summary)
+        timings["render"] = time.perf_counter() - stage_started
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    return {"seconds": time.perf_counter() - started, "stages": timings, "fallbacks": len(fallbacks), "error": error}
+
+
+def run_level(concurrency: int, sessions: int, settings: FakeSettings, model: str, available_models: List[str], context_lengths: Dict[str, int], stream: bool) -> Dict[str, object]:
+    """Run ``sessions`` uncached sessions ``concurrency`` at a time and summarize what was measured"""
+    from yt.metrics import percentile
+
+    # A fresh 11-character video ID per session keeps every transcript and answer uncached
+    urls = [f"https://www.youtube.com/watch?v=b{concurrency:03d}x{index:06d}" for index in range(sessions)]
+    # One untimed session first, so imports and connection pools are not billed to the level
+    run_session(f"https://www.youtube.com/watch?v=w{concurrency:03d}x000000", model, available_models, context_lengths, stream)
+    counts_before = dict(settings.counts)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as pool:
+        results = list(pool.map(lambda url: run_session(url, model, available_models, context_lengths, stream), urls))
+    wall_seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    succeeded = [result for result in results if not result["error"]]
+    latencies = [result["seconds"] for result in succeeded]
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "errors": len(results) - len(succeeded),
+        "first_error": next((result["error"] for result in results if result["error"]), None),
+        "wall_seconds": round(wall_seconds, 3),
+        "sessions_per_second": round(len(succeeded) / wall_seconds, 3) if wall_seconds else None,
+        "latency_seconds": {f"p{int(fraction * 100)}": round_or_none(percentile(latencies, fraction)) for fraction in PERCENTILES},
+        "stage_p50_seconds": {
+            stage: round_or_none(percentile([result["stages"][stage] for result in succeeded], 0.5), 4)
+            for stage in STAGES
+        },
+        "memory_per_session_kib": round((peak - baseline) / concurrency / 1024, 1),
+        "peak_traced_mib": round(peak / 1024 / 1024, 2),
+        "fallbacks": sum(result["fallbacks"] for result in results),
+        "upstream": {name: settings.counts[name] - counts_before.get(name, 0) for name in COUNTERS},
+    }
+
+
+def round_or_none(value, digits: int = 3):
+    return None if value is None else round(value, digits)
+
+
+def print_report(report: Dict[str, object]) -> None:
+    latency = report["latency_seconds"]
+    stages = report["stage_p50_seconds"]
+    upstream = report["upstream"]
+    print(
+        f"── {report['concurrency']} concurrent × {report['sessions']} sessions: "
+        f"{report['sessions_per_second']} sessions/s, {report['wall_seconds']}s wall, {report['errors']} errors\n"
+        f"   latency p50 {latency['p50']}s · p90 {latency['p90']}s · p95 {latency['p95']}s · p99 {latency['p99']}s\n"
+        f"   stage p50 transcript {stages['transcript']}s · summarize {stages['summarize']}s · render {stages['render']}s\n"
+        f"   memory ~{report['memory_per_session_kib']} KiB/session (peak {report['peak_traced_mib']} MiB traced)\n"
+        f"   upstream {upstream['apify_runs']} actor runs, {upstream['completions']} completions, "
+        f"{upstream['rate_limited']} × 429, ~{upstream['prompt_tokens']:,} prompt tokens; {report['fallbacks']} fallbacks",
+        flush=True
+    )
+    if report["first_error"]:
+        print(f"   ❌ {report['first_error']}", flush=True)
+
+
+def main(argv=None, prog: str = "benchmarks") -> int:
+    parser = build_parser(prog)
+    args = parser.parse_args(argv)
+    if args.sessions < 1 or any(concurrency < 1 for concurrency in args.concurrency):
+        parser.error("--sessions and --concurrency must be at least 1")
+
+    settings = FakeSettings(
+        apify_latency=args.apify_latency, transcript_words=args.transcript_words, llm_latency=args.llm_latency,
+        token_rate=args.token_rate, completion_tokens=args.completion_tokens, rate_limit=args.rate_limit,
+        retry_after=args.retry_after, context_length=args.context_length, seed=args.seed
+    )
+    apify, openrouter = start_fake_apify(settings), start_fake_openrouter(settings)
+    try:
+        with tempfile.TemporaryDirectory(prefix="yt-bench-") as cache_dir:
+            point_at_fakes(apify.url, openrouter.url, cache_dir)
+            from yt.catalog import fetch_model_context_lengths, fetch_openrouter_models
+
+            api_key = os.environ["OPENROUTER_API_KEY"]
+            available_models = fetch_openrouter_models(api_key)
+            context_lengths = fetch_model_context_lengths(api_key)
+            if not available_models:
+                print("❌ Could not read the model list from the fake OpenRouter server", file=sys.stderr)
+                return 1
+
+            failures = 0
+            for concurrency in args.concurrency:
+                report = run_level(concurrency, args.sessions, settings, available_models[0], available_models, context_lengths, args.stream)
+                failures += report["errors"]
+                if args.json:
+                    print(json.dumps(report), flush=True)
+                else:
+                    print_report(report)
+    finally:
+        apify.stop()
+        openrouter.stop()
+    return 1 if failures else 0
@@ -0,0 +1,136 @@
+"""Startup and rerun benchmark for the web UI: import time of the pipeline and the cost of one Streamlit rerun
+
+Imports are timed in fresh interpreters. Page loads go through Streamlit's AppTest: the first
+is a new visitor's and imports the pipeline, the rest are reruns of a session that shows a
+summary, a chat history and an open transcript, which every click on a full-page rerun pays
+for. ``yt`` is only imported once the cache paths point at a scratch directory; no network
+access or API keys are needed.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("apify_client", "openai", "markdown")
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - started, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+SAMPLE_URL = "https://www.youtube.com/watch?v=benchstart1"
+
+
+def build_parser(prog: str = "benchmarks.startup") -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Measure import time and Streamlit rerun time of the web UI.")
+    parser.add_argument("--imports", type=int, default=5, help="Fresh interpreters to time each import in")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns to time after the first page load")
+    parser.add_argument("--transcript-words", type=int, default=20000, help="Words in the transcript shown on the page")
+    parser.add_argument("--chat-turns", type=int, default=10, help="Questions and answers in the session's chat history")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser
+
+
+def measure_import(module: str, runs: int) -> Dict[str, object]:
+    """Median time to import ``module`` in a fresh interpreter, and which heavy modules it pulled in"""
+    from yt.metrics import percentile
+
+    samples, loaded = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"module": module, "p50_seconds": round(percentile(samples, 0.5), 4), "heavy_modules_loaded": loaded}
+
+
+def seed_session(at, transcript_words: int, chat_turns: int) -> None:
+    """Give the test session what a returning user's page shows: a summary, chat turns and an open transcript"""
+    from yt.store import store_transcript
+
+    transcript = " ".join(f"word{index % 500}" for index in range(transcript_words))
+    summary = "## Summary\n\n" + "\n".join(f"- **Point {index}** about the video" for index in range(20))
+    at.session_state["transcript_history"] = [{
+        "url": SAMPLE_URL, "key": store_transcript(SAMPLE_URL, transcript),
+        "title": "Benchmark video", "channel": "Benchmark channel", "date": None
+    }]
+    at.session_state[f"show_transcript_{SAMPLE_URL}"] = True
+    at.session_state["summary_data"] = {"html": f"<p>{summary}</p>", "text": summary, "question": "", "cached": False, "hedge": None, "budget": None}
+    at.session_state["chat_history"] = [
+        {"question": f"Question {index}?", "answer": summary, "timestamp": index + 1}
+        for index in range(chat_turns)
+    ]
+
+
+def measure_reruns(reruns: int, transcript_words: int, chat_turns: int) -> Dict[str, object]:
+    """Time a new visitor's first page load (imports included), then reruns of a busy session"""
+    from streamlit.testing.v1 import AppTest
+
+    # AppTest runs outside a real server, so Streamlit would warn on every run
+    logging.disable(logging.WARNING)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    started = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - started
+
+    from yt.metrics import percentile
+
+    seed_session(at, transcript_words, chat_turns)
+    at.run()
+    samples: List[float] = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - started)
+    return {
+        "first_run_seconds": round(first_run, 4),
+        "rerun_p50_seconds": round(percentile(samples, 0.5), 4),
+        "rerun_p95_seconds": round(percentile(samples, 0.95), 4),
+        "exceptions": [str(exception.value) for exception in at.exception],
+    }
+
+
+def main(argv=None, prog: str = "benchmarks.startup") -> int:
+    args = build_parser(prog).parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="yt-startup-") as cache_dir:
+        # Keep the page offline and its caches out of the working tree
+        for name in ("OPENROUTER_API_KEY", "APIFY_API_TOKEN"):
+            os.environ.pop(name, None)
+        os.environ.update({
+            "TRANSCRIPT_CACHE_PATH": os.path.join(cache_dir, "transcripts.sqlite3"),
+            "TRANSCRIPT_LIBRARY_PATH": os.path.join(cache_dir, "library.sqlite3"),
+            "RESPONSE_CACHE_PATH": os.path.join(cache_dir, "responses.sqlite3"),
+            "MODEL_CATALOG_PATH": os.path.join(cache_dir, "models.json"),
+        })
+        # Page loads go first, so the first one is what imports ``yt`` in this process
+        reruns = measure_reruns(args.reruns, args.transcript_words, args.chat_turns)
+        report = {
+            "imports": [measure_import(module, args.imports) for module in ("yt", "streamlit")],
+            "reruns": reruns,
+        }
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for result in report["imports"]:
+            loaded = ", ".join(result["heavy_modules_loaded"]) or "none"
+            print(f"── import {result['module']}: p50 {result['p50_seconds']}s (heavy modules loaded: {loaded})")
+        reruns = report["reruns"]
+        print(f"── first page load {reruns['first_run_seconds']}s, rerun p50 {reruns['rerun_p50_seconds']}s · p95 {reruns['rerun_p95_seconds']}s")
+        for exception in reruns["exceptions"]:
+            print(f"   ❌ {exception}")
+    return 1 if report["reruns"]["exceptions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(prog="python -m benchmarks.startup"))
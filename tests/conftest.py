@@ -0,0 +1,98 @@
+import json
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class ModelHandler(BaseHTTPRequestHandler):
+    """Chat completions whose behaviour is set per model: an HTTP error status, or seconds to wait before answering"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        model = body["model"]
+        self.server.requests.append(model)
+        behaviour = self.server.behaviour.get(model, 0.0)
+        if isinstance(behaviour, int):
+            payload = json.dumps({"error": {"message": f"{model} failed", "code": behaviour}}).encode()
+            self.send_response(behaviour)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        if not body.get("stream"):
+            time.sleep(behaviour)
+            payload = json.dumps({
+                "id": "c", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": f"answer from {model}"}, "finish_reason": "stop"}]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        deadline = time.monotonic() + behaviour
+        while time.monotonic() < deadline:
+            readable, _, _ = select.select([self.connection], [], [], 0.02)
+            if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                self.server.dropped[model] = time.monotonic()
+                return
+        try:
+            for word in ("answer from ", model):
+                self.send_event(json.dumps({
+                    "id": "c", "object": "chat.completion.chunk", "created": 0, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]
+                }))
+            self.send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except OSError:
+            self.server.dropped[model] = time.monotonic()
+
+    def send_event(self, data: str) -> None:
+        payload = f"data: {data}\n\n".encode()
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.fixture
+def model_server():
+    """Local OpenRouter stand-in; set ``server.behaviour[model]`` and read ``requests`` and ``dropped``"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ModelHandler)
+    server.daemon_threads = True
+    server.behaviour, server.requests, server.dropped = {}, [], {}
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(model_server):
+    from openai import OpenAI
+    return OpenAI(base_url=f"http://127.0.0.1:{model_server.server_port}/v1", api_key="test-key", max_retries=0)
+
+
+@pytest.fixture
+def router(monkeypatch):
+    """A fresh model health registry instead of the process-wide one"""
+    import yt.llm as llm
+    registry = llm.ModelHealthRegistry()
+    monkeypatch.setattr(llm, "get_model_router", lambda: registry)
+    return registry
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+from yt.cache import ResponseCache, TranscriptCache, normalize_question, response_cache_key
+from yt.transcripts import extract_video_id
+
+
+@pytest.mark.parametrize("url", [
+    "dQw4w9WgXcQ",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s",
+    "youtube.com/watch?list=PL1&v=dQw4w9WgXcQ",
+    "https://youtu.be/dQw4w9WgXcQ?si=abc",
+    "https://m.youtube.com/shorts/dQw4w9WgXcQ",
+    "https://www.youtube.com/embed/dQw4w9WgXcQ",
+    "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ",
+])
+def test_every_url_form_maps_to_one_video_id(url):
+    assert extract_video_id(url) == "dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize("url", ["", "https://example.com/watch?v=dQw4w9WgXcQ", "https://www.youtube.com/watch?v=short"])
+def test_not_a_video_url(url):
+    assert extract_video_id(url) is None
+
+
+def test_hit_miss_and_roundtrip():
+    cache = TranscriptCache(":memory:", ttl_seconds=0, max_entries=0, max_bytes=0)
+    assert cache.get("abc") is None
+    cache.put("abc", "hello world", "Title", "Channel", "2024-01-01")
+    assert cache.get("abc") == {"transcript": "hello world", "title": "Title", "channel": "Channel", "date": "2024-01-01"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, len("hello world"))
+
+
+def test_entries_do_not_count_as_lookups():
+    cache = TranscriptCache(":memory:", ttl_seconds=0, max_entries=0, max_bytes=0)
+    cache.put("a", "one", "A", "C", None)
+    cache.put("b", "two", "B", "C", None)
+    assert sorted(video_id for video_id, _ in cache.entries()) == ["a", "b"]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 0)
+
+
+def test_evicts_least_recently_used_beyond_max_entries():
+    cache = TranscriptCache(":memory:", ttl_seconds=0, max_entries=2, max_bytes=0)
+    cache.put("a", "1", "", "", None)
+    time.sleep(0.01)
+    cache.put("b", "2", "", "", None)
+    time.sleep(0.01)
+    assert cache.get("a") is not None  # now more recently used than "b"
+    time.sleep(0.01)
+    cache.put("c", "3", "", "", None)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_beyond_max_bytes():
+    cache = TranscriptCache(":memory:", ttl_seconds=0, max_entries=0, max_bytes=10)
+    cache.put("a", "x" * 6, "", "", None)
+    time.sleep(0.01)
+    cache.put("b", "y" * 6, "", "", None)
+
+    assert cache.get("a") is None
+    assert cache.get("b")["transcript"] == "y" * 6
+    assert cache.stats()["bytes"] == 6
+
+
+def test_expired_entries_are_misses():
+    cache = TranscriptCache(":memory:", ttl_seconds=0.05, max_entries=0, max_bytes=0)
+    cache.put("a", "transcript", "", "", None)
+    assert cache.get("a") is not None
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"]) == (0, 1)
+
+
+def test_put_drops_expired_entries():
+    cache = TranscriptCache(":memory:", ttl_seconds=0.05, max_entries=0, max_bytes=0)
+    cache.put("old", "transcript", "", "", None)
+    time.sleep(0.1)
+    cache.put("new", "transcript", "", "", None)
+
+    assert cache.stats()["entries"] == 1
+    assert cache.get("new") is not None
+
+
+def test_response_cache_roundtrip():
+    cache = ResponseCache(":memory:", ttl_seconds=0, max_entries=0, max_bytes=0)
+    assert cache.get("key") is None
+    cache.put("key", "an answer", "m")
+    assert cache.get("key") == "an answer"
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_responses_evict_least_recently_used():
+    cache = ResponseCache(":memory:", ttl_seconds=0, max_entries=2, max_bytes=0)
+    cache.put("a", "1", "m")
+    time.sleep(0.01)
+    cache.put("b", "2", "m")
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.put("c", "3", "m")
+    assert [cache.get(key) for key in "abc"] == ["1", None, "3"]
+
+
+def test_question_normalization():
+    assert normalize_question("  What is   THIS about?? ") == "what is this about"
+    assert normalize_question(None) == ""
+
+
+def test_response_key_covers_everything_that_changes_the_answer():
+    key = response_cache_key("vid", "What is this about?", "m")
+    assert response_cache_key("vid", "what is this about", "m") == key
+    assert len({
+        key,
+        response_cache_key("other", "What is this about?", "m"),
+        response_cache_key("vid", "Who is speaking?", "m"),
+        response_cache_key("vid", "What is this about?", "other-model"),
+        response_cache_key("vid", "What is this about?", "m", "retrieval"),
+    }) == 5
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+import yt.catalog as catalog
+from yt.catalog import ModelCatalog, ModelCatalogError, describe_model, fetch_model_context_lengths, fetch_openrouter_models
+
+MODELS = [
+    {"id": "google/free:free", "context_length": 32768, "pricing": {"prompt": "0", "completion": "0"}},
+    {"id": "qwen/cheap", "context_length": 8000, "pricing": {"prompt": "0.0000002", "completion": "0.0000006"}},
+    {"id": "openai/other", "context_length": 128000, "pricing": {"prompt": "0", "completion": "0"}},
+]
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"data": self.data}
+
+
+class FakeSession:
+    """Stands in for the shared requests session; counts calls and fails while ``offline``"""
+
+    def __init__(self):
+        self.data = list(MODELS)
+        self.calls = 0
+        self.offline = False
+
+    def get(self, url, headers, timeout):
+        self.calls += 1
+        if self.offline:
+            raise ConnectionError("network unreachable")
+        return FakeResponse(self.data)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(catalog, "get_http_session", lambda: session)
+    return session
+
+
+def wait_for(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_cold_start_fetches_and_persists(session, tmp_path):
+    path = str(tmp_path / "models.json")
+    models = ModelCatalog("key", path=path)
+    assert models.context_length("qwen/cheap") == 8000
+    assert models.stats()["source"] == "network"
+
+    session.offline = True
+    restarted = ModelCatalog("key", path=path)
+    assert [model["id"] for model in restarted.models()] == [model["id"] for model in MODELS]
+    assert restarted.stats()["source"] == "disk"
+    assert session.calls == 1
+
+
+def test_stale_copy_is_served_while_it_refreshes(session, tmp_path):
+    models = ModelCatalog("key", path=str(tmp_path / "models.json"), ttl_seconds=3600, refresh_ahead=0)
+    models.fetch()
+    session.data = MODELS[:1]
+
+    assert len(models.models()) == 3  # the old copy, without waiting
+    wait_for(lambda: len(models.models()) == 1)
+    assert models.stats()["fetches"] == 2
+
+
+def test_failed_refresh_keeps_the_old_copy(session, tmp_path):
+    models = ModelCatalog("key", path=str(tmp_path / "models.json"), ttl_seconds=3600, refresh_ahead=0, retry_seconds=60)
+    models.fetch()
+    session.offline = True
+
+    assert len(models.models()) == 3
+    wait_for(lambda: models.stats()["failures"] == 1 and not models.stats()["refreshing"])
+    assert len(models.models()) == 3
+    time.sleep(0.05)
+    assert session.calls == 2  # no new attempt before the retry delay
+    assert models.stats()["last_error"].startswith("ConnectionError")
+
+
+def test_cold_start_failure(session, tmp_path):
+    session.offline = True
+    models = ModelCatalog("key", path=str(tmp_path / "models.json"), retry_seconds=60)
+    with pytest.raises(ModelCatalogError):
+        models.models()
+    assert models.get("qwen/cheap") is None
+    assert models.fits("qwen/cheap", 10 ** 9)
+    assert session.calls == 1
+
+
+def test_model_picker_helpers(session, tmp_path, monkeypatch):
+    models = ModelCatalog("key", path=str(tmp_path / "models.json"))
+    monkeypatch.setattr(catalog, "get_model_catalog", lambda api_key: models)
+
+    assert fetch_openrouter_models("key") == ["google/free:free"]
+    assert fetch_model_context_lengths("key")["openai/other"] == 128000
+    assert describe_model(MODELS[0]) == "32,768-token context · free"
+    assert describe_model(MODELS[1]) == "8,000-token context · $0.20 / $0.60 per million input / output tokens"
+    assert not models.fits("qwen/cheap", 8000)
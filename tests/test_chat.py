@@ -0,0 +1,66 @@
+from yt.chat import (
+    CHAT_DIGEST_ANSWER_CHARS, CHAT_HISTORY_MAX_TOKENS, CHAT_SUMMARY_REQUEST, CHAT_VERBATIM_TURNS, build_chat_messages,
+    chat_history_for, chat_variant, compact_history
+)
+
+TRANSCRIPT = "We look at how the training loop works in practice."
+
+
+def turns(count, answer="An answer."):
+    return [(f"Question {i}?", f"{answer} {i}") for i in range(count)]
+
+
+def test_short_history_is_kept_verbatim():
+    history = turns(CHAT_VERBATIM_TURNS)
+    assert compact_history(history) == (None, history)
+
+
+def test_older_turns_go_into_an_abridged_digest():
+    history = turns(CHAT_VERBATIM_TURNS + 2, answer="word " * 200)
+    digest, recent = compact_history(history)
+    assert recent == history[2:]
+    assert digest.startswith("Earlier in this conversation (abridged):")
+    assert "Q: Question 0?" in digest and "Q: Question 1?" in digest
+    assert "Question 2?" not in digest
+    assert all(len(line) <= CHAT_DIGEST_ANSWER_CHARS + 5 for line in digest.splitlines() if line.startswith("A: "))
+
+
+def test_long_recent_answers_respect_the_token_budget():
+    history = turns(3, answer="x" * (CHAT_HISTORY_MAX_TOKENS * 4))
+    digest, recent = compact_history(history)
+    # The latest turn is always kept whole, even when it alone exceeds the budget
+    assert recent == history[-1:]
+    assert digest is not None
+
+
+def test_transcript_prefix_stays_identical_between_turns():
+    first = build_chat_messages(TRANSCRIPT, "Question 0?", [], "Title", "Channel")
+    second = build_chat_messages(TRANSCRIPT, "Question 1?", [("Question 0?", "An answer.")], "Title", "Channel")
+    assert first[0] == second[0]
+    assert [message["role"] for message in second] == ["system", "user", "assistant", "user"]
+    assert second[-1]["content"] == "Question 1?"
+
+
+def test_no_question_asks_for_a_summary():
+    assert build_chat_messages(TRANSCRIPT, "  ")[-1]["content"] == CHAT_SUMMARY_REQUEST
+
+
+def test_cache_hints_only_for_models_that_need_them():
+    history = [("Question 0?", "An answer.")]
+    hinted = build_chat_messages(TRANSCRIPT, "Next?", history, model="anthropic/claude")
+    assert hinted[0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert hinted[-2]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    plain = build_chat_messages(TRANSCRIPT, "Next?", history, model="deepseek/chat")
+    assert isinstance(plain[0]["content"], str)
+
+
+def test_chat_is_only_used_for_follow_ups_that_fit():
+    assert chat_history_for(TRANSCRIPT, None, "m") is None
+    assert chat_history_for(TRANSCRIPT, [], "m") is None
+    assert chat_history_for(TRANSCRIPT, [["Question 0?", "An answer."]], "m") == [("Question 0?", "An answer.")]
+    assert chat_history_for("word " * 200_000, [("Question 0?", "An answer.")], "m") is None
+
+
+def test_variant_follows_the_conversation():
+    assert chat_variant(turns(2)) == chat_variant(turns(2))
+    assert chat_variant(turns(2)) != chat_variant(turns(3))
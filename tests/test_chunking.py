@@ -0,0 +1,59 @@
+from yt.chunking import CHARS_PER_TOKEN, CHUNK_MAX_TOKENS, chunk_token_budget, estimate_tokens, iter_chunks, split_transcript
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("abcde") == 2
+
+
+def test_chunk_budget_leaves_room_and_stays_in_bounds():
+    assert chunk_token_budget(8000) == int(8000 * 0.65) - 500
+    assert chunk_token_budget(1000) == 1000
+    assert chunk_token_budget(1_000_000) == CHUNK_MAX_TOKENS
+    assert chunk_token_budget(None) == chunk_token_budget(32768)
+
+
+def test_short_text_is_one_chunk():
+    assert split_transcript("  One sentence. Another one.  ", 100) == ["One sentence. Another one."]
+
+
+def test_chunks_respect_the_budget_and_keep_every_word():
+    text = " ".join(f"Sentence number {i} is here." for i in range(200))
+    chunks = split_transcript(text, 50)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 50 * CHARS_PER_TOKEN for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_cuts_on_sentence_boundaries():
+    text = " ".join(f"Sentence number {i} is here." for i in range(200))
+    assert all(chunk.endswith(".") for chunk in split_transcript(text, 50))
+
+
+def test_unpunctuated_captions_fall_back_to_words():
+    text = " ".join(f"word{i}" for i in range(500))
+    chunks = split_transcript(text, 20)
+    assert all(len(chunk) <= 20 * CHARS_PER_TOKEN for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_iter_chunks_matches_split_transcript():
+    fragments = [f"Sentence number {i} is here." for i in range(200)]
+    chunks = list(iter_chunks(fragments, 50))
+    assert " ".join(chunks) == " ".join(fragments)
+    assert all(len(chunk) <= 50 * CHARS_PER_TOKEN for chunk in chunks)
+    assert len(chunks) == len(split_transcript(" ".join(fragments), 50))
+
+
+def test_iter_chunks_yields_before_the_text_is_complete():
+    read = []
+
+    def fragments():
+        for i in range(200):
+            read.append(i)
+            yield f"Sentence number {i} is here."
+
+    first = next(iter_chunks(fragments(), 50))
+    assert first.startswith("Sentence number 0")
+    assert len(read) < 50
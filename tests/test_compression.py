@@ -0,0 +1,62 @@
+from yt.compression import SPONSOR_PLACEHOLDER, TranscriptCompressor, compress_transcript
+
+SENTENCE = "Thank you very much for coming today."
+
+
+def test_off_returns_the_text_unchanged():
+    text = "[Music]  um so   this is it"
+    assert TranscriptCompressor("off").compress(text) == text
+
+
+def test_lossless_strips_noise_and_spaces():
+    compressor = TranscriptCompressor("lossless")
+    assert compressor.compress("[Music] Welcome   back ♪♪ to the \t show. [Applause]") == "Welcome back to the show."
+
+
+def test_lossless_keeps_what_was_said():
+    text = f"I had had enough. >> Speaker two: that that is fine. Um, we basically agree. {SENTENCE} {SENTENCE}"
+    assert TranscriptCompressor("lossless").compress(text) == text
+
+
+def test_line_structure_is_kept():
+    text = "[Excerpt 1 of 2]\n[0:01] Hello   there [Music]\n\n\n\n[Excerpt 2 of 2]\n[0:40]\tGoodbye."
+    expected = "[Excerpt 1 of 2]\n[0:01] Hello there\n\n[Excerpt 2 of 2]\n[0:40] Goodbye."
+    assert compress_transcript(text, "lossless")[0] == expected
+    assert compress_transcript(text, "lossy")[0] == expected
+
+
+def test_lossy_drops_a_sentence_that_was_just_repeated():
+    assert TranscriptCompressor("lossy").compress(f"{SENTENCE} {SENTENCE} Next part.") == f"{SENTENCE} Next part."
+
+
+def test_lossy_dedupe_spans_fragments():
+    compressor = TranscriptCompressor("lossy")
+    assert compressor.compress(SENTENCE) == SENTENCE
+    assert compressor.compress(f"{SENTENCE} Next part.") == "Next part."
+
+
+def test_lossy_removes_fillers_repeats_and_sponsors():
+    compressor = TranscriptCompressor("lossy")
+    text = (
+        "Um, so the model the model learns, you know, from data. "
+        "This video is sponsored by Acme. Use code SAVE for a discount. "
+        "Back to the results."
+    )
+    result = compressor.compress(text)
+    assert "Um" not in result and "you know" not in result
+    assert "the model the model" not in result
+    assert result.count(SPONSOR_PLACEHOLDER) == 1
+    assert "Acme" not in result
+    assert result.endswith("Back to the results.")
+
+
+def test_unknown_mode_falls_back_to_lossless():
+    assert TranscriptCompressor("bogus").mode == "lossless"
+
+
+def test_report_counts_saved_tokens():
+    text, report = compress_transcript("[Music] " * 200 + "Hello there.", "lossless")
+    assert text == "Hello there."
+    assert report["mode"] == "lossless"
+    assert report["prompt_tokens"] < report["original_tokens"]
+    assert report["tokens_saved"] == report["original_tokens"] - report["prompt_tokens"]
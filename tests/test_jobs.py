@@ -0,0 +1,193 @@
+import threading
+import time
+
+import pytest
+
+from yt.jobs import JobQueue, SingleFlight, coalesced_summary
+
+
+class Stopped(BaseException):
+    """Stands in for Streamlit stopping a script run"""
+
+
+def wait_for_job(jobs, job_id, status):
+    deadline = time.time() + 5
+    while jobs.get(job_id)["status"] != status:
+        assert time.time() < deadline, f"job never became {status}"
+        time.sleep(0.01)
+    return jobs.get(job_id)
+
+
+def test_job_runs_in_the_background():
+    jobs = JobQueue(max_workers=2)
+    release = threading.Event()
+    job = jobs.submit("job-1", "summary", lambda: release.wait(5) and "result")
+    assert job["status"] in ("queued", "running")
+
+    release.set()
+    assert wait_for_job(jobs, "job-1", "done")["result"] == "result"
+
+
+def test_same_job_id_joins_the_running_job():
+    jobs = JobQueue(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    jobs.submit("job-1", "summary", work)
+    jobs.submit("job-1", "summary", work)
+    release.set()
+    wait_for_job(jobs, "job-1", "done")
+    jobs.submit("job-1", "summary", work)
+
+    assert len(calls) == 1
+    assert jobs.stats()["deduplicated"] == 2
+
+
+def test_finished_job_can_be_rerun():
+    jobs = JobQueue(max_workers=1)
+    jobs.submit("job-1", "summary", lambda: "first")
+    wait_for_job(jobs, "job-1", "done")
+    jobs.submit("job-1", "summary", lambda: "second", reuse_finished=False)
+    deadline = time.time() + 5
+    while jobs.get("job-1")["result"] != "second":
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_failure_is_kept_on_the_job():
+    jobs = JobQueue(max_workers=1)
+    jobs.submit("job-1", "summary", lambda: 1 / 0)
+    job = wait_for_job(jobs, "job-1", "failed")
+    assert isinstance(job["error"], ZeroDivisionError)
+    assert jobs.stats()["failed"] == 1
+
+
+def test_finished_jobs_are_pruned_after_their_ttl():
+    jobs = JobQueue(max_workers=1, result_ttl=0.05)
+    jobs.submit("job-1", "summary", lambda: "result")
+    wait_for_job(jobs, "job-1", "done")
+    time.sleep(0.1)
+    jobs.submit("job-2", "summary", lambda: "result")
+    assert jobs.get("job-1") is None
+
+
+def wait_for_waiters(flight, kind, count):
+    deadline = time.time() + 5
+    while flight.stats()[kind]["coalesced"] < count:
+        assert time.time() < deadline, "waiters never joined the call"
+        time.sleep(0.01)
+
+
+def run_leader(flight, fn):
+    """Start a leader call in a thread; returns the thread and a list that receives its outcome"""
+    outcome = []
+
+    def call():
+        try:
+            outcome.append(flight.do("test", "key", fn))
+        except BaseException as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    deadline = time.time() + 5
+    while flight.stats().get("test", {}).get("in_flight") != 1:
+        assert time.time() < deadline, "leader never claimed the call"
+        time.sleep(0.01)
+    return thread, outcome
+
+
+def test_waiters_share_the_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    leader, outcome = run_leader(flight, fn)
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(flight.do("test", "key", fn))) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    wait_for_waiters(flight, "test", 3)
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join(5)
+
+    assert outcome == ["answer"]
+    assert results == ["answer"] * 3
+    assert len(calls) == 1
+    assert flight.stats()["test"] == {"calls": 4, "coalesced": 3, "in_flight": 0}
+
+
+def test_waiters_share_an_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    leader, outcome = run_leader(flight, fn)
+    errors = []
+
+    def wait():
+        try:
+            flight.do("test", "key", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    wait_for_waiters(flight, "test", 1)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    assert isinstance(outcome[0], ValueError)
+    assert errors == [outcome[0]]
+
+
+def test_waiter_retries_an_abandoned_call():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def abandoned():
+        release.wait(5)
+        raise Stopped()
+
+    leader, outcome = run_leader(flight, abandoned)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(flight.do("test", "key", lambda: "retried")))
+    waiter.start()
+    wait_for_waiters(flight, "test", 1)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    # The leader's own thread still sees its BaseException; the waiter makes the call itself
+    assert isinstance(outcome[0], Stopped)
+    assert results == ["retried"]
+    assert flight.stats()["test"]["in_flight"] == 0
+
+
+def test_key_is_free_again_after_a_failure():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("test", "key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert flight.do("test", "key", lambda: "fresh") == "fresh"
+
+
+def test_answers_without_a_cache_key_are_not_coalesced():
+    calls = []
+    assert coalesced_summary(None, lambda: calls.append(1) or "answer") == "answer"
+    assert coalesced_summary(None, lambda: calls.append(1) or "answer") == "answer"
+    assert len(calls) == 2
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+import yt.library as library_module
+import yt.transcripts as transcripts
+from yt.cache import TranscriptCache
+from yt.library import TranscriptLibrary, fts_query, make_snippet, search_terms
+
+
+@pytest.fixture
+def library():
+    library = TranscriptLibrary(":memory:")
+    library.add("vid00000001", "We tune the optimizer and the learning rate schedule for training.", "Optimizer tricks", "ML Channel", "2024-01-01")
+    library.add("vid00000002", "A cooking show about bread. The optimizer is mentioned once.", "Baking bread", "Food Channel", None)
+    library.add("vid00000003", "Gradient descent explained from scratch with a learning rate.", "Gradients", "Optimizer Weekly", None)
+    return library
+
+
+def ids(results):
+    return [result["video_id"] for result in results]
+
+
+def test_search_terms_and_quoted_fts_query():
+    assert search_terms('Learning "rate schedule" optim* ') == ["learning", "rate schedule", "optim*"]
+    assert fts_query('optim* "rate schedule"') == '"optim"* "rate schedule"'
+    # FTS syntax in user input is searched for as words
+    assert fts_query("title:bread OR NEAR(") == '"title bread" "or" "near"'
+    assert fts_query("  ") is None
+
+
+def test_title_outranks_channel_outranks_transcript(library):
+    assert ids(library.search("optimizer")) == ["vid00000001", "vid00000003", "vid00000002"]
+
+
+def test_every_term_must_match(library):
+    assert sorted(ids(library.search("learning rate"))) == ["vid00000001", "vid00000003"]
+    assert ids(library.search("bread optimizer")) == ["vid00000002"]
+    assert library.search("quantum") == []
+    assert library.search("") == []
+
+
+def test_phrases_prefixes_and_snippets(library):
+    assert ids(library.search('"rate schedule"')) == ["vid00000001"]
+    assert ids(library.search("grad*")) == ["vid00000003"]
+    result = library.search("bread")[0]
+    assert result["url"] == "https://www.youtube.com/watch?v=vid00000002"
+    assert "**bread**" in result["snippet"]
+
+
+def test_changed_transcript_is_reindexed(library):
+    library.add("vid00000002", "Now a talk about sourdough.", "Baking bread", "Food Channel", None)
+    assert "vid00000002" not in ids(library.search("optimizer"))
+    assert ids(library.search("sourdough")) == ["vid00000002"]
+    assert library.stats()["entries"] == 3
+
+
+def test_max_entries_drops_the_least_recently_updated():
+    library = TranscriptLibrary(":memory:", max_entries=2)
+    for index in range(3):
+        library.add(f"vid0000000{index}", f"transcript {index}", None, None, None)
+        time.sleep(0.01)
+    assert library.get("vid00000000") is None
+    assert ids(library.recent()) == ["vid00000002", "vid00000001"]
+
+
+def test_substring_fallback_returns_the_same_fields(library):
+    library.full_text = False
+    results = library.search("bread optimizer")
+    assert ids(results) == ["vid00000002"]
+    assert set(results[0]) == {"video_id", "url", "title", "channel", "date", "snippet"}
+    assert "**optimizer**" in results[0]["snippet"]
+
+
+def test_make_snippet_windows_long_text():
+    text = " ".join(f"w{i}" for i in range(100)) + " target " + " ".join(f"v{i}" for i in range(100))
+    snippet = make_snippet(text, ["target"], words=9)
+    assert snippet.startswith("… ") and snippet.endswith(" …")
+    assert "**target**" in snippet
+    assert len(snippet.split()) == 11
+
+
+def test_new_library_is_backfilled_from_the_transcript_cache(tmp_path, monkeypatch):
+    cache = TranscriptCache(":memory:", ttl_seconds=0, max_entries=0, max_bytes=0)
+    cache.put("vid00000009", "An old talk about compilers.", "Compilers", "CS Channel", None)
+    monkeypatch.setattr(library_module, "get_transcript_cache", lambda: cache)
+    monkeypatch.setenv("TRANSCRIPT_LIBRARY_PATH", str(tmp_path / "library.sqlite3"))
+
+    library = library_module.get_transcript_library.__wrapped__()
+    assert ids(library.search("compilers")) == ["vid00000009"]
+
+
+def test_expired_cache_entries_come_back_from_the_library(library, monkeypatch):
+    cache = TranscriptCache(":memory:", ttl_seconds=0, max_entries=0, max_bytes=0)
+    monkeypatch.setattr(transcripts, "get_transcript_cache", lambda: cache)
+    monkeypatch.setattr(transcripts, "get_transcript_library", lambda: library)
+    monkeypatch.setattr(transcripts, "TRANSCRIPT_LIBRARY", True)
+
+    assert transcripts.cached_transcript("vid00000002")["title"] == "Baking bread"
+    assert cache.get("vid00000002") is not None
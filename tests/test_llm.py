@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from yt.llm import (
+    EmptyResponseError, FirstTokenTimeout, ModelsCoolingDown, StreamInterrupted, classify_error, get_route_pool,
+    hedged_completion, route_completion
+)
+
+MESSAGES = [{"role": "user", "content": "Summarize this."}]
+
+
+class StatusError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def test_status_decides_over_message():
+    assert classify_error(StatusError("Error code: 429", 429)) == "rate_limited"
+    assert classify_error(StatusError("Error code: 500 - upstream timed out after 429 ms", 500)) == "error"
+    assert classify_error(StatusError("Error code: 400 - rate limit field missing", 400)) == "error"
+    assert classify_error(StatusError("Error code: 504", 504)) == "timeout"
+
+
+def test_not_found_and_data_policy():
+    assert classify_error(StatusError("Error code: 404 - No endpoints found", 404)) == "not_found"
+    assert classify_error(StatusError("No endpoints found matching your data policy", 404)) == "data_policy"
+
+
+def test_message_only_errors():
+    assert classify_error(RuntimeError("Provider returned error 429")) == "rate_limited"
+    assert classify_error(RuntimeError("Rate limit exceeded")) == "rate_limited"
+    assert classify_error(RuntimeError("Request timed out")) == "timeout"
+    # Numbers that merely contain 429 are not rate limits
+    assert classify_error(RuntimeError("context length is 14290 tokens")) == "error"
+
+
+def test_own_exceptions():
+    assert classify_error(EmptyResponseError("empty")) == "empty"
+    assert classify_error(FirstTokenTimeout("slow")) == "timeout"
+    assert classify_error(TimeoutError()) == "timeout"
+    assert classify_error(StreamInterrupted("m", "partial", RuntimeError("429 upstream"))) == "interrupted"
+    assert classify_error(ModelsCoolingDown("every model is cooling down")) == "rate_limited"
+
+
+def test_requested_model_is_asked_alone(model_server, client, router):
+    assert route_completion(client, MESSAGES, ["a", "b", "c"]) == ("answer from a", "a")
+    assert model_server.requests == ["a"]
+
+
+def test_failed_model_cools_down_and_fallbacks_race(model_server, client, router):
+    model_server.behaviour.update(a=404, b=5.0, c=0.2)
+    assert route_completion(client, MESSAGES, ["a", "b", "c"]) == ("answer from c", "c")
+    assert sorted(model_server.requests) == ["a", "b", "c"]
+    assert router.cooldown_remaining("a") > 0
+    assert router.order_models(["a", "b", "c"])[0] != "a"
+
+
+def test_losing_racer_is_dropped(model_server, client, router):
+    model_server.behaviour.update(a=404, b=5.0, c=0.2)
+    route_completion(client, MESSAGES, ["a", "b", "c"])
+    won_at = time.monotonic()
+
+    deadline = won_at + 2
+    while "b" not in model_server.dropped:
+        assert time.monotonic() < deadline, "the losing request was left running"
+        time.sleep(0.02)
+    # Being cancelled is not the loser's fault
+    assert router.error_rate("b") == 0
+
+
+def test_every_model_cooling_down(model_server, client, router):
+    model_server.behaviour.update(a=429, b=429)
+    with pytest.raises(Exception) as error:
+        route_completion(client, MESSAGES, ["a", "b"])
+    assert classify_error(error.value) == "rate_limited"
+    with pytest.raises(ModelsCoolingDown):
+        route_completion(client, MESSAGES, ["a", "b"])
+
+
+def test_races_share_one_pool():
+    assert get_route_pool() is get_route_pool()
+
+
+def wait_for_drop(model_server, model):
+    deadline = time.monotonic() + 2
+    while model not in model_server.dropped:
+        assert time.monotonic() < deadline, f"the {model} stream was left open"
+        time.sleep(0.02)
+
+
+def test_fast_primary_is_not_hedged(model_server, client, router):
+    rendered = []
+    result = hedged_completion(client, MESSAGES, ["a", "b"], on_text=lambda text, final: rendered.append((text, final)), hedge_delay=2)
+    assert (result["text"], result["model"]) == ("answer from a", "a")
+    assert model_server.requests == ["a"]
+    assert rendered[-1] == ("answer from a", True)
+
+
+def test_slow_primary_is_hedged_and_dropped(model_server, client, router):
+    model_server.behaviour.update(a=5.0, b=0.1)
+    started = time.monotonic()
+    result = hedged_completion(client, MESSAGES, ["a", "b"], hedge_delay=0.2)
+
+    assert result["model"] == "b"
+    assert time.monotonic() - started < 2
+    assert {attempt["model"]: attempt["outcome"] for attempt in result["attempts"]} == {"a": "cancelled", "b": "won"}
+    wait_for_drop(model_server, "a")
+
+
+def test_failed_attempt_starts_the_next_model_at_once(model_server, client, router):
+    model_server.behaviour.update(a=500)
+    started = time.monotonic()
+    result = hedged_completion(client, MESSAGES, ["a", "b"], hedge_delay=10)
+    assert result["model"] == "b"
+    assert time.monotonic() - started < 2
+    assert router.error_rate("a") == 1
+
+
+def test_every_attempt_failing_raises_the_last_error(model_server, client, router):
+    model_server.behaviour.update(a=500, b=404)
+    with pytest.raises(Exception) as error:
+        hedged_completion(client, MESSAGES, ["a", "b"], hedge_delay=10)
+    assert classify_error(error.value) == "not_found"
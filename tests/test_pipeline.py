@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+import yt.pipeline as pipeline
+from yt.cache import ResponseCache
+from yt.pipeline import BatchRun, parse_url_list
+from yt.summarize import SummaryError
+from yt.transcripts import TranscriptError
+
+URLS = [f"https://youtu.be/video{i:06d}" for i in range(5)]
+
+
+@pytest.fixture
+def offline_batch(monkeypatch):
+    """Batch runs against in-memory stand-ins for Apify, the response cache and the model"""
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(pipeline, "get_response_cache", lambda: ResponseCache(":memory:", 0, 0, 0))
+
+    def load_transcripts(urls, timestamps=False):
+        return {
+            url: TranscriptError("No transcript available.") if url.endswith("4") else (f"transcript of {url}", "Title", "Channel", None)
+            for url in urls
+        }
+
+    monkeypatch.setattr(pipeline, "load_transcripts", load_transcripts)
+    monkeypatch.setattr(pipeline, "summarize_transcript", lambda client, text, *args: f"summary of {text}")
+
+
+def test_parse_url_list():
+    assert parse_url_list("a, b\nc  d") == ["a", "b", "c", "d"]
+    assert parse_url_list(None) == []
+
+
+def test_missing_api_key_is_a_summary_error(monkeypatch):
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+    with pytest.raises(SummaryError):
+        BatchRun(URLS)
+
+
+def test_every_video_finishes(offline_batch):
+    statuses = []
+    batch = BatchRun(URLS + [URLS[0]], "m", urls_per_run=2, on_status=lambda url, status: statuses.append(status))
+    results = {result["url"]: result for result in batch.results()}
+
+    assert sorted(results) == URLS
+    assert results[URLS[0]]["summary"] == f"summary of transcript of {URLS[0]}"
+    assert results[URLS[4]]["status"] == "failed" and results[URLS[4]]["error"] == "No transcript available."
+    assert statuses.count("done") == 4 and statuses.count("failed") == 1
+
+
+def test_worker_threads_exit_after_the_batch(offline_batch):
+    batch = BatchRun(URLS, "m", urls_per_run=2)
+    list(batch.results())
+
+    deadline = time.time() + 5
+    while any(thread.name.startswith("batch-") for thread in threading.enumerate()):
+        assert time.time() < deadline, "batch worker threads were left running"
+        time.sleep(0.02)
+
+
+def test_each_compression_mode_has_its_own_cached_answers(monkeypatch):
+    variants = set()
+    for mode in ("off", "lossless", "lossy"):
+        monkeypatch.setattr(pipeline, "PROMPT_COMPRESSION", mode)
+        variants.add(pipeline.answer_variant(True))
+    assert len(variants) == 3
@@ -0,0 +1,60 @@
+from yt.retrieval import RETRIEVAL_MIN_TOKENS, TranscriptIndex, build_question_context, tokenize
+
+FILLER = "We keep talking about general things for a while here. "
+
+
+def long_transcript(topic_sentence: str, position: int = 150, sentences: int = 300) -> str:
+    """A transcript over the retrieval threshold with one distinctive sentence in it"""
+    parts = [FILLER] * sentences
+    parts[position] = topic_sentence + " "
+    return "".join(parts).strip()
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("What is the Gradient of a loss, x?") == ["gradient", "loss"]
+
+
+def test_search_ranks_the_matching_chunk_first():
+    index = TranscriptIndex(long_transcript("The gradient descent optimizer converges slowly."), chunk_tokens=100)
+    best = index.search("why does gradient descent converge slowly?", top_k=1)
+    assert len(best) == 1
+    assert "gradient descent" in index.chunks[best[0]]
+
+
+def test_rare_terms_outweigh_common_ones():
+    transcript = " ".join(["The model is big. " * 20, "The model uses dropout. ", "The model is big. " * 20])
+    index = TranscriptIndex(transcript, chunk_tokens=20)
+    assert "dropout" in index.chunks[index.search("model dropout", top_k=1)[0]]
+
+
+def test_offsets_point_at_each_chunk():
+    transcript = long_transcript("Something specific happens here.")
+    index = TranscriptIndex(transcript, chunk_tokens=100)
+    for chunk, offset in zip(index.chunks, index.offsets):
+        assert transcript[offset:offset + len(chunk)] == chunk
+
+
+def test_short_transcripts_are_sent_whole():
+    transcript = "A short talk about gradient descent."
+    assert RETRIEVAL_MIN_TOKENS > 10
+    assert build_question_context(transcript, "gradient descent?") == transcript
+
+
+def test_long_transcripts_send_only_excerpts():
+    transcript = long_transcript("The gradient descent optimizer converges slowly.")
+    context = build_question_context(transcript, "gradient descent", "vid00000001", top_k=2)
+    assert context.startswith("[Excerpt 1 of ")
+    assert "gradient descent optimizer" in context
+    assert len(context) < len(transcript) / 4
+
+
+def test_no_keyword_overlap_falls_back_to_the_whole_transcript():
+    transcript = long_transcript("The gradient descent optimizer converges slowly.")
+    assert build_question_context(transcript, "what is this about?", "vid00000002") == transcript
+
+
+def test_changed_text_for_the_same_video_is_reindexed():
+    first = long_transcript("The gradient descent optimizer converges slowly.")
+    second = long_transcript("The momentum optimizer converges quickly.")
+    assert "gradient" in build_question_context(first, "optimizer converges", "vid00000003", top_k=1)
+    assert "momentum" in build_question_context(second, "optimizer converges", "vid00000003", top_k=1)
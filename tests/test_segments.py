@@ -0,0 +1,65 @@
+import pytest
+
+from yt.segments import SegmentCache, SegmentedTranscript, format_timestamp, item_segments, link_timestamps, parse_time
+
+
+@pytest.mark.parametrize("value, seconds", [
+    (12, 12.0), ("12.5", 12.5), ("12.5s", 12.5), ("1:02", 62.0), ("1:02:03,5", 3723.5), ("", None), ("soon", None)
+])
+def test_parse_time(value, seconds):
+    assert parse_time(value) == seconds
+
+
+def test_format_timestamp():
+    assert format_timestamp(5) == "0:05"
+    assert format_timestamp(125.9) == "2:05"
+    assert format_timestamp(3723) == "1:02:03"
+
+
+def test_link_timestamps():
+    answer = "It starts at [1:05] and ends at [1:02:03]."
+    assert link_timestamps(answer, "dQw4w9WgXcQ") == (
+        "It starts at [1:05](https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=65s) and ends at "
+        "[1:02:03](https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=3723s)."
+    )
+
+
+def test_link_timestamps_leaves_existing_links_and_unknown_videos():
+    linked = "See [1:05](https://example.com)."
+    assert link_timestamps(linked, "dQw4w9WgXcQ") == linked
+    assert link_timestamps("At [1:05].", None) == "At [1:05]."
+
+
+def test_item_segments_from_the_actor_shapes():
+    assert item_segments({"data": [{"start": "1.5", "dur": "2", "text": "hello"}, {"oops": True}]}) == [(1.5, 3.5, "hello")]
+    assert item_segments({"startMs": 2500, "text": "hi"}) == [(2.5, None, "hi")]
+    assert item_segments({"transcript": "0:01 hello\nthere\n0:05 world"}) == [(1.0, None, "hello there"), (5.0, None, "world")]
+    assert item_segments({"title": "no captions"}) == []
+
+
+def sample() -> SegmentedTranscript:
+    return SegmentedTranscript.from_segments([(40.0, None, "third  part"), (0.0, 10.0, "first part"), (10.0, None, "second part")])
+
+
+def test_segments_are_ordered_over_one_text():
+    segments = sample()
+    assert segments.text == "first part second part third part"
+    assert segments.segment(1) == (10.0, 40.0, "second part")
+    assert segments.time_at(segments.text.index("third")) == 40.0
+
+
+def test_timecoded_marks_at_most_every_interval():
+    assert sample().timecoded(interval=30) == "[0:00] first part second part [0:40] third part"
+    segments = sample()
+    start = segments.text.index("second")
+    assert segments.timecoded(start, interval=30) == "[0:10] second part [0:40] third part"
+
+
+def test_binary_roundtrip_and_cache():
+    segments = sample()
+    restored = SegmentedTranscript.from_bytes(segments.to_bytes())
+    assert (restored.text, list(restored.starts), list(restored.ends)) == (segments.text, list(segments.starts), list(segments.ends))
+
+    cache = SegmentCache(":memory:", ttl_seconds=0, max_entries=0, max_bytes=0)
+    cache.put("vid", segments)
+    assert cache.get("vid").text == segments.text
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from yt.server import MAX_BODY_BYTES, HTTPError, read_request
+
+
+def parse(raw: bytes):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await read_request(reader)
+    return asyncio.run(run())
+
+
+def test_get_with_query_string():
+    method, path, params, keep_alive = parse(b"GET /summarize/?url=abc&model=m HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert (method, path, params, keep_alive) == ("GET", "/summarize", {"url": "abc", "model": "m"}, True)
+
+
+def test_post_body_overrides_query():
+    body = b'{"url": "from-body", "history": []}'
+    raw = b"POST /ask?url=from-query HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+    assert parse(raw)[2] == {"url": "from-body", "history": []}
+
+
+def test_keep_alive_follows_version_and_header():
+    assert parse(b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n")[3] is False
+    assert parse(b"GET / HTTP/1.0\r\n\r\n")[3] is False
+    assert parse(b"GET / HTTP/1.0\r\nConnection: keep-alive\r\n\r\n")[3] is True
+
+
+def test_client_hung_up():
+    assert parse(b"") is None
+
+
+@pytest.mark.parametrize("raw, status", [
+    (b"GARBAGE\r\n\r\n", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: -1\r\n\r\n", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: 1_0\r\n\r\n", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: abc\r\n\r\n", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: 2\r\n\r\n[]", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: 3\r\n\r\n{x}", 400),
+    (b"POST /ask HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (MAX_BODY_BYTES + 1), 413),
+])
+def test_rejects_bad_requests(raw, status):
+    with pytest.raises(HTTPError) as error:
+        parse(raw)
+    assert error.value.status == status
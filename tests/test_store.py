@@ -0,0 +1,62 @@
+from yt.store import TranscriptStore, deep_size, transcript_digest
+
+
+def test_roundtrip_compressed_and_plain():
+    for compress in (True, False):
+        store = TranscriptStore(max_bytes=1 << 20, compress=compress)
+        store.put("v1", "hello world " * 100)
+        assert store.get("v1") == "hello world " * 100
+        assert store.get("missing") is None
+        stats = store.stats()
+        assert (stats["hits"], stats["misses"], stats["raw_bytes"]) == (1, 1, len("hello world " * 100))
+
+
+def test_put_replaces_changed_text():
+    store = TranscriptStore(max_bytes=1 << 20, compress=False)
+    store.put("v1", "first version")
+    store.put("v1", "second, longer version")
+
+    assert store.get("v1") == "second, longer version"
+    stats = store.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] == stats["raw_bytes"] == len("second, longer version")
+
+
+def test_put_same_text_keeps_the_entry():
+    store = TranscriptStore(max_bytes=1 << 20)
+    store.put("v1", "same text")
+    before = store.stats()
+    store.put("v1", "same text")
+    assert store.stats() == before
+
+
+def test_evicts_least_recently_used():
+    store = TranscriptStore(max_bytes=25, compress=False)
+    store.put("a", "a" * 10)
+    store.put("b", "b" * 10)
+    assert store.get("a") == "a" * 10  # now more recently used than "b"
+    store.put("c", "c" * 10)
+
+    assert store.get("b") is None
+    assert store.get("a") == "a" * 10
+    assert store.get("c") == "c" * 10
+    stats = store.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 20, 1)
+
+
+def test_keeps_the_newest_entry_even_when_oversized():
+    store = TranscriptStore(max_bytes=5, compress=False)
+    store.put("a", "a" * 3)
+    store.put("big", "b" * 50)
+
+    assert store.get("a") is None
+    assert store.get("big") == "b" * 50
+
+
+def test_digest_tells_changed_text_apart():
+    assert transcript_digest("same") == transcript_digest("same")
+    assert transcript_digest("same") != transcript_digest("changed")
+
+
+def test_deep_size_counts_nested_values():
+    assert deep_size(["x" * 1000, {"key": "y" * 1000}]) > 2000
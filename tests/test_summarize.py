@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+import yt.summarize as summarize
+from yt.summarize import SummaryError, summarize_chunks
+
+
+def test_keeps_chunk_order_and_reports_progress(monkeypatch):
+    def complete(client, prompt, models_to_try):
+        part = prompt.split("PART-")[1].split()[0]
+        time.sleep(0.05 if part == "0" else 0)  # the first part finishes last
+        return f"notes {part}"
+
+    monkeypatch.setattr(summarize, "request_completion", complete)
+    progress = []
+    results = summarize_chunks(None, [f"PART-{i} text" for i in range(5)], ["m"], on_progress=lambda done, total: progress.append((done, total)))
+
+    assert results == [f"notes {i}" for i in range(5)]
+    assert progress[0] == (0, 5) and progress[-1] == (5, 5)
+
+
+def test_failure_names_the_part(monkeypatch):
+    def complete(client, prompt, models_to_try):
+        if "PART-2" in prompt:
+            raise RuntimeError("Error code: 401")
+        return "notes"
+
+    monkeypatch.setattr(summarize, "request_completion", complete)
+    with pytest.raises(SummaryError, match="part 3"):
+        summarize_chunks(None, [f"PART-{i}" for i in range(4)], ["m"])
+
+
+def test_stops_reading_lazy_chunks_after_a_failure(monkeypatch):
+    def complete(client, prompt, models_to_try):
+        raise RuntimeError("Error code: 401 - invalid key")
+
+    read = []
+
+    def slow_transcript():
+        for i in range(50):
+            time.sleep(0.02)
+            read.append(i)
+            yield f"PART-{i}"
+
+    monkeypatch.setattr(summarize, "request_completion", complete)
+    with pytest.raises(SummaryError):
+        summarize_chunks(None, slow_transcript(), ["m"])
+    assert len(read) < 5
+
+
+def test_slots_bound_concurrent_completions(monkeypatch):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def complete(client, prompt, models_to_try):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return "notes"
+
+    monkeypatch.setattr(summarize, "request_completion", complete)
+    summarize_chunks(None, [f"PART-{i}" for i in range(8)], ["m"], slots=threading.Semaphore(1))
+    assert peak[0] == 1
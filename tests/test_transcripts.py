@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+import yt.transcripts as transcripts
+from yt.cache import TranscriptCache
+from yt.jobs import SingleFlight
+from yt.transcripts import TranscriptError, TranscriptStream, open_transcript
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+class Stopped(BaseException):
+    """Stands in for Streamlit stopping a script run"""
+
+
+class FakeActor:
+    """Dataset items per run, handed out one at a time; ``gate`` holds back the items after the first"""
+
+    def __init__(self):
+        self.items = [{"videoTitle": "Title", "channelName": "Channel", "text": "hello  there"}, {"text": "general\nkenobi"}]
+        self.failure = None
+        self.runs = 0
+        self.read = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def iter_items(self, urls, timestamps=False):
+        self.runs += 1
+        for index, item in enumerate(self.items):
+            if index:
+                assert self.gate.wait(5)
+            self.read += 1
+            yield item
+        if self.failure is not None:
+            failure, self.failure = self.failure, None
+            raise failure
+
+
+@pytest.fixture
+def actor(monkeypatch):
+    actor = FakeActor()
+    cache = TranscriptCache(":memory:", ttl_seconds=0, max_entries=0, max_bytes=0)
+    monkeypatch.setattr(transcripts, "iter_actor_items", actor.iter_items)
+    monkeypatch.setattr(transcripts, "get_transcript_cache", lambda: cache)
+    monkeypatch.setattr(transcripts, "get_single_flight", lambda flight=SingleFlight(): flight)
+    monkeypatch.setattr(transcripts, "TRANSCRIPT_LIBRARY", False)
+    actor.cache = cache
+    return actor
+
+
+def open_in_thread(outcome):
+    def run():
+        try:
+            outcome.append(open_transcript(URL).result())
+        except BaseException as e:
+            outcome.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for_waiter():
+    deadline = time.time() + 5
+    while transcripts.get_single_flight().stats()["transcript"]["coalesced"] < 1:
+        assert time.time() < deadline, "the second session never joined"
+        time.sleep(0.01)
+
+
+def test_metadata_is_known_before_the_text_is_read(actor):
+    stream = open_transcript(URL)
+    assert (stream.title, stream.channel, actor.read) == ("Title", "Channel", 1)
+    assert list(stream) == ["hello there", "general kenobi"]
+    assert actor.cache.get("dQw4w9WgXcQ")["transcript"] == "hello there general kenobi"
+
+
+def test_close_reads_the_rest_and_caches_it(actor):
+    stream = open_transcript(URL)
+    next(iter(stream))
+    stream.close()
+    assert actor.read == 2
+    assert actor.cache.get("dQw4w9WgXcQ")["transcript"] == "hello there general kenobi"
+
+    cached = open_transcript(URL)
+    assert cached.result()[0] == "hello there general kenobi"
+    assert actor.runs == 1
+
+
+def test_second_session_waits_for_the_first(actor):
+    actor.gate.clear()
+    stream = open_transcript(URL)
+    outcome = []
+    waiter = open_in_thread(outcome)
+    wait_for_waiter()
+
+    actor.gate.set()
+    assert stream.result() == ("hello there general kenobi", "Title", "Channel", None)
+    waiter.join(5)
+    assert outcome == [("hello there general kenobi", "Title", "Channel", None)]
+    assert actor.runs == 1
+
+
+def test_waiting_session_gets_the_error(actor):
+    actor.gate.clear()
+    actor.failure = RuntimeError("dataset read failed")
+    stream = open_transcript(URL)
+    outcome = []
+    waiter = open_in_thread(outcome)
+    wait_for_waiter()
+
+    actor.gate.set()
+    with pytest.raises(RuntimeError):
+        stream.text
+    waiter.join(5)
+    assert isinstance(outcome[0], RuntimeError)
+
+
+def test_empty_dataset_is_a_transcript_error(actor):
+    actor.items = [{"videoTitle": "Title"}]
+    with pytest.raises(TranscriptError):
+        list(open_transcript(URL))
+    with pytest.raises(TranscriptError):
+        open_transcript(URL).result()
+
+
+def test_waiter_extracts_itself_when_the_first_session_stops(actor):
+    actor.gate.clear()
+    actor.failure = Stopped()
+    stream = open_transcript(URL)
+    outcome = []
+    waiter = open_in_thread(outcome)
+    wait_for_waiter()
+
+    actor.gate.set()
+    with pytest.raises(Stopped):
+        stream.text
+    waiter.join(5)
+    assert outcome == [("hello there general kenobi", "Title", "Channel", None)]
+    assert actor.runs == 2
+
+
+def test_complete_stream_needs_no_actor(actor):
+    stream = TranscriptStream.complete(URL, "whole text", "Title", "Channel", None)
+    assert list(stream) == ["whole text"]
+    assert actor.runs == 0
@@ -0,0 +1,45 @@
+"""Headless YouTube transcript summarizer
+
+Everything here runs without Streamlit: errors are raised as exceptions (TranscriptError,
+SummaryError) and progress is reported through callbacks. ``app.py`` is the web UI on top.
+"""
+from .cache import get_response_cache, get_transcript_cache, response_cache_key
+from .catalog import fetch_model_context_lengths, fetch_openrouter_models, get_model_catalog
+from .compression import compress_transcript
+from .library import get_transcript_library
+from .llm import DEFAULT_MODEL
+from .metrics import get_metrics
+from .pipeline import BatchRun, generate_answer, summarize_video
+from .retrieval import build_question_context
+from .segments import SegmentedTranscript, get_transcript_segments, link_timestamps
+from .summarize import SummaryError, answer_in_chat, summarize_long_text, summarize_text, summarize_transcript
+from .transcripts import TranscriptError, extract_video_id, load_transcript, load_transcripts
+
+__all__ = [
+    "DEFAULT_MODEL",
+    "BatchRun",
+    "SegmentedTranscript",
+    "SummaryError",
+    "TranscriptError",
+    "answer_in_chat",
+    "build_question_context",
+    "compress_transcript",
+    "extract_video_id",
+    "fetch_model_context_lengths",
+    "fetch_openrouter_models",
+    "generate_answer",
+    "get_metrics",
+    "get_model_catalog",
+    "get_response_cache",
+    "get_transcript_cache",
+    "get_transcript_library",
+    "get_transcript_segments",
+    "link_timestamps",
+    "load_transcript",
+    "load_transcripts",
+    "response_cache_key",
+    "summarize_long_text",
+    "summarize_text",
+    "summarize_transcript",
+    "summarize_video",
+]
@@ -0,0 +1,198 @@
+"""On-disk SQLite caches for transcripts and finished answers, shared by every session"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+from .metrics import get_metrics
+from .prompts import PROMPT_TEMPLATE_VERSION
+
+
+class SQLiteLRUCache:
+    """SQLite-backed store with TTL, entry/size limits, LRU eviction and hit/miss counters
+
+    Subclasses define the table schema; every table needs ``size``, ``created_at`` and ``accessed_at`` columns.
+    """
+
+    table = ""
+    key_column = ""
+    schema = ""
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, max_bytes: int):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(self.schema)
+        self._conn.commit()
+
+    def _lookup(self, key: str, columns: str) -> Optional[tuple]:
+        """Fetch columns for a key, counting the hit/miss and refreshing its LRU position"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {columns}, created_at FROM {self.table} WHERE {self.key_column} = ?",
+                (key,)
+            ).fetchone()
+            if row and self.ttl_seconds and now - row[-1] > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if not row:
+                self.misses += 1
+            else:
+                self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE {self.key_column} = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+        get_metrics().cache_lookup(self.table, bool(row))
+        return row[:-1] if row else None
+
+    def _store(self, values: tuple) -> None:
+        """Insert or replace a full row, then evict stale or least recently used entries"""
+        now = time.time()
+        placeholders = ", ".join("?" * (len(values) + 2))
+        with self._lock:
+            self._conn.execute(f"INSERT OR REPLACE INTO {self.table} VALUES ({placeholders})", values + (now, now))
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.ttl_seconds:
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.evictions += max(cursor.rowcount, 0)
+
+        # Walk entries from most to least recently used and drop whatever exceeds the limits
+        rows = self._conn.execute(f"SELECT {self.key_column}, size FROM {self.table} ORDER BY accessed_at DESC").fetchall()
+        total_bytes = 0
+        stale_keys = []
+        for position, (key, size) in enumerate(rows):
+            total_bytes += size
+            if (self.max_entries and position >= self.max_entries) or (self.max_bytes and total_bytes > self.max_bytes):
+                stale_keys.append((key,))
+        if stale_keys:
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", stale_keys)
+            self.evictions += len(stale_keys)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters plus current entry count and size"""
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total_bytes
+        }
+
+
+class TranscriptCache(SQLiteLRUCache):
+    """Shared on-disk transcript store keyed by video ID"""
+
+    table = "transcripts"
+    key_column = "video_id"
+    schema = """
+        CREATE TABLE IF NOT EXISTS transcripts (
+            video_id TEXT PRIMARY KEY,
+            transcript TEXT NOT NULL,
+            title TEXT,
+            channel TEXT,
+            date TEXT,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+    """
+
+    def get(self, video_id: str) -> Optional[Dict[str, str]]:
+        """Return the cached entry for a video, or None on a miss or expired entry"""
+        row = self._lookup(video_id, "transcript, title, channel, date")
+        if not row:
+            return None
+        return {"transcript": row[0], "title": row[1], "channel": row[2], "date": row[3]}
+
+    def put(self, video_id: str, transcript: str, title: str, channel: str, date: Optional[str]) -> None:
+        """Store a transcript and evict stale or least recently used entries"""
+        self._store((video_id, transcript, title, channel, date, len(transcript.encode("utf-8"))))
+
+    def entries(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """Every cached (video_id, entry) pair, without counting lookups or refreshing LRU positions"""
+        with self._lock:
+            rows = self._conn.execute("SELECT video_id, transcript, title, channel, date FROM transcripts").fetchall()
+        for video_id, transcript, title, channel, date in rows:
+            yield video_id, {"transcript": transcript, "title": title, "channel": channel, "date": date}
+
+
+class ResponseCache(SQLiteLRUCache):
+    """Shared on-disk store of finished LLM answers keyed by response_cache_key()"""
+
+    table = "responses"
+    key_column = "cache_key"
+    schema = """
+        CREATE TABLE IF NOT EXISTS responses (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            model TEXT,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+    """
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """Return the cached response text, or None on a miss or expired entry"""
+        row = self._lookup(cache_key, "response")
+        return row[0] if row else None
+
+    def put(self, cache_key: str, response: str, model: str) -> None:
+        """Store a response and evict stale or least recently used entries"""
+        self._store((cache_key, response, model, len(response.encode("utf-8"))))
+
+
+def normalize_question(question: Optional[str]) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a question"""
+    return re.sub(r'\s+', ' ', (question or "").lower()).strip().rstrip("?!. ")
+
+
+def response_cache_key(video_id: str, question: Optional[str], model: str, variant: str = "") -> str:
+    """Hash of everything that determines an answer: video, question, model and prompt templates"""
+    payload = json.dumps([video_id, normalize_question(question), model, PROMPT_TEMPLATE_VERSION, variant])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_transcript_cache() -> TranscriptCache:
+    """Process-wide transcript cache shared by every session"""
+    return TranscriptCache(
+        path=os.getenv("TRANSCRIPT_CACHE_PATH", os.path.join(".cache", "transcripts.sqlite3")),
+        ttl_seconds=float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+        max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", 500)),
+        max_bytes=int(float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", 200)) * 1024 * 1024)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache of generated summaries and answers shared by every session"""
+    return ResponseCache(
+        path=os.getenv("RESPONSE_CACHE_PATH", os.path.join(".cache", "responses.sqlite3")),
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 24 * 3600)),
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 5000)),
+        max_bytes=int(float(os.getenv("RESPONSE_CACHE_MAX_MB", 50)) * 1024 * 1024)
+    )
@@ -0,0 +1,228 @@
+"""OpenRouter model catalog: full model metadata, refreshed in the background and persisted to disk"""
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .clients import HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_TIMEOUT_SECONDS, OPENROUTER_BASE_URL, get_http_session
+
+MODEL_LIST_TTL_SECONDS = float(os.getenv("MODEL_LIST_TTL_SECONDS", 3600))
+# Start a background refresh once this share of the TTL has passed
+MODEL_LIST_REFRESH_AHEAD = float(os.getenv("MODEL_LIST_REFRESH_AHEAD", 0.8))
+MODEL_LIST_RETRY_SECONDS = float(os.getenv("MODEL_LIST_RETRY_SECONDS", 60))
+MODEL_CATALOG_PATH = os.getenv("MODEL_CATALOG_PATH", os.path.join(".cache", "models.json"))
+MODEL_VENDORS = ("google", "deepseek", "qwen")  # Gemini (google), Deepseek, Qwen (includes Qwen3 variants)
+
+
+class ModelCatalogError(Exception):
+    """Raised when the model list could not be fetched and no earlier copy is available"""
+
+
+class ModelCatalog:
+    """Every OpenRouter model with its metadata (context length, pricing, modalities, ...)
+
+    Reads never wait on the network once any copy exists: a copy older than the refresh-ahead
+    point is served while a background thread fetches a new one, a failed refresh keeps serving
+    the old copy (retrying after ``retry_seconds``), and each successful fetch is written to disk
+    so a cold start begins with the last known catalog.
+    """
+
+    def __init__(self, api_key: str, path: str = MODEL_CATALOG_PATH, ttl_seconds: float = MODEL_LIST_TTL_SECONDS, refresh_ahead: float = MODEL_LIST_REFRESH_AHEAD, retry_seconds: float = MODEL_LIST_RETRY_SECONDS):
+        self.api_key = api_key
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.refresh_ahead = refresh_ahead
+        self.retry_seconds = retry_seconds
+        self.fetches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._cold_fetch_lock = threading.Lock()
+        self._models: Optional[Dict[str, dict]] = None
+        self._fetched_at = 0.0
+        self._source = None
+        self._refreshing = False
+        self._retry_at = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        """Start from the copy on disk, however old"""
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                saved = json.load(handle)
+            self._models = {model["id"]: model for model in saved["data"] if model.get("id")}
+            self._fetched_at = float(saved["fetched_at"])
+            self._source = "disk"
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save(self, data: List[dict], fetched_at: float) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump({"fetched_at": fetched_at, "data": data}, handle)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def fetch(self) -> Dict[str, dict]:
+        """Fetch the catalog now; raises ModelCatalogError (keeping the old copy) on failure"""
+        try:
+            response = get_http_session().get(
+                f"{OPENROUTER_BASE_URL}/models",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=(HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_TIMEOUT_SECONDS)
+            )
+            response.raise_for_status()
+            data = response.json()["data"]
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._retry_at = time.time() + self.retry_seconds
+            raise ModelCatalogError(f"Could not fetch the OpenRouter model list: {e}") from e
+
+        fetched_at = time.time()
+        models = {model["id"]: model for model in data if model.get("id")}
+        with self._lock:
+            self._models = models
+            self._fetched_at = fetched_at
+            self._source = "network"
+            self.fetches += 1
+            self.last_error = None
+        self._save(data, fetched_at)
+        return models
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.fetch()
+        except ModelCatalogError:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            models = self._models
+            age = time.time() - self._fetched_at
+            due = age >= self.ttl_seconds * self.refresh_ahead and time.time() >= self._retry_at
+            start_refresh = models is not None and due and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+        if models is None:
+            # Nothing on disk or in memory yet: one caller waits for the network, the rest wait for it
+            with self._cold_fetch_lock:
+                if self._models is not None:
+                    return self._models
+                if time.time() < self._retry_at:
+                    raise ModelCatalogError(f"Could not fetch the OpenRouter model list: {self.last_error}")
+                return self.fetch()
+        if start_refresh:
+            threading.Thread(target=self._refresh_in_background, name="model-catalog", daemon=True).start()
+        return models
+
+    def models(self) -> List[dict]:
+        """Metadata of every model; raises ModelCatalogError only when no copy exists at all"""
+        return list(self._snapshot().values())
+
+    def get(self, model_id: str) -> Optional[dict]:
+        """Metadata of one model, or None if it is unknown or no catalog could be fetched"""
+        try:
+            return self._snapshot().get(model_id)
+        except ModelCatalogError:
+            return None
+
+    def context_length(self, model_id: str) -> Optional[int]:
+        model = self.get(model_id) or {}
+        return int(model["context_length"]) if model.get("context_length") else None
+
+    def fits(self, model_id: str, prompt_tokens: int) -> bool:
+        """Whether a prompt fits the model's context window (assumed true when it is unknown)"""
+        context_length = self.context_length(model_id)
+        return context_length is None or prompt_tokens < context_length
+
+    def stats(self) -> Dict[str, object]:
+        """Catalog size, age and source plus fetch/failure counters"""
+        with self._lock:
+            return {
+                "models": len(self._models or {}),
+                "age_seconds": round(time.time() - self._fetched_at) if self._models is not None else None,
+                "source": self._source,
+                "refreshing": self._refreshing,
+                "fetches": self.fetches,
+                "failures": self.failures,
+                "last_error": self.last_error
+            }
+
+
+@lru_cache(maxsize=None)
+def get_model_catalog(api_key: str) -> ModelCatalog:
+    """Model catalog shared by every session"""
+    return ModelCatalog(api_key)
+
+
+def model_price(model: dict, kind: str) -> float:
+    try:
+        return float(model.get("pricing", {}).get(kind) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def fetch_openrouter_model_data(api_key: str) -> List[dict]:
+    """Full metadata of every OpenRouter model, or [] if it has never been fetched successfully"""
+    try:
+        return get_model_catalog(api_key).models()
+    except ModelCatalogError:
+        return []
+
+
+def fetch_openrouter_models(api_key: str) -> List[str]:
+    """Fetch free/low-cost models from OpenRouter API for Google, DeepSeek, and Qwen vendors"""
+    vendor_models = [
+        model for model in fetch_openrouter_model_data(api_key)
+        if any(vendor in model["id"].lower() for vendor in MODEL_VENDORS)
+    ]
+
+    # First try to get completely free models
+    free_models = [
+        model["id"] for model in vendor_models
+        if model.get("pricing", {}).get("prompt") == "0"
+        and model.get("pricing", {}).get("completion") == "0"
+    ]
+    if free_models:
+        return free_models
+
+    # If no free models, include very low-cost models (under $0.001 per token)
+    return [
+        model["id"] for model in vendor_models
+        if 0 < model_price(model, "prompt") < 0.001
+        and 0 < model_price(model, "completion") < 0.001
+    ]
+
+
+def fetch_model_context_lengths(api_key: str) -> Dict[str, int]:
+    """Map each OpenRouter model id to its context window in tokens"""
+    return {
+        model["id"]: int(model["context_length"])
+        for model in fetch_openrouter_model_data(api_key)
+        if model.get("context_length")
+    }
+
+
+def describe_model(model: Optional[dict]) -> str:
+    """Short context-and-price line for a model, for the model picker"""
+    if not model:
+        return ""
+    parts = []
+    if model.get("context_length"):
+        parts.append(f"{int(model['context_length']):,}-token context")
+    prompt_price, completion_price = model_price(model, "prompt"), model_price(model, "completion")
+    if prompt_price == 0 and completion_price == 0:
+        parts.append("free")
+    else:
+        parts.append(f"${prompt_price * 1e6:.2f} / ${completion_price * 1e6:.2f} per million input / output tokens")
+    return " · ".join(parts)
@@ -0,0 +1,129 @@
+"""Multi-turn questions about one video: a stable transcript prefix, compacted history and prompt-cache hints"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .chunking import chunk_token_budget, estimate_tokens
+from .prompts import CITE_TIMESTAMPS_INSTRUCTION
+
+CHAT_MODE = os.getenv("CHAT_MODE", "true").lower() in ("1", "true", "yes")
+CHAT_VERBATIM_TURNS = int(os.getenv("CHAT_VERBATIM_TURNS", 4))
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", 2000))
+CHAT_DIGEST_ANSWER_CHARS = 300
+PROMPT_CACHE_HINTS = os.getenv("PROMPT_CACHE_HINTS", "true").lower() in ("1", "true", "yes")
+# Providers that only cache a prefix when it carries an explicit cache_control breakpoint;
+# the others (OpenAI, DeepSeek, ...) cache repeated prefixes on their own
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+CHAT_INSTRUCTIONS = (
+    "You answer questions about one YouTube video using its transcript below. "
+    "Base every answer on the transcript; say so when it does not cover the question. "
+    "Later questions may refer to earlier answers in this conversation."
+)
+CHAT_SUMMARY_REQUEST = "Provide a concise summary of this video that captures the main points and key information."
+
+Turn = Tuple[str, str]
+
+
+def chat_question(question: Optional[str]) -> str:
+    """The user turn for a question, or the summary request when there is none"""
+    return question.strip() if question and question.strip() else CHAT_SUMMARY_REQUEST
+
+
+def chat_prefix(text: str, video_title=None, channel_name=None, cite_timestamps=False) -> str:
+    """System message holding the transcript; byte-identical for every question about the same video"""
+    parts = [CHAT_INSTRUCTIONS]
+    if cite_timestamps:
+        parts.append(CITE_TIMESTAMPS_INSTRUCTION)
+    if video_title:
+        parts.append(f'Video: "{video_title}"' + (f' from the channel "{channel_name}"' if channel_name else ""))
+    parts.append(f"Transcript:\n{text}")
+    return "\n\n".join(parts)
+
+
+def history_tokens(history: Sequence[Turn]) -> int:
+    return sum(estimate_tokens(question) + estimate_tokens(answer) for question, answer in history)
+
+
+def compact_history(history: Sequence[Turn]) -> Tuple[Optional[str], List[Turn]]:
+    """Split earlier turns into an abridged digest of the old ones and the recent ones kept verbatim
+
+    At most CHAT_VERBATIM_TURNS recent turns within CHAT_HISTORY_MAX_TOKENS are kept whole; older
+    turns keep their question and the start of their answer, oldest first so the digest only
+    grows at its end.
+    """
+    recent, tokens = [], 0
+    for question, answer in reversed(history):
+        cost = estimate_tokens(question) + estimate_tokens(answer)
+        if len(recent) >= CHAT_VERBATIM_TURNS or (recent and tokens + cost > CHAT_HISTORY_MAX_TOKENS):
+            break
+        recent.insert(0, (question, answer))
+        tokens += cost
+
+    older = history[:len(history) - len(recent)]
+    if not older:
+        return None, recent
+    lines = []
+    for question, answer in older:
+        answer = " ".join(answer.split())
+        if len(answer) > CHAT_DIGEST_ANSWER_CHARS:
+            answer = answer[:CHAT_DIGEST_ANSWER_CHARS].rsplit(" ", 1)[0] + " …"
+        lines.append(f"Q: {question.strip()}\nA: {answer}")
+    # Keep the digest within the history budget, dropping its oldest turns first
+    while len(lines) > 1 and estimate_tokens("\n\n".join(lines)) > CHAT_HISTORY_MAX_TOKENS:
+        lines.pop(0)
+    return "Earlier in this conversation (abridged):\n\n" + "\n\n".join(lines), recent
+
+
+def supports_cache_control(model: Optional[str]) -> bool:
+    return PROMPT_CACHE_HINTS and bool(model) and model.lower().startswith(CACHE_CONTROL_MODEL_PREFIXES)
+
+
+def _content(text: str, cache_hint: bool):
+    if not cache_hint:
+        return text
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+def build_chat_messages(text: str, question: str, history: Sequence[Turn] = (), video_title=None, channel_name=None, cite_timestamps=False, model: Optional[str] = None) -> List[Dict[str, object]]:
+    """Messages for a question in a conversation about one video
+
+    The transcript prefix comes first and never changes, so providers can reuse it from the
+    previous turn; models that need explicit breakpoints get cache_control on the prefix and on
+    the latest answer.
+    """
+    cache_hint = supports_cache_control(model)
+    messages = [{"role": "system", "content": _content(chat_prefix(text, video_title, channel_name, cite_timestamps), cache_hint)}]
+
+    digest, recent = compact_history(history)
+    if digest:
+        messages.append({"role": "system", "content": digest})
+    for index, (earlier_question, earlier_answer) in enumerate(recent):
+        messages.append({"role": "user", "content": earlier_question})
+        messages.append({"role": "assistant", "content": _content(earlier_answer, cache_hint and index == len(recent) - 1)})
+    messages.append({"role": "user", "content": chat_question(question)})
+    return messages
+
+
+def chat_history_for(transcript: str, history: Optional[Sequence[Turn]], model: Optional[str], context_lengths: Optional[Dict[str, int]] = None) -> Optional[List[Turn]]:
+    """The conversation to answer within, or None when the request takes the single-prompt path
+
+    ``history`` is None when the caller did not ask for conversation mode. A first question (empty
+    history) keeps the retrieval path, and a transcript too long for one prompt falls back to the
+    excerpt or map-reduce path.
+    """
+    if not history or not chat_fits(transcript, history, model, context_lengths):
+        return None
+    return [tuple(turn) for turn in history]
+
+
+def chat_fits(transcript: str, history: Sequence[Turn], model: Optional[str], context_lengths: Optional[Dict[str, int]] = None) -> bool:
+    """Whether the whole transcript plus the conversation so far fits one prompt for the model"""
+    budget = chunk_token_budget((context_lengths or {}).get(model))
+    return estimate_tokens(transcript) + min(history_tokens(history), CHAT_HISTORY_MAX_TOKENS * 2) <= budget
+
+
+def chat_variant(history: Sequence[Turn]) -> str:
+    """Response cache variant for a chat answer; it depends on the conversation so far"""
+    digest = hashlib.sha256(json.dumps([list(turn) for turn in history]).encode("utf-8")).hexdigest()[:16]
+    return f"chat:{digest}"
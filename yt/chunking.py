@@ -0,0 +1,72 @@
+"""Token estimates and transcript splitting shared by chunked summaries and retrieval"""
+import os
+import re
+from typing import Iterable, Iterator, List, Optional
+
+CHARS_PER_TOKEN = 4
+DEFAULT_CONTEXT_LENGTH = 32768
+PROMPT_OVERHEAD_TOKENS = 500
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 12000))
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def chunk_token_budget(context_length: Optional[int]) -> int:
+    """Largest transcript chunk in tokens that still leaves room for instructions and the answer"""
+    # Keep about a third of the window free for the prompt wrapper and the generated output
+    budget = int((context_length or DEFAULT_CONTEXT_LENGTH) * 0.65) - PROMPT_OVERHEAD_TOKENS
+    return max(1000, min(budget, CHUNK_MAX_TOKENS))
+
+
+def split_transcript(text: str, max_tokens: int) -> List[str]:
+    """Split text into chunks of at most max_tokens, cutting on sentence or word boundaries"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        # Auto-generated captions often have no punctuation, so fall back to word boundaries
+        group, group_len = [], 0
+        for word in sentence.split():
+            if group and group_len + len(word) + 1 > max_chars:
+                pieces.append(" ".join(group))
+                group, group_len = [], 0
+            group.append(word)
+            group_len += len(word) + 1
+        if group:
+            pieces.append(" ".join(group))
+
+    chunks, current, current_len = [], [], 0
+    for piece in pieces:
+        if current and current_len + len(piece) + 1 > max_chars:
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+        current.append(piece)
+        current_len += len(piece) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def iter_chunks(fragments: Iterable[str], max_tokens: int) -> Iterator[str]:
+    """Chunks like split_transcript(), yielded while the text is still arriving
+
+    A chunk is released once at least one more full chunk of text has been buffered behind it,
+    so every chunk but the last is as full as split_transcript() would make it.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    buffer, buffered = [], 0
+    for fragment in fragments:
+        buffer.append(fragment)
+        buffered += len(fragment) + 1
+        if buffered > 2 * max_chars:
+            chunks = split_transcript(" ".join(buffer), max_tokens)
+            yield from chunks[:-1]
+            buffer, buffered = [chunks[-1]], len(chunks[-1]) + 1
+    if buffer:
+        yield from split_transcript(" ".join(buffer), max_tokens)
@@ -0,0 +1,139 @@
+"""Command line interface: python -m yt summarize URL, python -m yt batch URL [URL ...], python -m yt search QUERY, python -m yt serve"""
+import argparse
+import json
+import os
+import sys
+
+from .catalog import fetch_model_context_lengths, fetch_openrouter_models
+from .compression import format_budget_report
+from .library import LIBRARY_SEARCH_LIMIT, get_transcript_library
+from .llm import DEFAULT_MODEL
+from .pipeline import (
+    BATCH_APIFY_CONCURRENCY, BATCH_LLM_CONCURRENCY, BATCH_STATUS_ICONS, BATCH_URLS_PER_APIFY_RUN,
+    BatchRun, parse_url_list, summarize_video
+)
+from .server import SERVER_HOST, SERVER_PORT, run_server
+from .summarize import SummaryError
+from .transcripts import TranscriptError
+
+
+def build_parser(prog: str = "yt") -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Summarize YouTube videos without the web UI.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    summarize_parser = subcommands.add_parser("summarize", help="Summarize one video or answer a question about it")
+    summarize_parser.add_argument("url", help="YouTube URL")
+    summarize_parser.add_argument("-q", "--question", default="", help="Ask this question instead of summarizing")
+    summarize_parser.add_argument("-m", "--model", help="OpenRouter model id (defaults to the first free model)")
+    summarize_parser.add_argument("--full-transcript", action="store_true", help="Send the whole transcript with a question instead of the most relevant parts")
+    summarize_parser.add_argument("--regenerate", action="store_true", help="Ignore cached answers and call the model again")
+    summarize_parser.add_argument("--timestamps", action="store_true", help="Cite [m:ss] moments as links into the video")
+    summarize_parser.add_argument("--json", action="store_true", help="Print the result as a JSON object")
+
+    batch_parser = subcommands.add_parser("batch", help="Summarize many videos concurrently")
+    batch_parser.add_argument("urls", nargs="*", help="YouTube URLs")
+    batch_parser.add_argument("-f", "--file", help="File with one URL per line ('-' for stdin)")
+    batch_parser.add_argument("-q", "--question", default="", help="Ask this question about every video instead of summarizing")
+    batch_parser.add_argument("-m", "--model", help="OpenRouter model id (defaults to the first free model)")
+    batch_parser.add_argument("--apify-concurrency", type=int, default=BATCH_APIFY_CONCURRENCY)
+    batch_parser.add_argument("--llm-concurrency", type=int, default=BATCH_LLM_CONCURRENCY)
+    batch_parser.add_argument("--urls-per-run", type=int, default=BATCH_URLS_PER_APIFY_RUN, help="Videos extracted per Apify actor run")
+    batch_parser.add_argument("--regenerate", action="store_true", help="Ignore cached answers and call the model again")
+    batch_parser.add_argument("--json", action="store_true", help="Print one JSON object per video")
+
+    search_parser = subcommands.add_parser("search", help="Search the transcripts of every video extracted so far")
+    search_parser.add_argument("query", help='Words and "quoted phrases" that must all appear; end a word with * to match a prefix')
+    search_parser.add_argument("-n", "--limit", type=int, default=LIBRARY_SEARCH_LIMIT, help="Most results to show")
+    search_parser.add_argument("--json", action="store_true", help="Print one JSON object per video")
+
+    serve_parser = subcommands.add_parser("serve", help="Serve /transcript, /summarize, /ask and /search as a JSON HTTP API, plus /metrics")
+    serve_parser.add_argument("--host", default=SERVER_HOST)
+    serve_parser.add_argument("--port", type=int, default=SERVER_PORT)
+    return parser
+
+
+def run_summarize(args) -> int:
+    try:
+        result = summarize_video(args.url, args.question, args.model, not args.full_transcript, args.regenerate, args.timestamps)
+    except (TranscriptError, SummaryError) as e:
+        if args.json:
+            print(json.dumps({"url": args.url, "error": str(e)}, ensure_ascii=False), flush=True)
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    else:
+        if result["prompt_budget"]:
+            print(format_budget_report(result["prompt_budget"]), file=sys.stderr, flush=True)
+        print(f"## {result['title']} — {result['channel']}\n{result['url']}\n\n{result['summary']}\n", flush=True)
+    return 0
+
+
+def run_batch(args, parser: argparse.ArgumentParser) -> int:
+    urls = list(args.urls)
+    if args.file:
+        with (sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")) as handle:
+            urls.extend(parse_url_list(handle.read()))
+    if not urls:
+        parser.error("no URLs given")
+
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    available_models = fetch_openrouter_models(api_key) if api_key else []
+    context_lengths = fetch_model_context_lengths(api_key) if api_key else {}
+    model = args.model or (available_models[0] if available_models else DEFAULT_MODEL)
+
+    def report_status(url: str, status: str) -> None:
+        print(f"{BATCH_STATUS_ICONS[status]} {status}: {url}", file=sys.stderr, flush=True)
+
+    try:
+        batch = BatchRun(urls, model, args.question, available_models, context_lengths, args.apify_concurrency, args.llm_concurrency, report_status, args.urls_per_run, args.regenerate)
+    except SummaryError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    failures = 0
+    for result in batch.results():
+        failures += result["status"] == "failed"
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        elif result["error"]:
+            print(f"## {result.get('title') or result['url']}\n{result['url']}\n\n❌ {result['error']}\n", flush=True)
+        else:
+            print(f"## {result['title']} — {result['channel']}\n{result['url']}\n\n{result['summary']}\n", flush=True)
+
+    return 1 if failures else 0
+
+
+def run_search(args) -> int:
+    results = get_transcript_library().search(args.query, args.limit)
+    if not results:
+        print("No transcripts match that search.", file=sys.stderr)
+        return 1
+    for result in results:
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        else:
+            print(f"## {result['title']} — {result['channel']}\n{result['url']}\n\n{result['snippet']}\n", flush=True)
+    return 0
+
+
+def main(argv=None, prog: str = "yt") -> int:
+    """Headless entry point; returns the process exit code"""
+    # Load environment variables from .env file if it exists
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = build_parser(prog)
+    args = parser.parse_args(argv)
+    if args.command == "summarize":
+        return run_summarize(args)
+    if args.command == "search":
+        return run_search(args)
+    if args.command == "serve":
+        run_server(args.host, args.port)
+        return 0
+    return run_batch(args, parser)
@@ -0,0 +1,75 @@
+"""Shared HTTP, OpenRouter and Apify clients
+
+``openai``, ``httpx`` and ``apify_client`` take most of a second to import, so they are imported
+when the first client is created rather than when the page (or the CLI) starts.
+"""
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+if TYPE_CHECKING:
+    from apify_client import ApifyClient
+    from openai import OpenAI
+
+# Both base URLs can point at local stand-ins (see benchmarks/)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+APIFY_API_URL = os.getenv("APIFY_API_URL", "https://api.apify.com")
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", 120))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", 10))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 20))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", 30))
+OPENROUTER_MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", 2))
+
+
+# Clients below are created once per process and shared by every session and worker thread,
+# so reruns reuse warm keep-alive connections instead of paying a new TLS handshake.
+@lru_cache(maxsize=None)
+def get_http_session() -> requests.Session:
+    """Pooled keep-alive HTTP session for plain REST calls"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}))
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@lru_cache(maxsize=None)
+def get_openrouter_client(api_key: str) -> "OpenAI":
+    """Shared OpenRouter client; its connection pool is thread-safe and reused across requests"""
+    import httpx
+    from openai import OpenAI
+
+    # Concurrent sessions, map steps and hedged attempts all share this pool
+    timeout = httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+    http_client = httpx.Client(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS
+        ),
+        follow_redirects=True
+    )
+    return OpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=api_key,
+        timeout=timeout,
+        max_retries=OPENROUTER_MAX_RETRIES,
+        http_client=http_client,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_apify_client(api_token: Optional[str]) -> "ApifyClient":
+    """Shared Apify client so actor and dataset calls reuse one HTTP connection pool"""
+    from apify_client import ApifyClient
+
+    return ApifyClient(api_token, api_url=APIFY_API_URL)
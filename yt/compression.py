@@ -0,0 +1,123 @@
+"""Prompt budgeting: shrink transcripts before they are sent and report the tokens saved"""
+import os
+import re
+from collections import deque
+from typing import Dict, Optional
+
+from .chunking import CHARS_PER_TOKEN, SENTENCE_BOUNDARY, chunk_token_budget
+
+# "off", "lossless" (whitespace and caption noise) or "lossy" (also repeats, fillers and sponsor reads)
+PROMPT_COMPRESSION = os.getenv("PROMPT_COMPRESSION", "lossless").lower()
+DEDUPE_WINDOW_SENTENCES = int(os.getenv("DEDUPE_WINDOW_SENTENCES", 20))
+DEDUPE_MIN_CHARS = 20
+# Sound cues only; ">>" speaker changes carry meaning and are kept
+CAPTION_NOISE = re.compile(r'\[(?:music|applause|laughter|laughs|inaudible|silence|noise|cheering|foreign)\]|♪+', re.IGNORECASE)
+# A word or phrase of up to eight words said (or captioned) twice or more in a row; collapsing it
+# also changes "had had" or "very very", so only lossy mode does
+REPEATED_PHRASE = re.compile(r'\b(\w+(?:\s+\w+){0,7})(?:\s+\1\b)+', re.IGNORECASE)
+FILLERS = re.compile(r'\b(?:u+m+|u+h+|erm|hmm+|you know|i mean|basically|literally)\b,?\s*', re.IGNORECASE)
+SPONSOR = re.compile(
+    r'\b(?:sponsor(?:s|ed)?|promo code|use code|discount code|affiliate links?|free trial|link (?:is )?in the description|link below)\b|\d+% off',
+    re.IGNORECASE
+)
+SPONSOR_PLACEHOLDER = "[Sponsor segment removed]"
+# Spaces and tabs only: excerpt headers and timecoded lines keep their line breaks
+SPACES = re.compile(r'[^\S\n]+')
+BLANK_LINES = re.compile(r'\n{3,}')
+
+
+def sentence_key(sentence: str) -> str:
+    return " ".join(re.findall(r'\w+', sentence.lower()))
+
+
+class TranscriptCompressor:
+    """Shrinks transcript text, one piece at a time, and counts the characters it removed
+
+    Kept as an object so that lossy mode deduplicates a transcript that arrives in fragments across them.
+    """
+
+    def __init__(self, mode: str = PROMPT_COMPRESSION):
+        self.mode = mode if mode in ("off", "lossless", "lossy") else "lossless"
+        self.original_chars = 0
+        self.compressed_chars = 0
+        self._recent = deque(maxlen=DEDUPE_WINDOW_SENTENCES)
+        self._in_sponsor = False
+
+    def compress(self, text: str) -> str:
+        self.original_chars += len(text)
+        if self.mode == "off":
+            self.compressed_chars += len(text)
+            return text
+
+        lines = []
+        for line in text.splitlines():
+            line = SPACES.sub(" ", CAPTION_NOISE.sub(" ", line)).strip()
+            lines.append(self._drop_repeats(line) if self.mode == "lossy" else line)
+        result = BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+        self.compressed_chars += len(result)
+        return result
+
+    def _drop_repeats(self, line: str) -> str:
+        """Lossy pass over one line: stutters, fillers, sponsor reads and recently repeated sentences"""
+        line = REPEATED_PHRASE.sub(r'\1', FILLERS.sub("", line))
+        kept = []
+        for sentence in SENTENCE_BOUNDARY.split(line):
+            # Collapse a run of sponsor sentences into one placeholder
+            if SPONSOR.search(sentence):
+                if not self._in_sponsor:
+                    kept.append(SPONSOR_PLACEHOLDER)
+                self._in_sponsor = True
+                continue
+            self._in_sponsor = False
+
+            # Drop a sentence that was just said (caption roll-over, repeated intros)
+            key = sentence_key(sentence)
+            if len(key) >= DEDUPE_MIN_CHARS and key in self._recent:
+                continue
+            self._recent.append(key)
+            if sentence:
+                kept.append(sentence)
+        return " ".join(kept)
+
+    def report(self, model: Optional[str] = None, context_lengths: Optional[Dict[str, int]] = None) -> Dict[str, object]:
+        """Token estimates before and after, measured against the model's context window"""
+        return budget_report(self.original_chars, self.compressed_chars, self.mode, model, context_lengths)
+
+
+def budget_report(original_chars: int, compressed_chars: int, mode: str, model: Optional[str] = None, context_lengths: Optional[Dict[str, int]] = None) -> Dict[str, object]:
+    """Estimated transcript tokens before and after compression, and whether they fit one pass of the model"""
+    context_length = (context_lengths or {}).get(model)
+    original_tokens = (original_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    prompt_tokens = (compressed_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    budget = chunk_token_budget(context_length)
+    return {
+        "mode": mode,
+        "model": model,
+        "context_length": context_length,
+        "chunk_budget": budget,
+        "original_tokens": original_tokens,
+        "prompt_tokens": prompt_tokens,
+        "tokens_saved": original_tokens - prompt_tokens,
+        "single_pass": prompt_tokens <= budget
+    }
+
+
+def compress_transcript(text: str, mode: str = PROMPT_COMPRESSION, model: Optional[str] = None, context_lengths: Optional[Dict[str, int]] = None):
+    """Return (compressed text, budget report) for a whole transcript or excerpt"""
+    compressor = TranscriptCompressor(mode)
+    compressed = compressor.compress(text)
+    return compressed, compressor.report(model, context_lengths)
+
+
+def format_budget_report(report: Dict[str, object]) -> str:
+    """One-line summary of a budget report for the UI and the command line"""
+    saved = report["tokens_saved"]
+    percent = 100 * saved / report["original_tokens"] if report["original_tokens"] else 0
+    line = f"✂️ Prompt ~{report['prompt_tokens']:,} tokens"
+    if saved > 0:
+        line += f" (saved ~{saved:,}, {percent:.0f}% with {report['mode']} compression)"
+    if report["context_length"]:
+        line += f" for a {report['context_length']:,}-token context"
+    if not report["single_pass"]:
+        line += " — read in parts"
+    return line
@@ -0,0 +1,173 @@
+"""Process-wide coordination of upstream work: single-flight calls and background jobs"""
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Optional
+
+
+class CallAbandoned(Exception):
+    """Set on an in-flight call whose leader stopped without an outcome to share (e.g. its script run was stopped)"""
+
+
+class SingleFlight:
+    """Process-wide table of in-flight upstream calls
+
+    Concurrent callers asking for the same key wait on the first caller's future instead of
+    repeating the Apify run or completion; counts how many calls were coalesced per kind.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._counts = defaultdict(Counter)
+
+    def claim(self, kind: str, key: str):
+        """Return (future, leader); only the leader makes the call and must ``release`` the future"""
+        with self._lock:
+            self._counts[kind]["calls"] += 1
+            future = self._calls.get(f"{kind}:{key}")
+            if future is not None:
+                self._counts[kind]["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._calls[f"{kind}:{key}"] = future
+            return future, True
+
+    def release(self, kind: str, key: str, future: Future, result=None, error: Optional[BaseException] = None) -> None:
+        """Publish the leader's outcome to every waiting caller
+
+        Only ordinary exceptions are shared. A BaseException such as KeyboardInterrupt or a
+        script-control signal belongs to the leader's thread, so waiters get CallAbandoned instead.
+        """
+        with self._lock:
+            if self._calls.get(f"{kind}:{key}") is future:
+                del self._calls[f"{kind}:{key}"]
+        if error is not None:
+            future.set_exception(error if isinstance(error, Exception) else CallAbandoned(f"The {kind} call was abandoned by its leader"))
+        else:
+            future.set_result(result)
+
+    def do(self, kind: str, key: str, fn, *args):
+        """Call ``fn(*args)``, or wait for the identical call already in flight and share its result
+
+        ``fn`` must return its result or raise, without side effects meant for its caller only:
+        waiters see nothing but that return value or exception. A waiter whose leader abandoned
+        the call makes it itself.
+        """
+        while True:
+            future, leader = self.claim(kind, key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except CallAbandoned:
+                continue
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self.release(kind, key, future, error=e)
+            raise
+        self.release(kind, key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Calls, coalesced calls and calls in flight for each kind"""
+        with self._lock:
+            in_flight = Counter(call_key.split(":", 1)[0] for call_key in self._calls)
+            return {
+                kind: {"calls": counts["calls"], "coalesced": counts["coalesced"], "in_flight": in_flight[kind]}
+                for kind, counts in self._counts.items()
+            }
+
+
+@lru_cache(maxsize=None)
+def get_single_flight() -> SingleFlight:
+    """In-flight call table shared by every session"""
+    return SingleFlight()
+
+
+def coalesced_summary(cache_key: Optional[str], fn, *args):
+    """Generate an answer with ``fn(*args)`` unless the same answer is already being generated"""
+    if not cache_key:
+        return fn(*args)
+    return get_single_flight().do("summary", cache_key, fn, *args)
+
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 8))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", 600))
+
+
+class JobQueue:
+    """Process-wide background workers with a job table shared by every session
+
+    Submitting a job id that is already queued or running joins that job instead of starting
+    another upstream call, and finished jobs stay readable for ``result_ttl`` seconds so a
+    session that reran (or a second user) still picks up the result.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, result_ttl: float = JOB_RESULT_TTL_SECONDS):
+        self.result_ttl = result_ttl
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, object]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+
+    def submit(self, job_id: str, kind: str, fn, *args, reuse_finished: bool = True) -> Dict[str, object]:
+        """Start ``fn(*args)`` in the background unless an identical job is in flight; returns a job snapshot"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job and (job["status"] in ("queued", "running") or (reuse_finished and job["status"] == "done")):
+                self.deduplicated += 1
+                return dict(job)
+
+            job = {
+                "id": job_id,
+                "kind": kind,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "finished_at": None
+            }
+            self._jobs[job_id] = job
+        self._pool.submit(self._run, job, fn, args)
+        return dict(job)
+
+    def _run(self, job: Dict[str, object], fn, args) -> None:
+        with self._lock:
+            job["status"] = "running"
+        try:
+            result = fn(*args)
+        except Exception as e:
+            with self._lock:
+                job.update(status="failed", error=e, finished_at=time.time())
+            return
+        with self._lock:
+            job.update(status="done", result=result, finished_at=time.time())
+
+    def get(self, job_id: str) -> Optional[Dict[str, object]]:
+        """Snapshot of a job, or None if it never existed or has been pruned"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts by status plus how many submissions joined an existing job"""
+        with self._lock:
+            counts = Counter(job["status"] for job in self._jobs.values())
+        return {"queued": counts["queued"], "running": counts["running"], "done": counts["done"], "failed": counts["failed"], "deduplicated": self.deduplicated}
+
+
+@lru_cache(maxsize=None)
+def get_job_queue() -> JobQueue:
+    """Background workers shared by every session"""
+    return JobQueue()
@@ -0,0 +1,226 @@
+"""Persistent transcript library with full-text search across every video the deployment has processed"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .cache import get_transcript_cache
+from .metrics import get_metrics
+
+TRANSCRIPT_LIBRARY = os.getenv("TRANSCRIPT_LIBRARY", "true").lower() in ("1", "true", "yes")
+LIBRARY_SEARCH_LIMIT = int(os.getenv("LIBRARY_SEARCH_LIMIT", 20))
+LIBRARY_SNIPPET_WORDS = 24
+SNIPPET_MARKS = ("**", "**")
+# Title matches outrank channel matches, which outrank transcript matches
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def video_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def search_terms(query: str) -> List[str]:
+    """Words and "quoted phrases" of a search box query, lowercased; a trailing * marks a prefix"""
+    terms = []
+    for phrase, word in QUERY_TERM.findall(query or ""):
+        words = re.findall(r"\w+", (phrase or word).lower())
+        if words:
+            terms.append(" ".join(words) + ("*" if word.endswith("*") and not phrase else ""))
+    return terms
+
+
+def fts_query(query: str) -> Optional[str]:
+    """FTS5 MATCH expression in which every term must appear; quoting each one keeps user input from being read as FTS syntax"""
+    expression = " ".join(
+        f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"'
+        for term in search_terms(query)
+    )
+    return expression or None
+
+
+def make_snippet(text: str, terms: List[str], words: int = LIBRARY_SNIPPET_WORDS) -> str:
+    """Window of ``words`` words around the first match, with matched terms marked like FTS5's snippet()"""
+    lowered = text.lower()
+    positions = [lowered.find(term.rstrip("*")) for term in terms]
+    start = min((position for position in positions if position >= 0), default=0)
+    before = text[:start].split()[-(words // 3):]
+    window = " ".join(before + text[start:].split()[:words - len(before)])
+    for term in terms:
+        window = re.sub(
+            rf"\b({re.escape(term.rstrip('*'))}\w*)" if term.endswith("*") else rf"\b({re.escape(term)})\b",
+            rf"{SNIPPET_MARKS[0]}\1{SNIPPET_MARKS[1]}", window, flags=re.IGNORECASE
+        )
+    skipped = len(text[:start].split()) - len(before)
+    return ("… " if skipped else "") + window + (" …" if skipped + words < len(text.split()) else "")
+
+
+class TranscriptLibrary:
+    """Every extracted transcript, kept without expiry and indexed for keyword and phrase search
+
+    Uses an SQLite FTS5 index (BM25-ranked, with highlighted snippets) kept in sync by triggers.
+    On SQLite builds without FTS5, search falls back to a substring scan that returns the same
+    fields. ``max_entries`` (0 for no limit) drops the least recently updated videos beyond it.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY,
+            video_id TEXT NOT NULL UNIQUE,
+            title TEXT,
+            channel TEXT,
+            date TEXT,
+            transcript TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            added_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """
+    fts_schema = (
+        "CREATE VIRTUAL TABLE videos_fts USING fts5(title, channel, transcript, content='videos', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        """CREATE TRIGGER IF NOT EXISTS videos_ai AFTER INSERT ON videos BEGIN
+            INSERT INTO videos_fts(rowid, title, channel, transcript) VALUES (new.id, new.title, new.channel, new.transcript);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS videos_ad AFTER DELETE ON videos BEGIN
+            INSERT INTO videos_fts(videos_fts, rowid, title, channel, transcript) VALUES ('delete', old.id, old.title, old.channel, old.transcript);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS videos_au AFTER UPDATE ON videos BEGIN
+            INSERT INTO videos_fts(videos_fts, rowid, title, channel, transcript) VALUES ('delete', old.id, old.title, old.channel, old.transcript);
+            INSERT INTO videos_fts(rowid, title, channel, transcript) VALUES (new.id, new.title, new.channel, new.transcript);
+        END""",
+    )
+
+    def __init__(self, path: str, max_entries: int = 0):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(self.schema)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS videos_updated_at ON videos (updated_at)")
+        self.full_text = self._create_index()
+        self._conn.commit()
+
+    def _create_index(self) -> bool:
+        """Create the FTS5 index (indexing rows stored before it existed); False when SQLite lacks FTS5"""
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'videos_fts'").fetchone():
+            return True
+        try:
+            for statement in self.fts_schema:
+                self._conn.execute(statement)
+        except sqlite3.OperationalError:
+            return False
+        self._conn.execute("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')")
+        return True
+
+    def add(self, video_id: str, transcript: str, title: Optional[str], channel: Optional[str], date: Optional[str]) -> None:
+        """Store or update a video; an unchanged transcript is not indexed again"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO videos (video_id, title, channel, date, transcript, size, added_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (video_id) DO UPDATE SET
+                    title = excluded.title, channel = excluded.channel, date = excluded.date,
+                    transcript = excluded.transcript, size = excluded.size, updated_at = excluded.updated_at
+                WHERE transcript IS NOT excluded.transcript OR title IS NOT excluded.title
+                    OR channel IS NOT excluded.channel OR date IS NOT excluded.date
+                """,
+                (video_id, title, channel, date, transcript, len(transcript.encode("utf-8")), now, now)
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM videos WHERE id IN (SELECT id FROM videos ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def get(self, video_id: str) -> Optional[Dict[str, str]]:
+        """The stored transcript and metadata of a video, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT transcript, title, channel, date FROM videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"transcript": row[0], "title": row[1], "channel": row[2], "date": row[3]}
+
+    def search(self, query: str, limit: int = LIBRARY_SEARCH_LIMIT) -> List[Dict[str, Optional[str]]]:
+        """Videos matching every word and "quoted phrase" of ``query``, best match first
+
+        Each result has video_id, url, title, channel, date and a transcript snippet with the
+        matches in **bold**. A trailing * matches a word prefix (``optim*``).
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        with get_metrics().span("library_search"), self._lock:
+            if self.full_text:
+                # Rank first, so snippets are only cut from the transcripts that are returned
+                rows = self._conn.execute(
+                    f"""
+                    WITH top AS (
+                        SELECT rowid AS id, bm25(videos_fts, {", ".join(map(str, BM25_WEIGHTS))}) AS score
+                        FROM videos_fts WHERE videos_fts MATCH :query ORDER BY score LIMIT :limit
+                    )
+                    SELECT v.video_id, v.title, v.channel, v.date,
+                           snippet(videos_fts, 2, :open, :close, ' … ', :words)
+                    FROM top
+                    JOIN videos_fts ON videos_fts.rowid = top.id
+                    JOIN videos v ON v.id = top.id
+                    WHERE videos_fts MATCH :query
+                    ORDER BY top.score
+                    """,
+                    {"query": fts_query(query), "limit": limit, "open": SNIPPET_MARKS[0], "close": SNIPPET_MARKS[1], "words": LIBRARY_SNIPPET_WORDS}
+                ).fetchall()
+            else:
+                # Without FTS5 every term must occur somewhere in the title, channel or transcript
+                haystack = "lower(coalesce(title, '') || ' ' || coalesce(channel, '') || ' ' || transcript)"
+                rows = self._conn.execute(
+                    f"""
+                    SELECT video_id, title, channel, date, transcript FROM videos
+                    WHERE {" AND ".join(f"instr({haystack}, ?) > 0" for _ in terms)}
+                    ORDER BY updated_at DESC
+                    LIMIT ?
+                    """,
+                    (*(term.rstrip("*") for term in terms), limit)
+                ).fetchall()
+                rows = [row[:4] + (make_snippet(row[4], terms),) for row in rows]
+        return [
+            {"video_id": video_id, "url": video_url(video_id), "title": title, "channel": channel, "date": date, "snippet": snippet}
+            for video_id, title, channel, date, snippet in rows
+        ]
+
+    def recent(self, limit: int = LIBRARY_SEARCH_LIMIT) -> List[Dict[str, Optional[str]]]:
+        """Most recently added or updated videos, without snippets"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id, title, channel, date FROM videos ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [
+            {"video_id": video_id, "url": video_url(video_id), "title": title, "channel": channel, "date": date, "snippet": None}
+            for video_id, title, channel, date in rows
+        ]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            entries, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM videos").fetchone()
+        return {"entries": entries, "bytes": total_bytes, "full_text": self.full_text}
+
+
+@lru_cache(maxsize=None)
+def get_transcript_library() -> TranscriptLibrary:
+    """Process-wide transcript library shared by every session, worker and server request"""
+    library = TranscriptLibrary(
+        path=os.getenv("TRANSCRIPT_LIBRARY_PATH", os.path.join(".cache", "library.sqlite3")),
+        max_entries=int(os.getenv("TRANSCRIPT_LIBRARY_MAX_ENTRIES", 0))
+    )
+    # A new library starts with whatever the transcript cache still holds
+    if not library.stats()["entries"]:
+        for video_id, entry in get_transcript_cache().entries():
+            library.add(video_id, entry["transcript"], entry["title"], entry["channel"], entry["date"])
+    return library
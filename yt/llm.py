@@ -0,0 +1,559 @@
+"""Chat completions against OpenRouter: streaming, health-based model routing and hedging"""
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .chunking import estimate_tokens
+from .metrics import get_metrics, percentile
+
+DEFAULT_MODEL = "google/gemini-2.0-flash-exp:free"
+STREAM_FIRST_TOKEN_TIMEOUT_SECONDS = float(os.getenv("STREAM_FIRST_TOKEN_TIMEOUT_SECONDS", 30))
+STREAM_RENDER_INTERVAL_SECONDS = 0.05
+
+
+class FirstTokenTimeout(Exception):
+    """Raised when a streamed completion produces no content before the deadline"""
+
+
+class StreamInterrupted(Exception):
+    """Raised when a streamed completion fails after content has started arriving"""
+
+    def __init__(self, model: str, partial_text: str, cause: Exception):
+        super().__init__(f"{model} stopped mid-response: {cause}")
+        self.model = model
+        self.partial_text = partial_text
+        self.cause = cause
+
+
+def message_text(message: Dict[str, object]) -> str:
+    """Text of a chat message whose content is a string or a list of text parts"""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def prompt_token_estimate(messages: List[Dict[str, object]]) -> int:
+    return sum(estimate_tokens(message_text(message)) for message in messages)
+
+
+def stream_completion(client, model: str, messages: List[Dict[str, str]], on_text, first_token_timeout: float = STREAM_FIRST_TOKEN_TIMEOUT_SECONDS) -> str:
+    """Stream a chat completion and return the full text
+
+    ``on_text(text, final)`` receives the text so far, throttled to STREAM_RENDER_INTERVAL_SECONDS,
+    and once more with ``final=True`` when the stream ends.
+    """
+    with get_metrics().span("llm_stream", model=model):
+        started = time.monotonic()
+        # The read timeout doubles as the first-token deadline and as the stall limit once streaming
+        stream = client.with_options(timeout=first_token_timeout, max_retries=0).chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True
+        )
+
+        parts = []
+        last_render = 0.0
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    # Keep-alive or role-only chunks must not extend the first-token deadline
+                    if not parts and time.monotonic() - started > first_token_timeout:
+                        raise FirstTokenTimeout(f"{model} sent no tokens within {first_token_timeout:.0f}s")
+                    continue
+
+                parts.append(delta)
+                now = time.monotonic()
+                if now - last_render >= STREAM_RENDER_INTERVAL_SECONDS:
+                    on_text("".join(parts), False)
+                    last_render = now
+        except FirstTokenTimeout:
+            raise
+        except Exception as e:
+            if parts:
+                raise StreamInterrupted(model, "".join(parts), e) from e
+            raise
+        finally:
+            stream.close()
+
+        text = "".join(parts)
+    get_metrics().tokens(model, prompt_token_estimate(messages), estimate_tokens(text))
+    on_text(text, True)
+    return text
+
+
+RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv("RATE_LIMIT_COOLDOWN_SECONDS", 60))
+UNAVAILABLE_COOLDOWN_SECONDS = float(os.getenv("UNAVAILABLE_COOLDOWN_SECONDS", 600))
+# Fallback models raced at once after the requested model fails; the requested model runs alone
+ROUTER_PARALLEL_ATTEMPTS = int(os.getenv("ROUTER_PARALLEL_ATTEMPTS", 2))
+ROUTER_WORKERS = int(os.getenv("ROUTER_WORKERS", 16))
+ROUTER_DEFAULT_LATENCY_SECONDS = 15.0
+ROUTER_WINDOW = 50
+
+# Short phrases for "Model X ... Trying next model" warnings, keyed by classify_error()
+FAILURE_NOTES = {
+    "rate_limited": "is rate limited",
+    "data_policy": "has data policy restrictions",
+    "not_found": "not found",
+    "timeout": "did not start responding in time",
+    "empty": "returned empty response",
+    "interrupted": "stopped mid-response",
+}
+
+
+class EmptyResponseError(Exception):
+    """Raised when a model answers without any content"""
+
+
+class ModelsCoolingDown(Exception):
+    """Raised when every candidate model is waiting out a rate-limit or availability cooldown"""
+
+
+def classify_error(error: Exception) -> str:
+    """Map an upstream exception to a coarse error class used for routing and messages
+
+    The HTTP status decides when the error carries one; only errors without a status (such as
+    an error event inside a stream) are classified from their message.
+    """
+    if isinstance(error, EmptyResponseError):
+        return "empty"
+    if isinstance(error, (FirstTokenTimeout, TimeoutError)) or "timeout" in type(error).__name__.lower():
+        # openai.APITimeoutError and httpx's timeouts
+        return "timeout"
+    if isinstance(error, StreamInterrupted):
+        return "interrupted"
+    if isinstance(error, ModelsCoolingDown):
+        return "rate_limited"
+
+    status = getattr(error, "status_code", None)
+    message = str(error).lower()
+    if isinstance(status, int):
+        if status == 429:
+            return "rate_limited"
+        if status == 404:
+            return "data_policy" if "data policy" in message else "not_found"
+        if status in (408, 504):
+            return "timeout"
+        return "error"
+
+    if re.search(r"\b429\b", message) or "rate limit" in message or "rate-limit" in message:
+        return "rate_limited"
+    if re.search(r"\b404\b", message):
+        return "data_policy" if "data policy" in message else "not_found"
+    if "timed out" in message:
+        return "timeout"
+    return "error"
+
+
+def final_error_message(error: Exception) -> str:
+    """User-facing message once every model has failed"""
+    error_class = classify_error(error)
+    if error_class == "rate_limited":
+        return "All models are currently rate limited. Please try again later."
+    if error_class == "data_policy":
+        return "All models have data policy restrictions. Please try again later."
+    if error_class == "not_found":
+        return "All models not found or not available."
+    if error_class == "timeout":
+        return "No model started responding in time. Please try again later."
+    return f"All models failed. Last error: {str(error)}"
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read Retry-After (seconds or HTTP date) or X-RateLimit-Reset (epoch ms) from an API error"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    reset = headers.get("x-ratelimit-reset")
+    if reset:
+        try:
+            return max(0.0, float(reset) / 1000 - time.time())
+        except ValueError:
+            pass
+    return None
+
+
+class ModelHealthRegistry:
+    """Process-wide record of per-model latency, error rate and rate-limit cooldowns"""
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._outcomes = defaultdict(lambda: deque(maxlen=window))
+        self._cooldown_until: Dict[str, float] = {}
+        self._last_error: Dict[str, str] = {}
+
+    def record_success(self, model: str, latency: float) -> None:
+        with self._lock:
+            self._latencies[model].append(latency)
+            self._outcomes[model].append(True)
+            self._cooldown_until.pop(model, None)
+
+    def record_failure(self, model: str, error: Exception) -> str:
+        """Record a failed attempt, starting a cooldown for rate limits and missing models"""
+        error_class = classify_error(error)
+        get_metrics().count("yt_upstream_errors_total", service="openrouter", model=model, error_class=error_class)
+        with self._lock:
+            self._outcomes[model].append(False)
+            self._last_error[model] = error_class
+            if error_class == "rate_limited":
+                cooldown = retry_after_seconds(error)
+                self._cooldown_until[model] = time.time() + (RATE_LIMIT_COOLDOWN_SECONDS if cooldown is None else cooldown)
+            elif error_class in ("not_found", "data_policy"):
+                self._cooldown_until[model] = time.time() + UNAVAILABLE_COOLDOWN_SECONDS
+        return error_class
+
+    def cooldown_remaining(self, model: str) -> float:
+        return max(0.0, self._cooldown_until.get(model, 0.0) - time.time())
+
+    def error_rate(self, model: str) -> float:
+        outcomes = self._outcomes.get(model)
+        if not outcomes:
+            return 0.0
+        return 1 - sum(outcomes) / len(outcomes)
+
+    def expected_latency(self, model: str) -> float:
+        """Median latency inflated by the failure rate; unknown models get a neutral prior"""
+        median = percentile(list(self._latencies.get(model, ())), 0.5) or ROUTER_DEFAULT_LATENCY_SECONDS
+        return median / max(0.1, 1 - self.error_rate(model))
+
+    def order_models(self, models: List[str]) -> List[str]:
+        """Healthy models only, fastest expected first; the requested model stays first while it is reliable"""
+        with self._lock:
+            healthy = [model for model in dict.fromkeys(models) if self.cooldown_remaining(model) == 0]
+            if not healthy:
+                return []
+            preferred = healthy[:1] if healthy[0] == models[0] and self.error_rate(models[0]) < 0.5 else []
+            rest = sorted((model for model in healthy if model not in preferred), key=self.expected_latency)
+            return preferred + rest
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """Per-model stats for display or export"""
+        with self._lock:
+            rows = []
+            for model in sorted(set(self._outcomes) | set(self._cooldown_until)):
+                latencies = list(self._latencies.get(model, ()))
+                rows.append({
+                    "model": model,
+                    "requests": len(self._outcomes.get(model, ())),
+                    "error_rate": round(self.error_rate(model), 3),
+                    "p50_seconds": percentile(latencies, 0.5),
+                    "p95_seconds": percentile(latencies, 0.95),
+                    "cooldown_seconds": round(self.cooldown_remaining(model), 1),
+                    "last_error": self._last_error.get(model)
+                })
+            return rows
+
+
+@lru_cache(maxsize=None)
+def get_model_router() -> ModelHealthRegistry:
+    """Model health shared by every session, so one user's 429 spares the next user the wait"""
+    return ModelHealthRegistry()
+
+
+@lru_cache(maxsize=None)
+def get_route_pool() -> ThreadPoolExecutor:
+    """Threads that race fallback models, shared by every session"""
+    return ThreadPoolExecutor(max_workers=max(1, ROUTER_WORKERS), thread_name_prefix="route")
+
+
+def abort_stream(stream) -> None:
+    """Drop a completion stream that another thread may be blocked reading
+
+    Closing a stream from another thread does not wake the thread blocked reading it, so the
+    socket is shut down: the read returns at once and the dropped connection cancels the
+    generation upstream.
+    """
+    network_stream = getattr(stream.response, "extensions", {}).get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    try:
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+        else:
+            stream.close()
+    except Exception:
+        pass
+
+
+class RacedCompletion:
+    """A completion in a fallback race, streamed so that it can be dropped once another model wins"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.cancelled = threading.Event()
+        self.stream = None
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled.set()
+            if self.stream is not None:
+                abort_stream(self.stream)
+
+    def collect(self, client, messages: List[Dict[str, str]]):
+        """Whole text and usage of the streamed completion ("" once cancelled)"""
+        stream = client.chat.completions.create(model=self.model, messages=messages, stream=True)
+        with self._lock:
+            # cancel() may have run before the stream existed
+            if self.cancelled.is_set():
+                stream.close()
+                return "", None
+            self.stream = stream
+        parts, usage = [], None
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                usage = getattr(chunk, "usage", None) or usage
+        finally:
+            # A closed stream's connection goes back to the pool, out of cancel()'s reach
+            with self._lock:
+                self.stream = None
+            stream.close()
+        return "".join(parts), usage
+
+
+def timed_completion(client, model: str, messages: List[Dict[str, str]], race: Optional[RacedCompletion] = None) -> str:
+    """One completion whose latency and outcome feed the model health registry
+
+    Non-streaming unless it runs in a fallback ``race``; a cancelled racer is not held against its model.
+    """
+    router = get_model_router()
+    started = time.monotonic()
+    try:
+        with get_metrics().span("llm_completion", model=model):
+            if race is None:
+                completion = client.chat.completions.create(model=model, messages=messages)
+                content = completion.choices[0].message.content if completion and completion.choices else None
+                usage = getattr(completion, "usage", None)
+            else:
+                content, usage = race.collect(client, messages)
+            if not content or not content.strip():
+                raise EmptyResponseError(f"Model {model} returned an empty response")
+    except Exception as e:
+        if race is None or not race.cancelled.is_set():
+            router.record_failure(model, e)
+        raise
+    router.record_success(model, time.monotonic() - started)
+    get_metrics().tokens(
+        model,
+        getattr(usage, "prompt_tokens", None) or prompt_token_estimate(messages),
+        getattr(usage, "completion_tokens", None) or estimate_tokens(content)
+    )
+    return content.strip()
+
+
+def route_completion(client, messages: List[Dict[str, str]], models_to_try: List[str], parallel: int = ROUTER_PARALLEL_ATTEMPTS):
+    """Ask the best model alone; once it fails, race the next ``parallel`` healthiest models at a time
+
+    Returns (content, model) of the first success. The requested model leads while it is
+    reliable, so a fallback is only used when it fails or is cooling down.
+    """
+    candidates = get_model_router().order_models(models_to_try)
+    if not candidates:
+        raise ModelsCoolingDown("All models are cooling down after rate limits")
+
+    last_error = None
+    wave_size = max(1, parallel)
+    waves = [candidates[:1]] + [candidates[offset:offset + wave_size] for offset in range(1, len(candidates), wave_size)]
+    for wave in waves:
+        if len(wave) == 1:
+            try:
+                return timed_completion(client, wave[0], messages), wave[0]
+            except Exception as e:
+                last_error = e
+                continue
+
+        races = [RacedCompletion(model) for model in wave]
+        futures = {get_route_pool().submit(timed_completion, client, race.model, messages, race): race for race in races}
+        try:
+            for future in as_completed(futures):
+                try:
+                    return future.result(), futures[future].model
+                except Exception as e:
+                    last_error = e
+        finally:
+            # Drop the losers so they stop spending the free models' rate limits
+            for future, race in futures.items():
+                if not future.cancel():
+                    race.cancel()
+    raise last_error
+
+
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", 4))
+HEDGE_MAX_ATTEMPTS = int(os.getenv("HEDGE_MAX_ATTEMPTS", 3))
+
+
+class HedgeAttempt(threading.Thread):
+    """Background stream for one model in a hedged request; reports tokens and errors through a queue"""
+
+    def __init__(self, client, model: str, messages: List[Dict[str, str]], events: "queue.Queue", first_token_timeout: float):
+        super().__init__(daemon=True, name=f"hedge-{model}")
+        self.client = client
+        self.model = model
+        self.messages = messages
+        self.events = events
+        self.first_token_timeout = first_token_timeout
+        self.cancelled = threading.Event()
+        self.stream = None
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.outcome = "running"
+
+    def cancel(self) -> None:
+        """Stop this attempt now, even while it still waits for its first token"""
+        with self._lock:
+            self.cancelled.set()
+            if self.stream is not None:
+                abort_stream(self.stream)
+
+    def run(self) -> None:
+        try:
+            stream = self.client.with_options(timeout=self.first_token_timeout, max_retries=0).chat.completions.create(
+                model=self.model,
+                messages=self.messages,
+                stream=True
+            )
+            with self._lock:
+                self.stream = stream
+            try:
+                # cancel() may have run before the stream existed
+                if self.cancelled.is_set():
+                    return
+                for chunk in stream:
+                    if self.cancelled.is_set():
+                        return
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if self.first_token_at is None:
+                            self.first_token_at = time.monotonic()
+                        self.events.put(("token", self.model, delta))
+                    elif self.first_token_at is None and time.monotonic() - self.started_at > self.first_token_timeout:
+                        raise FirstTokenTimeout(f"{self.model} sent no tokens within {self.first_token_timeout:.0f}s")
+            finally:
+                # A closed stream's connection goes back to the pool, out of cancel()'s reach
+                with self._lock:
+                    self.stream = None
+                stream.close()
+            self.events.put(("done", self.model, None))
+        except Exception as e:
+            # A cancelled attempt fails once its stream is closed under it; nobody waits for that
+            if not self.cancelled.is_set():
+                self.events.put(("error", self.model, e))
+        finally:
+            self.finished_at = time.monotonic()
+
+    def report(self) -> Dict[str, object]:
+        """Latency this model saw and how its attempt ended"""
+        end = self.finished_at or time.monotonic()
+        return {
+            "model": self.model,
+            "outcome": self.outcome,
+            "first_token_seconds": round(self.first_token_at - self.started_at, 3) if self.first_token_at else None,
+            "seconds": round(end - self.started_at, 3)
+        }
+
+
+def hedged_completion(client, messages: List[Dict[str, str]], models_to_try: List[str], on_text=None, hedge_delay: float = HEDGE_DELAY_SECONDS, max_attempts: int = HEDGE_MAX_ATTEMPTS, first_token_timeout: float = STREAM_FIRST_TOKEN_TIMEOUT_SECONDS) -> Dict[str, object]:
+    """Start the best model; if no token arrives within ``hedge_delay``, also start the next one
+
+    The first model to produce a token wins and the others' streams are closed. A failed attempt
+    immediately starts the next model. Returns ``{"text", "model", "attempts"}`` where
+    ``attempts`` lists each model's latency and outcome. When ``on_text`` is given, it receives
+    the winner's text as it arrives, like in stream_completion().
+    """
+    router = get_model_router()
+    events = queue.Queue()
+    pending = list(models_to_try[:max(1, max_attempts)])
+    attempts: Dict[str, HedgeAttempt] = {}
+    winner: Optional[str] = None
+    parts = []
+    last_error: Optional[Exception] = None
+    last_render = 0.0
+
+    def launch() -> None:
+        attempt = HedgeAttempt(client, pending.pop(0), messages, events, first_token_timeout)
+        attempts[attempt.model] = attempt
+        attempt.start()
+
+    def attempt_reports() -> List[Dict[str, object]]:
+        return [attempt.report() for attempt in attempts.values()]
+
+    launch()
+    next_hedge_at = time.monotonic() + hedge_delay
+    try:
+        while True:
+            timeout = None
+            if winner is None and pending:
+                timeout = max(0.0, next_hedge_at - time.monotonic())
+            try:
+                kind, model, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                # Primary is slow to start: hedge with the next-best model
+                launch()
+                next_hedge_at = time.monotonic() + hedge_delay
+                continue
+
+            attempt = attempts[model]
+            if winner is not None and model != winner:
+                continue
+
+            if kind == "token":
+                if winner is None:
+                    winner = model
+                    for other in attempts.values():
+                        if other.model != winner and other.outcome == "running":
+                            other.cancel()
+                            other.outcome = "cancelled"
+                parts.append(payload)
+                now = time.monotonic()
+                if on_text is not None and now - last_render >= STREAM_RENDER_INTERVAL_SECONDS:
+                    on_text("".join(parts), False)
+                    last_render = now
+                continue
+
+            if kind == "done" and winner == model:
+                attempt.outcome = "won"
+                router.record_success(model, time.monotonic() - attempt.started_at)
+                break
+
+            error = payload if kind == "error" else EmptyResponseError(f"Model {model} returned an empty response")
+            attempt.outcome = classify_error(error)
+            router.record_failure(model, error)
+            if winner == model:
+                raise StreamInterrupted(model, "".join(parts), error)
+
+            last_error = error
+            if pending:
+                launch()
+                next_hedge_at = time.monotonic() + hedge_delay
+            elif all(other.outcome != "running" for other in attempts.values()):
+                raise last_error
+    finally:
+        # Leaving early (an error, or on_text raising) must not leave streams open upstream
+        for attempt in attempts.values():
+            if attempt.outcome == "running":
+                attempt.cancel()
+
+    text = "".join(parts)
+    if on_text is not None:
+        on_text(text, True)
+    return {"text": text, "model": winner, "attempts": attempt_reports()}
@@ -0,0 +1,223 @@
+"""Pipeline metrics: per-stage spans and counters, exported as Prometheus text, JSON snapshots or JSON log lines"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+METRICS_JSON_LOG = os.getenv("METRICS_JSON_LOG", "false").lower() in ("1", "true", "yes")
+METRICS_SAMPLE_WINDOW = int(os.getenv("METRICS_SAMPLE_WINDOW", 500))
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+STAGE_METRIC = "yt_stage_seconds"
+METRIC_HELP = {
+    STAGE_METRIC: ("histogram", "Time spent in each pipeline stage"),
+    "yt_cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "yt_model_fallbacks_total": ("counter", "Answers served by a model other than the one requested"),
+    "yt_tokens_total": ("counter", "Prompt and completion tokens by model (estimated when the API reports none)"),
+    "yt_upstream_errors_total": ("counter", "Failed upstream calls by service, model and error class"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a small sample"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}" if pairs else ""
+
+
+class MetricsRegistry:
+    """Process-wide counters and stage-duration histograms
+
+    Stage durations keep Prometheus buckets plus a window of recent samples for p50/p95. With
+    ``json_log`` every span and counter increment is also written as one JSON line to the
+    ``yt.metrics`` logger.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = SPAN_BUCKETS, window: int = METRICS_SAMPLE_WINDOW, json_log: bool = METRICS_JSON_LOG):
+        self.buckets = buckets
+        self.json_log = json_log
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        # Per label set: a count per bucket (the last one is +Inf), then the sum
+        self._histograms: Dict[Labels, List[float]] = {}
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._logger = logging.getLogger("yt.metrics")
+
+    def log(self, event: str, **fields) -> None:
+        if self.json_log:
+            self._logger.info(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, ensure_ascii=False, default=str))
+
+    def count(self, name: str, amount: float = 1, **labels) -> None:
+        if amount <= 0:
+            return
+        with self._lock:
+            self._counters[(name, _labels(labels))] += amount
+        self.log(name, value=amount, **labels)
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        """Record one span of a stage"""
+        key = _labels(dict(labels, stage=stage))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[bisect_left(self.buckets, seconds)] += 1
+            histogram[-1] += seconds
+            self._samples[key].append(seconds)
+        self.log("span", stage=stage, seconds=round(seconds, 4), **labels)
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """Time the body as one span; it is labelled outcome="error" if the body raises"""
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started, outcome=outcome, **labels)
+
+    def timed_iter(self, items: Iterable, stage: str, **labels) -> Iterator:
+        """Yield from ``items``, recording only the time spent waiting for them as one span"""
+        iterator = iter(items)
+        waited = 0.0
+        outcome = "ok"
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    waited += time.perf_counter() - started
+                    return
+                except Exception:
+                    waited += time.perf_counter() - started
+                    outcome = "error"
+                    raise
+                waited += time.perf_counter() - started
+                yield item
+        finally:
+            self.observe(stage, waited, outcome=outcome, **labels)
+
+    def cache_lookup(self, cache: str, hit: bool) -> None:
+        self.count("yt_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def tokens(self, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        self.count("yt_tokens_total", prompt_tokens, model=model, kind="prompt")
+        self.count("yt_tokens_total", completion_tokens, model=model, kind="completion")
+
+    def snapshot(self) -> Dict[str, object]:
+        """Stage timings, counters and cache hit rates as plain JSON-ready data"""
+        with self._lock:
+            stages = []
+            for key, histogram in sorted(self._histograms.items()):
+                samples = list(self._samples[key])
+                stages.append({
+                    **dict(key),
+                    "count": int(sum(histogram[:-1])),
+                    "total_seconds": round(histogram[-1], 4),
+                    "p50_seconds": round(percentile(samples, 0.5), 4),
+                    "p95_seconds": round(percentile(samples, 0.95), 4),
+                })
+            counters = [
+                {"name": name, **dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+
+        lookups = defaultdict(lambda: {"hit": 0, "miss": 0})
+        for counter in counters:
+            if counter["name"] == "yt_cache_requests_total":
+                lookups[counter["cache"]][counter["result"]] += counter["value"]
+        hit_rates = {cache: round(counts["hit"] / (counts["hit"] + counts["miss"]), 3) for cache, counts in lookups.items()}
+        return {"stages": stages, "counters": counters, "cache_hit_rates": hit_rates}
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name: str) -> None:
+            if name not in described:
+                kind, help_text = METRIC_HELP.get(name, ("counter", name))
+                lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+                described.add(name)
+
+        for labels, histogram in histograms:
+            describe(STAGE_METRIC)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), histogram[:-1]):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{STAGE_METRIC}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{STAGE_METRIC}_sum{_format_labels(labels)} {histogram[-1]:.6f}")
+            lines.append(f"{STAGE_METRIC}_count{_format_labels(labels)} {cumulative}")
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Adds up many short stretches of one stage (e.g. cleaning each dataset item) into a single span"""
+
+    def __init__(self, stage: str, **labels):
+        self.stage = stage
+        self.labels = labels
+        self.seconds = 0.0
+        self._started = None
+        self._recorded = False
+
+    def __enter__(self) -> "StageTimer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.seconds += time.perf_counter() - self._started
+
+    def record(self) -> None:
+        if not self._recorded:
+            self._recorded = True
+            get_metrics().observe(self.stage, self.seconds, outcome="ok", **self.labels)
+
+
+@lru_cache(maxsize=None)
+def get_metrics() -> MetricsRegistry:
+    """Metrics shared by every session, worker thread and server request"""
+    registry = MetricsRegistry()
+    if registry.json_log:
+        logger = logging.getLogger("yt.metrics")
+        if not logger.handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return registry
@@ -0,0 +1,269 @@
+"""Headless end-to-end pipeline: one video, or many videos concurrently"""
+import os
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from .cache import get_response_cache, response_cache_key
+from .chat import chat_history_for, chat_question, chat_variant
+from .catalog import fetch_model_context_lengths, fetch_openrouter_models
+from .clients import get_openrouter_client
+from .compression import PROMPT_COMPRESSION, TranscriptCompressor, compress_transcript
+from .jobs import coalesced_summary
+from .llm import DEFAULT_MODEL, final_error_message
+from .retrieval import build_question_context
+from .segments import get_transcript_segments, link_timestamps
+from .summarize import SummaryError, answer_in_chat, get_api_key, summarize_stream, summarize_transcript
+from .transcripts import TranscriptError, TranscriptStream, extract_video_id, load_transcript, load_transcripts, open_transcript
+
+
+def answer_variant(use_retrieval: bool, timestamps: bool = False, history=None) -> str:
+    """Response cache variant for how the transcript (and, in a conversation, the history) was presented"""
+    if history is not None:
+        variant = chat_variant(history)
+    else:
+        variant = "retrieval" if use_retrieval else ""
+    variant += "+timestamps" if timestamps else ""
+    # Each compression mode sends a different prompt, so its answers are kept apart
+    return f"{variant}+{TranscriptCompressor(PROMPT_COMPRESSION).mode}"
+
+
+def prepare_source(transcript, custom_prompt, video_id, use_retrieval, timestamps, model=None, context_lengths=None):
+    """Text to send the model, whether it carries [m:ss] markers the answer can cite, and its budget report"""
+    segments = get_transcript_segments(video_id) if timestamps else None
+    cite_timestamps = bool(segments) and segments.text == transcript
+    if use_retrieval:
+        source_text = build_question_context(transcript, custom_prompt, video_id, segments=segments)
+    else:
+        source_text = segments.timecoded() if cite_timestamps else transcript
+    source_text, report = compress_transcript(source_text, PROMPT_COMPRESSION, model, context_lengths)
+    return source_text, cite_timestamps, report
+
+
+def generate_answer(youtube_url, transcript, video_title, channel_name, custom_prompt, model, available_models, context_lengths, use_retrieval, cache_key, timestamps=False, on_budget=None, history=None) -> str:
+    """Summary or answer for a loaded transcript; caches the response so even abandoned runs are not wasted
+
+    With ``timestamps`` the answer cites moments as links that open the video there.
+    ``on_budget(report)`` receives the prompt budget report. With ``history`` (earlier
+    (question, answer) turns, see chat_history_for()) it is answered as the next turn of that
+    conversation over the whole transcript. Raises SummaryError when every model fails.
+    """
+    client = get_openrouter_client(get_api_key())
+
+    video_id = extract_video_id(youtube_url)
+    source_text, cite_timestamps, report = prepare_source(transcript, custom_prompt, video_id, use_retrieval and history is None, timestamps, model, context_lengths)
+    if on_budget is not None:
+        on_budget(report)
+    models_to_try = [model] + [m for m in (available_models or []) if m != model]
+    try:
+        if history is not None:
+            summary = coalesced_summary(cache_key, answer_in_chat, source_text, chat_question(custom_prompt), history, model, video_title, channel_name, available_models, None, False, None, None, cite_timestamps)
+        else:
+            summary = coalesced_summary(cache_key, summarize_transcript, client, source_text, models_to_try, video_title, channel_name, custom_prompt, context_lengths, None, cite_timestamps)
+    except SummaryError:
+        raise
+    except Exception as e:
+        raise SummaryError(final_error_message(e)) from e
+    if cite_timestamps:
+        summary = link_timestamps(summary, video_id)
+    if cache_key:
+        get_response_cache().put(cache_key, summary, model)
+    return summary
+
+
+def generate_streamed_answer(stream: TranscriptStream, custom_prompt, model, available_models, context_lengths, cache_key, on_budget=None) -> str:
+    """Like generate_answer() for the whole transcript, but starts while the transcript is still being read
+
+    Raises SummaryError when every model fails, TranscriptError when no transcript arrives.
+    """
+    client = get_openrouter_client(get_api_key())
+    models_to_try = [model] + [m for m in (available_models or []) if m != model]
+    compressor = TranscriptCompressor(PROMPT_COMPRESSION)
+    fragments = (compressor.compress(fragment) for fragment in stream)
+    try:
+        summary = coalesced_summary(cache_key, summarize_stream, client, fragments, models_to_try, stream.title, stream.channel, custom_prompt, context_lengths)
+    except (TranscriptError, SummaryError):
+        raise
+    except Exception as e:
+        raise SummaryError(final_error_message(e)) from e
+    # A coalesced call never read the stream, so there is nothing to report
+    if on_budget is not None and compressor.original_chars:
+        on_budget(compressor.report(model, context_lengths))
+    if cache_key:
+        get_response_cache().put(cache_key, summary, model)
+    return summary
+
+
+def summarize_video(youtube_url: str, question: Optional[str] = None, model: Optional[str] = None, use_retrieval: bool = True, force_regenerate: bool = False, timestamps: bool = False, history=None) -> Dict[str, object]:
+    """Whole pipeline for one video: transcript (shared cache or Apify), then a cached or fresh answer
+
+    Returns a dict with url, video_id, title, channel, date, question, model, summary, cached and
+    prompt_budget (the budget report of a fresh answer, else None). With ``timestamps`` the summary links each cited [m:ss] moment to the video.
+    ``history`` lists earlier (question, answer) turns about the video to answer as a follow-up.
+    Raises TranscriptError or SummaryError. Being a plain module-level function it can also be
+    submitted to a ProcessPoolExecutor.
+    """
+    api_key = get_api_key()
+    available_models = fetch_openrouter_models(api_key)
+    context_lengths = fetch_model_context_lengths(api_key)
+    model = model or (available_models[0] if available_models else DEFAULT_MODEL)
+    question = question or ""
+    use_retrieval = use_retrieval and bool(question.strip())
+
+    video_id = extract_video_id(youtube_url)
+    cache_key = response_cache_key(video_id, question, model, answer_variant(use_retrieval, timestamps)) if video_id else None
+    budget = {}
+
+    if use_retrieval or timestamps or history:
+        # Retrieval, timestamps and conversations need the whole transcript before anything can be sent
+        transcript, title, channel, date = load_transcript(youtube_url, timestamps)
+        history = chat_history_for(transcript, history, model, context_lengths)
+        if history is not None:
+            cache_key = response_cache_key(video_id, question, model, answer_variant(use_retrieval, timestamps, history)) if video_id else None
+        summary = get_response_cache().get(cache_key) if cache_key and not force_regenerate else None
+        cached = summary is not None
+        if not cached:
+            summary = generate_answer(youtube_url, transcript, title, channel, question, model, available_models, context_lengths, use_retrieval, cache_key, timestamps, budget.update, history)
+    else:
+        # The whole transcript goes to the model, so summarizing can start while it is still read
+        stream = open_transcript(youtube_url)
+        title, channel, date = stream.title, stream.channel, stream.date
+        try:
+            summary = get_response_cache().get(cache_key) if cache_key and not force_regenerate else None
+            cached = summary is not None
+            if not cached:
+                summary = generate_streamed_answer(stream, question, model, available_models, context_lengths, cache_key, budget.update)
+        finally:
+            # Read whatever is left so the transcript is cached either way
+            stream.close()
+
+    return {
+        "url": youtube_url,
+        "video_id": video_id,
+        "title": title,
+        "channel": channel,
+        "date": date,
+        "question": question,
+        "model": model,
+        "summary": summary,
+        "cached": cached,
+        "prompt_budget": budget or None
+    }
+
+
+BATCH_APIFY_CONCURRENCY = int(os.getenv("BATCH_APIFY_CONCURRENCY", 3))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 4))
+BATCH_URLS_PER_APIFY_RUN = int(os.getenv("BATCH_URLS_PER_APIFY_RUN", 10))
+BATCH_STATUS_ICONS = {
+    "queued": "⏳",
+    "extracting": "📥",
+    "summarizing": "🧠",
+    "done": "✅",
+    "failed": "❌"
+}
+
+
+class BatchRun:
+    """Summarize many videos concurrently with separate Apify and OpenRouter concurrency limits
+
+    URLs are grouped so each Apify actor run extracts up to ``urls_per_run`` videos; each video
+    is summarized as soon as its group's dataset has been read. Raises SummaryError without an
+    OpenRouter API key.
+    """
+
+    def __init__(self, urls: List[str], model: str = DEFAULT_MODEL, custom_prompt: Optional[str] = None, available_models: Optional[List[str]] = None, context_lengths: Optional[Dict[str, int]] = None, apify_concurrency: int = BATCH_APIFY_CONCURRENCY, llm_concurrency: int = BATCH_LLM_CONCURRENCY, on_status=None, urls_per_run: int = BATCH_URLS_PER_APIFY_RUN, force_regenerate: bool = False):
+        api_key = get_api_key()
+        self.urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+        self.custom_prompt = custom_prompt or ""
+        self.context_lengths = context_lengths or {}
+        self.models_to_try = [model] + [m for m in (available_models or []) if m != model]
+        self.statuses = {url: "queued" for url in self.urls}
+        self.on_status = on_status
+        self.force_regenerate = force_regenerate
+        self._client = get_openrouter_client(api_key)
+        self._started = time.monotonic()
+
+        # One future per URL, completed by whichever stage finishes that video
+        self._future_by_url = {url: Future() for url in self.urls}
+        self.futures = {future: url for url, future in self._future_by_url.items()}
+
+        # Separate pools so slow actor runs never starve the completions (and vice versa)
+        self._apify_pool = ThreadPoolExecutor(max_workers=max(1, apify_concurrency), thread_name_prefix="batch-apify")
+        self._llm_pool = ThreadPoolExecutor(max_workers=max(1, llm_concurrency), thread_name_prefix="batch-llm")
+        group_size = max(1, urls_per_run)
+        for offset in range(0, len(self.urls), group_size):
+            self._apify_pool.submit(self._extract_group, self.urls[offset:offset + group_size])
+        self._apify_pool.shutdown(wait=False)
+
+    def _set_status(self, url: str, status: str) -> None:
+        self.statuses[url] = status
+        if self.on_status:
+            self.on_status(url, status)
+
+    def _finish(self, url: str, result: Dict[str, Optional[str]], status: str) -> None:
+        self._set_status(url, status)
+        result["status"] = status
+        result["seconds"] = round(time.monotonic() - self._started, 2)
+        self._future_by_url[url].set_result(result)
+        if all(future.done() for future in self._future_by_url.values()):
+            # Nothing is left to summarize, so let the idle completion workers exit
+            self._llm_pool.shutdown(wait=False)
+
+    def _extract_group(self, urls: List[str]) -> None:
+        for url in urls:
+            self._set_status(url, "extracting")
+        try:
+            extracted = load_transcripts(urls)
+        except Exception as e:
+            extracted = {url: e for url in urls}
+
+        for url in urls:
+            result = {"url": url, "title": None, "channel": None, "date": None, "summary": None, "prompt_budget": None, "error": None}
+            outcome = extracted.get(url, TranscriptError("Apify returned no result for this video."))
+            if isinstance(outcome, TranscriptError):
+                result.update(title=outcome.video_title, channel=outcome.channel_name, date=outcome.video_date, error=str(outcome))
+                self._finish(url, result, "failed")
+            elif isinstance(outcome, Exception):
+                result["error"] = f"Error extracting transcript: {outcome}"
+                self._finish(url, result, "failed")
+            else:
+                self._llm_pool.submit(self._summarize, url, result, *outcome)
+
+    def _summarize(self, url: str, result: Dict[str, Optional[str]], transcript: str, title: str, channel: str, date: Optional[str]) -> None:
+        result.update(title=title, channel=channel, date=date)
+        self._set_status(url, "summarizing")
+        try:
+            video_id = extract_video_id(url)
+            response_cache = get_response_cache()
+            cache_key = None
+            if video_id:
+                cache_key = response_cache_key(video_id, self.custom_prompt, self.models_to_try[0], answer_variant(bool(self.custom_prompt.strip())))
+                if not self.force_regenerate:
+                    result["summary"] = response_cache.get(cache_key)
+
+            if result["summary"] is None:
+                source_text, _, result["prompt_budget"] = prepare_source(
+                    transcript, self.custom_prompt, video_id, bool(self.custom_prompt.strip()), False,
+                    self.models_to_try[0], self.context_lengths
+                )
+                result["summary"] = coalesced_summary(
+                    cache_key, summarize_transcript, self._client, source_text, self.models_to_try,
+                    title, channel, self.custom_prompt, self.context_lengths
+                )
+                if cache_key:
+                    response_cache.put(cache_key, result["summary"], self.models_to_try[0])
+            self._finish(url, result, "done")
+        except Exception as e:
+            result["error"] = str(e)
+            self._finish(url, result, "failed")
+
+    def results(self):
+        """Yield each video's result as soon as it finishes"""
+        for future in as_completed(self.futures):
+            yield future.result()
+
+
+def parse_url_list(text: str) -> List[str]:
+    """Split pasted text into URLs (one per line, or separated by spaces/commas)"""
+    return [part for part in re.split(r'[\s,]+', text or "") if part]
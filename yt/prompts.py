@@ -0,0 +1,84 @@
+"""Prompt templates for summaries, questions and the map step of long transcripts"""
+from typing import Optional
+
+# Bump whenever prompt wording changes so cached responses from older templates are not reused
+PROMPT_TEMPLATE_VERSION = "1"
+CITE_TIMESTAMPS_INSTRUCTION = "The transcript is marked with [m:ss] timestamps. Cite the timestamp of each point you make in the same [m:ss] form, e.g. [12:34]."
+
+
+def build_prompt(text, video_title=None, channel_name=None, custom_prompt=None, cite_timestamps=False) -> str:
+    """Build the single-message prompt for a summary or a custom question"""
+    if custom_prompt and custom_prompt.strip():
+        # Use custom prompt with transcript context
+        if video_title and channel_name:
+            prompt = f"""You are analyzing a YouTube video from the channel "{channel_name}" titled: "{video_title}"
+
+Transcript:
+{text}
+
+User Question: {custom_prompt.strip()}"""
+        elif video_title:
+            prompt = f"""You are analyzing a YouTube video titled: "{video_title}"
+
+Transcript:
+{text}
+
+User Question: {custom_prompt.strip()}"""
+        else:
+            prompt = f"""Transcript:
+{text}
+
+User Question: {custom_prompt.strip()}"""
+    else:
+        # Use default summarization prompts
+        if video_title and channel_name:
+            prompt = f"""You are analyzing a YouTube video from the channel "{channel_name}" titled: "{video_title}"
+
+Please provide a concise summary of the following transcript:
+
+{text}
+
+Create a clear summary that captures the main points and key information."""
+        elif video_title:
+            prompt = f"""You are analyzing a YouTube video titled: "{video_title}"
+
+Please provide a concise summary of the following transcript:
+
+{text}
+
+Create a clear summary that captures the main points and key information."""
+        else:
+            prompt = f"""Please provide a concise summary of the following transcript:
+
+{text}
+
+Create a clear summary that captures the main points and key information."""
+
+    if cite_timestamps:
+        prompt += f"\n\n{CITE_TIMESTAMPS_INSTRUCTION}"
+    return prompt
+
+
+def build_chunk_prompt(chunk: str, index: int, total: Optional[int], video_title=None, channel_name=None, custom_prompt=None, cite_timestamps=False) -> str:
+    """Prompt for the map step: condense one part of a long transcript (``total`` may be unknown while it streams in)"""
+    header = "You are analyzing a YouTube video"
+    if channel_name:
+        header += f' from the channel "{channel_name}"'
+    if video_title:
+        header += f' titled: "{video_title}"'
+
+    if custom_prompt and custom_prompt.strip():
+        task = f"""Extract every detail from this part that helps answer the question: {custom_prompt.strip()}
+If nothing in this part is relevant, reply with "Nothing relevant." """
+    else:
+        task = "Summarize the main points and key information of this part as concise bullet points."
+    if cite_timestamps:
+        task += f"\n{CITE_TIMESTAMPS_INSTRUCTION}"
+
+    return f"""{header}
+
+This is part {index}{f" of {total}" if total else ""} of the transcript:
+
+{chunk}
+
+{task}"""
@@ -0,0 +1,121 @@
+"""Offline BM25 retrieval of the transcript excerpts relevant to a question"""
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Optional
+
+from .chunking import estimate_tokens, split_transcript
+from .segments import SegmentedTranscript, format_timestamp
+
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", 400))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 6))
+RETRIEVAL_MIN_TOKENS = int(os.getenv("RETRIEVAL_MIN_TOKENS", 3000))
+WORD_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a an and are as at be but by do does did for from has have he her his how i if in is it its me my of on or our
+she so that the their them then there these they this to was we were what when where which who why will with
+you your about can could would should just not no yes
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, used for keyword retrieval"""
+    return [word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 1 and word not in STOPWORDS]
+
+
+class TranscriptIndex:
+    """Offline BM25 index over fixed-size transcript chunks"""
+
+    def __init__(self, transcript: str, chunk_tokens: int = RETRIEVAL_CHUNK_TOKENS, k1: float = 1.5, b: float = 0.75):
+        self.chunks = split_transcript(transcript, chunk_tokens) if transcript else []
+        self.k1 = k1
+        # Where each chunk starts in the transcript, so excerpts can be mapped back to moments
+        self.offsets = []
+        position = 0
+        for chunk in self.chunks:
+            found = transcript.find(chunk[:64], position)
+            position = found if found >= 0 else position
+            self.offsets.append(position)
+            position += len(chunk)
+        self.b = b
+        self._postings: Dict[str, List[tuple]] = defaultdict(list)
+        self._lengths = []
+        for chunk_id, chunk in enumerate(self.chunks):
+            term_counts = Counter(tokenize(chunk))
+            self._lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self._postings[term].append((chunk_id, count))
+
+        total = len(self.chunks)
+        self._avg_length = (sum(self._lengths) / total) if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> List[int]:
+        """Return ids of the best-matching chunks, highest score first"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for chunk_id, count in self._postings[term]:
+                length_norm = 1 - self.b + self.b * self._lengths[chunk_id] / (self._avg_length or 1)
+                scores[chunk_id] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+        return sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+
+TRANSCRIPT_INDEX_MAX_ENTRIES = 64
+_indexes: "OrderedDict[str, TranscriptIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_transcript_index(index_key: str, transcript: str) -> TranscriptIndex:
+    """Chunk index shared across sessions; ``index_key`` must change whenever the text does"""
+    with _indexes_lock:
+        index = _indexes.get(index_key)
+        if index is not None:
+            _indexes.move_to_end(index_key)
+            return index
+
+    index = TranscriptIndex(transcript)
+    with _indexes_lock:
+        _indexes[index_key] = index
+        while len(_indexes) > TRANSCRIPT_INDEX_MAX_ENTRIES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def build_question_context(transcript: str, question: str, video_id: Optional[str] = None, top_k: int = RETRIEVAL_TOP_K, segments: Optional[SegmentedTranscript] = None) -> str:
+    """Return only the transcript excerpts relevant to a question, or the full transcript as a fallback
+
+    With timestamped ``segments`` (whose text is ``transcript``) the result carries [m:ss] markers
+    the model can cite.
+    """
+    timecoded = bool(segments) and segments.text == transcript
+    if estimate_tokens(transcript) <= RETRIEVAL_MIN_TOKENS:
+        return segments.timecoded() if timecoded else transcript
+
+    # The same video can come as plain or timecoded text, or be re-extracted, so key on the text too
+    index_key = f"{video_id or ''}:{hashlib.sha1(transcript.encode('utf-8')).hexdigest()}"
+    index = get_transcript_index(index_key, transcript)
+    chunk_ids = index.search(question, top_k)
+    if not chunk_ids:
+        # No keyword overlap (e.g. "what is this about?"), so the model needs the whole transcript
+        return segments.timecoded() if timecoded else transcript
+
+    # Keep excerpts in transcript order so the model sees a coherent sequence
+    excerpts = []
+    for position, chunk_id in enumerate(sorted(chunk_ids), 1):
+        chunk = index.chunks[chunk_id]
+        if timecoded:
+            start = index.offsets[chunk_id]
+            label = f"[Excerpt {position} of {len(chunk_ids)}, from {format_timestamp(segments.time_at(start))}]"
+            excerpts.append(f"{label}\n{segments.timecoded(start, start + len(chunk))}")
+        else:
+            excerpts.append(f"[Excerpt {position} of {len(chunk_ids)}]\n{chunk}")
+    return "\n\n".join(excerpts)
@@ -0,0 +1,259 @@
+"""Timestamped transcript segments: compact storage, a time index and clickable &t= links"""
+import os
+import re
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from .cache import SQLiteLRUCache
+
+TIMECODE_INTERVAL_SECONDS = float(os.getenv("TIMECODE_INTERVAL_SECONDS", 30))
+SEGMENTS_MEMORY_ENTRIES = 64
+TIME_PATTERN = r'(?:\d+:)?\d{1,2}:\d{2}(?:[.,]\d+)?'
+TIMESTAMPED_LINE = re.compile(
+    rf'^\s*[\[(]?({TIME_PATTERN}|\d+(?:\.\d+)?s?)(?:\s*(?:-->|-|–)\s*({TIME_PATTERN}))?[\])]?\s*[-–:]?\s*(.*)$'
+)
+CITATION = re.compile(r'\[((?:\d+:)?\d{1,2}:\d{2})\](?!\()')
+# Dataset item fields that may hold a list of caption segments
+SEGMENT_LIST_FIELDS = ("data", "segments", "transcript", "captions", "subtitles")
+START_FIELDS = ("start", "startTime", "start_time", "offset", "from")
+END_FIELDS = ("end", "endTime", "end_time", "to")
+DURATION_FIELDS = ("dur", "duration")
+
+
+def parse_time(value) -> Optional[float]:
+    """Seconds from a number, a numeric string ("12.5", "12.5s") or a clock string ("1:02:03.5")"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip().rstrip("s").replace(",", ".")
+    try:
+        if ":" not in value:
+            return float(value)
+        seconds = 0.0
+        for part in value.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def format_timestamp(seconds: float) -> str:
+    """m:ss or h:mm:ss, the way YouTube shows times"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def _first(item: dict, fields: Iterable[str]):
+    for field in fields:
+        if item.get(field) not in (None, ""):
+            return item[field]
+    return None
+
+
+def _dict_segment(item: dict) -> Optional[Tuple[float, Optional[float], str]]:
+    text = item.get("text") or item.get("snippet") or item.get("caption")
+    start = parse_time(_first(item, START_FIELDS))
+    if not isinstance(text, str) or start is None:
+        # Millisecond fields are used by some caption formats
+        if isinstance(text, str) and item.get("startMs") is not None:
+            start = float(item["startMs"]) / 1000
+        else:
+            return None
+    end = parse_time(_first(item, END_FIELDS))
+    duration = parse_time(_first(item, DURATION_FIELDS))
+    if end is None and duration is not None:
+        end = start + duration
+    return start, end, text
+
+
+def parse_timestamped_text(text: str) -> List[Tuple[float, Optional[float], str]]:
+    """Segments from caption text whose lines start with a timestamp; untimed lines join the previous one"""
+    segments = []
+    for line in text.splitlines():
+        match = TIMESTAMPED_LINE.match(line)
+        start = parse_time(match.group(1)) if match else None
+        if start is not None:
+            segments.append([start, parse_time(match.group(2)) if match.group(2) else None, match.group(3)])
+        elif segments and line.strip():
+            segments[-1][2] += " " + line.strip()
+    return [tuple(segment) for segment in segments]
+
+
+def item_segments(item: dict) -> List[Tuple[float, Optional[float], str]]:
+    """Caption segments found in one actor dataset item, in any of the shapes the actor may return"""
+    for field in SEGMENT_LIST_FIELDS:
+        value = item.get(field)
+        if isinstance(value, list):
+            return [segment for segment in (_dict_segment(entry) for entry in value if isinstance(entry, dict)) if segment]
+
+    segment = _dict_segment(item)
+    if segment:
+        return [segment]
+
+    text = item.get("transcript") or item.get("text")
+    if isinstance(text, str):
+        return parse_timestamped_text(text)
+    return []
+
+
+class SegmentedTranscript:
+    """Caption segments held as parallel arrays over one whitespace-normalized text
+
+    ``starts``/``ends`` are seconds and ``offsets`` the character offset where each segment's text
+    begins in ``text``, so a character position maps to a moment with one binary search.
+    """
+
+    def __init__(self, text: str, starts: array, ends: array, offsets: array):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Tuple[float, Optional[float], str]]) -> "SegmentedTranscript":
+        ordered = sorted(
+            ((start, end, re.sub(r'\s+', ' ', text).strip()) for start, end, text in segments),
+            key=lambda segment: segment[0]
+        )
+        ordered = [segment for segment in ordered if segment[2]]
+        starts, ends, offsets = array("d"), array("d"), array("I")
+        parts, position = [], 0
+        for index, (start, end, text) in enumerate(ordered):
+            next_start = ordered[index + 1][0] if index + 1 < len(ordered) else start
+            starts.append(start)
+            ends.append(end if end is not None else next_start)
+            offsets.append(position)
+            parts.append(text)
+            position += len(text) + 1
+        return cls(" ".join(parts), starts, ends, offsets)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def segment_at(self, char_offset: int) -> int:
+        """Index of the segment containing a character offset of ``text``"""
+        return max(0, bisect_right(self.offsets, char_offset) - 1)
+
+    def time_at(self, char_offset: int) -> float:
+        return self.starts[self.segment_at(char_offset)] if len(self) else 0.0
+
+    def segment(self, index: int) -> Tuple[float, float, str]:
+        end_offset = self.offsets[index + 1] - 1 if index + 1 < len(self) else len(self.text)
+        return self.starts[index], self.ends[index], self.text[self.offsets[index]:end_offset]
+
+    def timecoded(self, start_offset: int = 0, end_offset: Optional[int] = None, interval: float = TIMECODE_INTERVAL_SECONDS) -> str:
+        """Text between two offsets with a [m:ss] marker at most every ``interval`` seconds"""
+        end_offset = len(self.text) if end_offset is None else end_offset
+        if not len(self):
+            return self.text[start_offset:end_offset]
+
+        parts = []
+        last_marker = None
+        first = self.segment_at(start_offset)
+        last = self.segment_at(max(start_offset, end_offset - 1))
+        for index in range(first, last + 1):
+            segment_start = max(self.offsets[index], start_offset)
+            segment_end = min(self.offsets[index + 1] - 1 if index + 1 < len(self) else len(self.text), end_offset)
+            if last_marker is None or self.starts[index] - last_marker >= interval:
+                parts.append(f"[{format_timestamp(self.starts[index])}]")
+                last_marker = self.starts[index]
+            parts.append(self.text[segment_start:segment_end])
+        return " ".join(part for part in parts if part)
+
+    def to_bytes(self) -> bytes:
+        """Compact binary form: segment count, the three arrays, then the UTF-8 text"""
+        return struct.pack("<I", len(self)) + self.starts.tobytes() + self.ends.tobytes() + self.offsets.tobytes() + self.text.encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SegmentedTranscript":
+        (count,) = struct.unpack_from("<I", data)
+        arrays, position = [], 4
+        for typecode in ("d", "d", "I"):
+            values = array(typecode)
+            size = values.itemsize * count
+            values.frombytes(data[position:position + size])
+            arrays.append(values)
+            position += size
+        return cls(data[position:].decode("utf-8"), *arrays)
+
+
+def link_timestamps(answer: str, video_id: Optional[str]) -> str:
+    """Turn [m:ss] citations in an answer into links that open the video at that moment"""
+    if not video_id:
+        return answer
+    return CITATION.sub(
+        lambda match: f"[{match.group(1)}](https://www.youtube.com/watch?v={video_id}&t={int(parse_time(match.group(1)))}s)",
+        answer
+    )
+
+
+class SegmentCache(SQLiteLRUCache):
+    """Shared on-disk store of timestamped segments keyed by video ID"""
+
+    table = "segments"
+    key_column = "video_id"
+    schema = """
+        CREATE TABLE IF NOT EXISTS segments (
+            video_id TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+    """
+
+    def get(self, video_id: str) -> Optional[SegmentedTranscript]:
+        row = self._lookup(video_id, "data")
+        return SegmentedTranscript.from_bytes(row[0]) if row else None
+
+    def put(self, video_id: str, segments: SegmentedTranscript) -> None:
+        data = segments.to_bytes()
+        self._store((video_id, data, len(data)))
+
+
+@lru_cache(maxsize=None)
+def get_segment_cache() -> SegmentCache:
+    """Process-wide segment cache, stored next to the transcript cache with the same limits"""
+    return SegmentCache(
+        path=os.getenv("TRANSCRIPT_CACHE_PATH", os.path.join(".cache", "transcripts.sqlite3")),
+        ttl_seconds=float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+        max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", 500)),
+        max_bytes=int(float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", 200)) * 1024 * 1024)
+    )
+
+
+_segments: "OrderedDict[str, SegmentedTranscript]" = OrderedDict()
+_segments_lock = threading.Lock()
+
+
+def remember_segments(video_id: str, segments: SegmentedTranscript) -> None:
+    """Keep a video's segments on disk and in the small in-memory LRU"""
+    get_segment_cache().put(video_id, segments)
+    with _segments_lock:
+        _segments[video_id] = segments
+        while len(_segments) > SEGMENTS_MEMORY_ENTRIES:
+            _segments.popitem(last=False)
+
+
+def get_transcript_segments(video_id: Optional[str]) -> Optional[SegmentedTranscript]:
+    """Segments of a video extracted in timestamped mode, or None"""
+    if not video_id:
+        return None
+    with _segments_lock:
+        segments = _segments.get(video_id)
+        if segments is not None:
+            _segments.move_to_end(video_id)
+            return segments
+    segments = get_segment_cache().get(video_id)
+    if segments is not None:
+        with _segments_lock:
+            _segments[video_id] = segments
+    return segments
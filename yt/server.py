@@ -0,0 +1,273 @@
+"""Asyncio JSON HTTP service: /transcript, /summarize, /ask and /search on top of the headless pipeline, plus /metrics"""
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from .library import LIBRARY_SEARCH_LIMIT, TRANSCRIPT_LIBRARY, get_transcript_library
+from .metrics import get_metrics
+from .pipeline import summarize_video
+from .segments import get_transcript_segments
+from .summarize import SummaryError
+from .transcripts import TranscriptError, extract_video_id, load_transcript
+
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8080))
+SERVER_REQUEST_TIMEOUT_SECONDS = float(os.getenv("SERVER_REQUEST_TIMEOUT_SECONDS", 300))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 32))
+# Most requests that may run at once per endpoint; the rest wait their turn within the timeout
+SERVER_ENDPOINT_CONCURRENCY = {
+    "/transcript": int(os.getenv("SERVER_TRANSCRIPT_CONCURRENCY", 8)),
+    "/summarize": int(os.getenv("SERVER_SUMMARIZE_CONCURRENCY", 4)),
+    "/ask": int(os.getenv("SERVER_ASK_CONCURRENCY", 4)),
+    "/search": int(os.getenv("SERVER_SEARCH_CONCURRENCY", 16)),
+}
+MAX_BODY_BYTES = 64 * 1024
+KEEP_ALIVE_SECONDS = 15
+
+
+class HTTPError(Exception):
+    """Raised by a handler to answer with a specific status code"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def require(params: Dict[str, object], name: str) -> str:
+    value = params.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(400, f"Missing required parameter '{name}'.")
+    return value.strip()
+
+
+def flag(params: Dict[str, object], name: str) -> bool:
+    value = params.get(name, False)
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def chat_turns(params: Dict[str, object]) -> Optional[List[Tuple[str, str]]]:
+    """Earlier turns from a ``history`` list of {"question", "answer"} objects, or None without one"""
+    history = params.get("history")
+    if history is None:
+        return None
+    if not isinstance(history, list) or not all(
+        isinstance(turn, dict) and isinstance(turn.get("question"), str) and isinstance(turn.get("answer"), str)
+        for turn in history
+    ):
+        raise HTTPError(400, "Parameter 'history' must be a list of {\"question\", \"answer\"} objects.")
+    return [(turn["question"], turn["answer"]) for turn in history]
+
+
+class SummarizerService:
+    """Routes JSON requests to the pipeline with per-endpoint concurrency limits and timeouts
+
+    The pipeline's Apify and OpenRouter clients are synchronous, so each upstream call runs on a
+    bounded thread pool and the event loop only awaits it; one process serves many callers.
+    A timed-out request answers 504 while its upstream call finishes in the background and still
+    fills the shared caches for the next caller.
+    """
+
+    def __init__(self, concurrency: Optional[Dict[str, int]] = None, timeout: float = SERVER_REQUEST_TIMEOUT_SECONDS, workers: int = SERVER_WORKERS):
+        self.timeout = timeout
+        self.routes = {
+            "/transcript": self.transcript,
+            "/summarize": self.summarize,
+            "/ask": self.ask,
+            "/search": self.search,
+            "/health": self.health,
+            "/metrics": self.metrics,
+        }
+        self.limits = {
+            path: asyncio.Semaphore(max(1, limit))
+            for path, limit in (concurrency or SERVER_ENDPOINT_CONCURRENCY).items()
+        }
+        self.in_flight = Counter({path: 0 for path in self.limits})
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="server")
+        self._started = time.time()
+
+    async def run_blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(fn, *args))
+
+    async def transcript(self, params: Dict[str, object]) -> Dict[str, object]:
+        url = require(params, "url")
+        timestamps = flag(params, "timestamps")
+        transcript, title, channel, date = await self.run_blocking(load_transcript, url, timestamps)
+        video_id = extract_video_id(url)
+        payload = {"url": url, "video_id": video_id, "title": title, "channel": channel, "date": date, "transcript": transcript}
+        if timestamps:
+            segments = get_transcript_segments(video_id) or []
+            payload["segments"] = [
+                dict(zip(("start", "end", "text"), segments.segment(index))) for index in range(len(segments))
+            ]
+        return payload
+
+    async def summarize(self, params: Dict[str, object]) -> Dict[str, object]:
+        url = require(params, "url")
+        return await self.run_blocking(summarize_video, url, None, params.get("model"), True, flag(params, "regenerate"), flag(params, "timestamps"))
+
+    async def ask(self, params: Dict[str, object]) -> Dict[str, object]:
+        url = require(params, "url")
+        question = require(params, "question")
+        return await self.run_blocking(summarize_video, url, question, params.get("model"), not flag(params, "full_transcript"), flag(params, "regenerate"), flag(params, "timestamps"), chat_turns(params))
+
+    async def search(self, params: Dict[str, object]) -> Dict[str, object]:
+        query = require(params, "q")
+        if not TRANSCRIPT_LIBRARY:
+            raise HTTPError(404, "The transcript library is disabled (TRANSCRIPT_LIBRARY=false).")
+        try:
+            limit = int(params.get("limit", LIBRARY_SEARCH_LIMIT))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "Parameter 'limit' must be a number.")
+        results = await self.run_blocking(get_transcript_library().search, query, max(1, min(limit, 100)))
+        return {"query": query, "results": results}
+
+    async def health(self, params: Dict[str, object]) -> Dict[str, object]:
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self._started, 1),
+            "in_flight": dict(self.in_flight)
+        }
+
+    async def metrics(self, params: Dict[str, object]):
+        """Prometheus text by default, or the JSON snapshot with format=json"""
+        if params.get("format") == "json":
+            return get_metrics().snapshot()
+        return get_metrics().prometheus_text()
+
+    async def dispatch(self, method: str, path: str, params: Dict[str, object]) -> Tuple[int, Dict[str, object]]:
+        """Run one request and map pipeline failures to HTTP status codes"""
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404, {"error": f"Unknown endpoint {path}"}
+        if method not in ("GET", "POST"):
+            return 405, {"error": f"Method {method} not allowed"}
+
+        async def run_handler():
+            limit = self.limits.get(path)
+            if limit is None:
+                return await handler(params)
+            async with limit:
+                self.in_flight[path] += 1
+                try:
+                    return await handler(params)
+                finally:
+                    self.in_flight[path] -= 1
+
+        try:
+            return 200, await asyncio.wait_for(run_handler(), self.timeout)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except TranscriptError as e:
+            return 422, {"error": str(e), "title": e.video_title, "channel": e.channel_name, "date": e.video_date}
+        except SummaryError as e:
+            return 502, {"error": str(e)}
+        except (asyncio.TimeoutError, TimeoutError):
+            return 504, {"error": f"Request took longer than {self.timeout:.0f}s"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection until the client closes it or goes idle"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_SECONDS)
+                except HTTPError as e:
+                    await write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    return
+                if request is None:
+                    return
+                method, path, params, keep_alive = request
+                status, payload = await self.dispatch(method, path, params)
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = SERVER_HOST, port: int = SERVER_PORT) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Parse one request into (method, path, params, keep_alive), or None when the client hung up
+
+    Parameters come from the query string and, for POST, from a JSON object body.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    url = urlsplit(target)
+    params: Dict[str, object] = dict(parse_qsl(url.query))
+    raw_length = headers.get("content-length") or "0"
+    # int() would also take "-1", "+5" or "1_000"
+    if not (raw_length.isascii() and raw_length.isdigit()):
+        raise HTTPError(400, "Content-Length must be a non-negative integer")
+    length = int(raw_length)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+    if length:
+        body = await reader.readexactly(length)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "Body must be a JSON object")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        params.update(payload)
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    return method.upper(), url.path.rstrip("/") or "/", params, keep_alive
+
+
+async def write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool) -> None:
+    """Write a JSON payload, or a plain-text one (Prometheus metrics) when it is a string"""
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    head = (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+def run_server(host: str = SERVER_HOST, port: int = SERVER_PORT) -> None:
+    """Block serving the API until interrupted"""
+    service = SummarizerService()
+    print(f"Serving /transcript, /summarize, /ask, /search and /metrics on http://{host}:{port}", flush=True)
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        pass
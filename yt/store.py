@@ -0,0 +1,136 @@
+"""Process-wide transcript store: one compressed copy per video, referenced by key from sessions"""
+import hashlib
+import os
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional
+
+from .cache import get_transcript_cache
+from .transcripts import extract_video_id, YOUTUBE_ID_PATTERN
+
+TRANSCRIPT_STORE_MAX_MB = float(os.getenv("TRANSCRIPT_STORE_MAX_MB", 100))
+TRANSCRIPT_STORE_COMPRESS = os.getenv("TRANSCRIPT_STORE_COMPRESS", "true").lower() in ("1", "true", "yes")
+
+
+class TranscriptStore:
+    """Deduplicated in-memory transcripts with an overall size limit and LRU eviction
+
+    Sessions keep only the key (the video ID), so a video opened by a hundred sessions is held
+    once. Evicted transcripts are reloaded from the on-disk transcript cache on the next get().
+    """
+
+    def __init__(self, max_bytes: int, compress: bool = True):
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._raw_bytes = 0
+
+    def put(self, key: str, transcript: str) -> str:
+        """Store a transcript, replacing the key's entry when the text differs, and return its key"""
+        raw = transcript.encode("utf-8")
+        digest = transcript_digest(transcript)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] == digest:
+                self._entries.move_to_end(key)
+                return key
+
+        data = zlib.compress(raw, 6) if self.compress else raw
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+                self._raw_bytes -= previous[1]
+            self._entries[key] = (data, len(raw), digest)
+            self._bytes += len(data)
+            self._raw_bytes += len(raw)
+            self._evict()
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        """The transcript for a key, or None if it was never stored or has been evicted"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        data = entry[0]
+        return (zlib.decompress(data) if self.compress else data).decode("utf-8")
+
+    def _evict(self) -> None:
+        # Always keep the newest entry, even if it alone exceeds the limit
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (data, raw_size, _) = self._entries.popitem(last=False)
+            self._bytes -= len(data)
+            self._raw_bytes -= raw_size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Entries, stored and uncompressed bytes, plus hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "raw_bytes": self._raw_bytes,
+                "compression_ratio": round(self._raw_bytes / self._bytes, 2) if self._bytes else 1.0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+@lru_cache(maxsize=None)
+def get_transcript_store() -> TranscriptStore:
+    """Transcript store shared by every session"""
+    return TranscriptStore(int(TRANSCRIPT_STORE_MAX_MB * 1024 * 1024), TRANSCRIPT_STORE_COMPRESS)
+
+
+def transcript_digest(transcript: str) -> str:
+    """Short fingerprint of a transcript's text, to tell a changed transcript from the same one"""
+    return hashlib.blake2b(transcript.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def transcript_key(youtube_url: str) -> str:
+    """Store key for a video: its canonical ID, so every URL form shares one copy"""
+    return extract_video_id(youtube_url) or youtube_url
+
+
+def store_transcript(youtube_url: str, transcript: str) -> str:
+    """Put a transcript in the shared store and return the key sessions should keep"""
+    return get_transcript_store().put(transcript_key(youtube_url), transcript)
+
+
+def get_stored_transcript(key: str) -> Optional[str]:
+    """Transcript for a store key, falling back to the on-disk cache after an eviction"""
+    store = get_transcript_store()
+    transcript = store.get(key)
+    if transcript is None and YOUTUBE_ID_PATTERN.match(key):
+        cached = get_transcript_cache().get(key)
+        if cached:
+            transcript = cached["transcript"]
+            store.put(key, transcript)
+    return transcript
+
+
+def deep_size(value, seen=None) -> int:
+    """Approximate memory held by a value and everything it references, counting shared objects once"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(key, seen) + deep_size(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in value)
+    return size
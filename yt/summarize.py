@@ -0,0 +1,296 @@
+"""Summaries and answers: single pass when the transcript fits, map-reduce over chunks otherwise"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from itertools import chain
+from typing import Iterable, List, Sized
+
+from .chat import build_chat_messages
+from .chunking import CHARS_PER_TOKEN, chunk_token_budget, estimate_tokens, iter_chunks, split_transcript
+from .catalog import get_model_catalog
+from .clients import get_openrouter_client
+from .llm import (
+    DEFAULT_MODEL, FAILURE_NOTES, EmptyResponseError, StreamInterrupted, final_error_message,
+    get_model_router, hedged_completion, prompt_token_estimate, route_completion, stream_completion
+)
+from .metrics import get_metrics
+from .prompts import build_chunk_prompt, build_prompt
+
+CHUNK_SUMMARY_WORKERS = int(os.getenv("CHUNK_SUMMARY_WORKERS", 4))
+MAX_REDUCE_ROUNDS = 3
+
+
+class SummaryError(Exception):
+    """Raised when no summary or answer could be produced; the message is meant for the user"""
+
+
+def record_fallback(requested_model: str, used_model: str) -> None:
+    if used_model != requested_model:
+        get_metrics().count("yt_model_fallbacks_total", requested=requested_model, used=used_model)
+
+
+def get_api_key() -> str:
+    """OpenRouter API key from the environment; raises SummaryError if it is missing"""
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        raise SummaryError("OpenRouter API key not found. Please set the OPENROUTER_API_KEY environment variable.")
+    return api_key
+
+
+def summarize_text(text, model=DEFAULT_MODEL, video_title=None, channel_name=None, video_date=None, custom_prompt=None, available_models=None, on_text=None, hedge=False, on_status=None, on_hedge=None, cite_timestamps=False) -> str:
+    """Summarize text using OpenRouter API with automatic model switching on rate limits
+
+    When ``on_text(text, final)`` is given, the answer is streamed through it (an empty final text
+    means "clear what was shown"). ``on_status(level, message)`` reports fallbacks with level
+    "warning" or "success". With ``hedge``, slow models are raced against the next-best one and
+    ``on_hedge`` receives the outcome. ``cite_timestamps`` asks the model to cite the [m:ss]
+    markers of a timecoded transcript. Raises SummaryError when every model fails.
+    """
+    # Prepare the prompt
+    prompt = build_prompt(text, video_title, channel_name, custom_prompt, cite_timestamps)
+    messages = [
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    return complete_messages(messages, model, available_models, on_text, hedge, on_status, on_hedge)
+
+
+def answer_in_chat(text, question, history=(), model=DEFAULT_MODEL, video_title=None, channel_name=None, available_models=None, on_text=None, hedge=False, on_status=None, on_hedge=None, cite_timestamps=False) -> str:
+    """Answer a question as the next turn of a conversation about one video
+
+    ``text`` (the whole transcript) goes into a system message that is identical for every turn,
+    followed by the earlier ``(question, answer)`` turns, so providers can reuse the cached
+    prefix. Callbacks are those of summarize_text(); raises SummaryError when every model fails.
+    """
+    messages = build_chat_messages(text, question, history, video_title, channel_name, cite_timestamps, model)
+    return complete_messages(messages, model, available_models, on_text, hedge, on_status, on_hedge)
+
+
+def complete_messages(messages, model=DEFAULT_MODEL, available_models=None, on_text=None, hedge=False, on_status=None, on_hedge=None) -> str:
+    """Send chat messages to the best available model, falling back on failures (see summarize_text())"""
+    on_status = on_status or (lambda level, message: None)
+
+    # Reuse the process-wide OpenRouter client
+    api_key = get_api_key()
+    client = get_openrouter_client(api_key)
+
+    # Build the fallback list, then keep only healthy models ordered by expected latency
+    candidates = [model]
+    if available_models and model in available_models:
+        # Add other available models as fallbacks
+        for fallback_model in available_models:
+            if fallback_model != model and fallback_model not in candidates:
+                candidates.append(fallback_model)
+
+    # Skip fallbacks whose context window cannot hold the prompt
+    catalog = get_model_catalog(api_key)
+    prompt_tokens = prompt_token_estimate(messages)
+    candidates = [candidate for candidate in candidates if catalog.fits(candidate, prompt_tokens)] or candidates
+
+    router = get_model_router()
+    models_to_try = router.order_models(candidates)
+    if not models_to_try:
+        wait_seconds = min(router.cooldown_remaining(candidate) for candidate in candidates)
+        raise SummaryError(f"All models are currently rate limited. Please try again in {wait_seconds:.0f} seconds.")
+
+    if hedge and len(models_to_try) > 1:
+        try:
+            result = hedged_completion(client, messages, models_to_try, on_text)
+        except StreamInterrupted as e:
+            if on_text is not None:
+                on_text("", True)
+            raise SummaryError(f"The response from {e.model} was interrupted: {e.cause}. Please try again.") from e
+        except Exception as e:
+            if on_text is not None:
+                on_text("", True)
+            raise SummaryError(final_error_message(e)) from e
+        record_fallback(model, result["model"])
+        if on_hedge is not None:
+            on_hedge({"model": result["model"], "attempts": result["attempts"]})
+        if not result["text"].strip():
+            raise SummaryError(f"Model {result['model']} returned an empty response")
+        return result["text"].strip()
+
+    if on_text is None:
+        # The requested model first; fallbacks are raced only once it fails
+        try:
+            summary, used_model = route_completion(client, messages, models_to_try)
+        except Exception as e:
+            raise SummaryError(final_error_message(e)) from e
+        record_fallback(model, used_model)
+        if used_model != model:
+            on_status("success", f"Answered with {used_model} because {model} was unavailable.")
+        return summary
+
+    # Streaming can only show one model at a time, so walk the ordered list
+    for attempt, current_model in enumerate(models_to_try):
+        started = time.monotonic()
+        try:
+            summary = stream_completion(client, current_model, messages, on_text).strip()
+            if not summary:
+                raise EmptyResponseError(f"Model {current_model} returned an empty response")
+
+            router.record_success(current_model, time.monotonic() - started)
+            record_fallback(model, current_model)
+            if attempt > 0:
+                on_status("success", f"Successfully used {current_model} after {models_to_try[0]} failed!")
+            return summary
+
+        except StreamInterrupted as e:
+            # Part of the answer is already shown, so don't restart it on another model
+            router.record_failure(current_model, e.cause)
+            on_text("", True)
+            raise SummaryError(f"The response from {e.model} was interrupted: {e.cause}. Please try again.") from e
+
+        except Exception as e:
+            error_class = router.record_failure(current_model, e)
+            on_text("", True)
+            if attempt < len(models_to_try) - 1:
+                note = FAILURE_NOTES.get(error_class, f"failed: {str(e)}")
+                on_status("warning", f"Model {current_model} {note}. Trying next model...")
+                continue
+            raise SummaryError(final_error_message(e)) from e
+
+    raise SummaryError("No model is available.")
+
+
+def request_completion(client, prompt: str, models_to_try: List[str]) -> str:
+    """Run a single-message completion through the model router"""
+    content, used_model = route_completion(client, [{"role": "user", "content": prompt}], models_to_try)
+    record_fallback(models_to_try[0], used_model)
+    return content
+
+
+def summarize_chunks(client, chunks: Iterable[str], models_to_try: List[str], video_title=None, channel_name=None, custom_prompt=None, on_progress=None, cite_timestamps=False, slots=None) -> List[str]:
+    """Map step: summarize chunks concurrently with a bounded worker pool, keeping their order
+
+    ``chunks`` may be a lazy iterable (e.g. of a transcript still being read): each chunk starts
+    as soon as it is produced, and prompts then number parts without a total. ``slots`` is an
+    optional semaphore bounding how many completions run at once across callers.
+    ``on_progress(done, total)`` is called as chunks finish; raises SummaryError if any chunk fails,
+    without reading or submitting further chunks.
+    """
+    slots = slots or nullcontext()
+    total = len(chunks) if isinstance(chunks, Sized) else None
+
+    def summarize_chunk(index: int, chunk: str) -> str:
+        with slots:
+            return request_completion(client, build_chunk_prompt(chunk, index, total, video_title, channel_name, custom_prompt, cite_timestamps), models_to_try)
+
+    def record_failure(future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            failed.append(future)
+
+    def fail(future):
+        for pending in futures:
+            pending.cancel()
+        index = futures[future]
+        error = future.exception()
+        raise SummaryError(f"Could not process part {index + 1} of the transcript: {str(error)}") from error
+
+    with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_SUMMARY_WORKERS, total or CHUNK_SUMMARY_WORKERS))) as pool:
+        futures = {}
+        failed = []
+        try:
+            for index, chunk in enumerate(chunks):
+                # A bad model or key fails every part, so stop reading the transcript at the first failure
+                if failed:
+                    break
+                future = pool.submit(summarize_chunk, index + 1, chunk)
+                futures[future] = index
+                future.add_done_callback(record_failure)
+        except BaseException:
+            for pending in futures:
+                pending.cancel()
+            raise
+        if failed:
+            fail(failed[0])
+
+        results = [None] * len(futures)
+        on_progress = on_progress or (lambda done, total: None)
+        on_progress(0, len(futures))
+        for done, future in enumerate(as_completed(futures), 1):
+            if future.exception() is not None:
+                fail(future)
+            results[futures[future]] = future.result()
+            on_progress(done, len(futures))
+
+    return results
+
+
+def reduce_to_budget(client, text: str, budget: int, models_to_try: List[str], video_title=None, channel_name=None, custom_prompt=None, on_progress=None, cite_timestamps=False, slots=None) -> str:
+    """Map chunks to notes until the notes fit into a single reduce prompt of ``budget`` tokens"""
+    notes = text
+    for _ in range(MAX_REDUCE_ROUNDS):
+        if estimate_tokens(notes) <= budget:
+            break
+        partials = summarize_chunks(client, split_transcript(notes, budget), models_to_try, video_title, channel_name, custom_prompt, on_progress, cite_timestamps, slots)
+        notes = join_partial_summaries(partials)
+    return notes
+
+
+def summarize_long_text(text, model=DEFAULT_MODEL, video_title=None, channel_name=None, video_date=None, custom_prompt=None, available_models=None, on_text=None, context_lengths=None, hedge=False, on_status=None, on_hedge=None, on_progress=None, cite_timestamps=False) -> str:
+    """Summarize in one pass when the transcript fits the model, otherwise map-reduce over chunks
+
+    Callbacks are those of summarize_text() plus ``on_progress`` for the map step.
+    """
+    context_lengths = context_lengths or {}
+    budget = chunk_token_budget(context_lengths.get(model))
+    if estimate_tokens(text) <= budget:
+        return summarize_text(text, model, video_title, channel_name, video_date, custom_prompt, available_models, on_text, hedge, on_status, on_hedge, cite_timestamps)
+
+    client = get_openrouter_client(get_api_key())
+
+    # Only fall back to models whose context window can hold a full chunk
+    models_to_try = [model] + [
+        fallback_model for fallback_model in (available_models or [])
+        if fallback_model != model and chunk_token_budget(context_lengths.get(fallback_model)) >= budget
+    ]
+
+    notes = reduce_to_budget(client, text, budget, models_to_try, video_title, channel_name, custom_prompt, on_progress, cite_timestamps)
+    return summarize_text(notes, model, video_title, channel_name, video_date, custom_prompt, available_models, on_text, hedge, on_status, on_hedge, cite_timestamps)
+
+
+def join_partial_summaries(partials: List[str]) -> str:
+    """Label map-step outputs so the reduce prompt keeps their order"""
+    return "\n\n".join(
+        f"[Part {index}/{len(partials)}]\n{partial}" for index, partial in enumerate(partials, 1)
+    )
+
+
+def summarize_transcript(client, text, models_to_try: List[str], video_title=None, channel_name=None, custom_prompt=None, context_lengths=None, slots=None, cite_timestamps=False) -> str:
+    """Headless summary or answer: single pass when it fits, otherwise map-reduce; raises on failure
+
+    ``slots`` is an optional semaphore bounding how many completions run at once.
+    """
+    budget = chunk_token_budget((context_lengths or {}).get(models_to_try[0]))
+    notes = reduce_to_budget(client, text, budget, models_to_try, video_title, channel_name, custom_prompt, None, cite_timestamps, slots)
+    with slots or nullcontext():
+        return request_completion(client, build_prompt(notes, video_title, channel_name, custom_prompt, cite_timestamps), models_to_try)
+
+
+def summarize_stream(client, fragments: Iterable[str], models_to_try: List[str], video_title=None, channel_name=None, custom_prompt=None, context_lengths=None, slots=None) -> str:
+    """Headless summary or answer for a transcript that is still streaming in; raises on failure
+
+    A transcript that fits the model gets the usual single pass once it has been read. As soon as
+    the text outgrows one chunk, the map step starts on the chunks already complete while the
+    rest is still being read.
+    """
+    budget = chunk_token_budget((context_lengths or {}).get(models_to_try[0]))
+    fragments = iter(fragments)
+
+    # Buffer until the text is known to need more than one chunk
+    head, head_chars = [], 0
+    for fragment in fragments:
+        head.append(fragment)
+        head_chars += len(fragment) + 1
+        if head_chars > budget * CHARS_PER_TOKEN:
+            break
+    else:
+        return summarize_transcript(client, " ".join(head), models_to_try, video_title, channel_name, custom_prompt, context_lengths, slots)
+
+    partials = summarize_chunks(client, iter_chunks(chain(head, fragments), budget), models_to_try, video_title, channel_name, custom_prompt, slots=slots)
+    return summarize_transcript(client, join_partial_summaries(partials), models_to_try, video_title, channel_name, custom_prompt, context_lengths, slots)
@@ -0,0 +1,442 @@
+"""YouTube video IDs and transcript extraction through the Apify actor"""
+import inspect
+import os
+import re
+from collections import defaultdict, deque
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .cache import get_transcript_cache
+from .clients import get_apify_client
+from .jobs import CallAbandoned, get_single_flight
+from .library import TRANSCRIPT_LIBRARY, get_transcript_library
+from .metrics import StageTimer, get_metrics
+from .segments import SegmentedTranscript, get_transcript_segments, item_segments, remember_segments
+
+YOUTUBE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+YOUTUBE_PATH_PREFIXES = ("shorts", "embed", "live", "v", "e")
+
+
+def extract_video_id(youtube_url: str) -> Optional[str]:
+    """Parse the canonical 11-character video ID from any common YouTube URL form"""
+    if not youtube_url:
+        return None
+
+    candidate = youtube_url.strip()
+    if YOUTUBE_ID_PATTERN.match(candidate):
+        return candidate
+    if "://" not in candidate:
+        candidate = "https://" + candidate
+
+    parsed = urlparse(candidate)
+    host = (parsed.hostname or "").lower()
+    path_parts = [part for part in parsed.path.split("/") if part]
+
+    video_id = None
+    if host == "youtu.be" or host.endswith(".youtu.be"):
+        video_id = path_parts[0] if path_parts else None
+    elif host.endswith("youtube.com") or host.endswith("youtube-nocookie.com"):
+        query = parse_qs(parsed.query)
+        if query.get("v"):
+            video_id = query["v"][0]
+        elif len(path_parts) >= 2 and path_parts[0] in YOUTUBE_PATH_PREFIXES:
+            video_id = path_parts[1]
+
+    if video_id and YOUTUBE_ID_PATTERN.match(video_id):
+        return video_id
+    return None
+
+
+class TranscriptError(Exception):
+    """Raised when a video's transcript cannot be extracted; carries whatever metadata was found"""
+
+    def __init__(self, message: str, video_title: str = "YouTube Video", channel_name: str = "Unknown Channel", video_date: Optional[str] = None):
+        super().__init__(message)
+        self.video_title = video_title
+        self.channel_name = channel_name
+        self.video_date = video_date
+
+
+APIFY_ACTOR_ID = "dB9f4B02ocpTICIEY"
+# Dataset item fields that may identify which input URL an item came from
+ITEM_SOURCE_FIELDS = ("url", "videoUrl", "inputUrl", "startUrl", "sourceUrl", "videoId", "id")
+
+
+def _item_video_key(item: dict, known_keys) -> Optional[str]:
+    for field in ITEM_SOURCE_FIELDS:
+        value = item.get(field)
+        if isinstance(value, str) and value:
+            key = extract_video_id(value) or value
+            if key in known_keys:
+                return key
+    return None
+
+
+def clean_transcript(transcript_text: str) -> str:
+    """Collapse caption line breaks and repeated whitespace into plain text"""
+    return re.sub(r'\s+', ' ', transcript_text or "").strip()
+
+
+class TranscriptBuffer:
+    """Builds a transcript from cleaned fragments without copying the text on every append"""
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self.length = 0
+
+    def append(self, fragment: str) -> None:
+        if not fragment:
+            return
+        self.length += len(fragment) + (1 if self._parts else 0)
+        self._parts.append(fragment)
+
+    def getvalue(self) -> str:
+        # Join once and keep the result, so repeated reads stay cheap
+        if len(self._parts) > 1:
+            self._parts = [" ".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def __len__(self) -> int:
+        return self.length
+
+
+def iter_actor_items(youtube_urls: List[str], timestamps: bool = False) -> Iterator[dict]:
+    """Run the Apify actor and yield its dataset items as the pages are read; raises TranscriptError"""
+    # Reuse the shared ApifyClient for the API token from environment variable
+    client = get_apify_client(os.getenv("APIFY_API_TOKEN"))
+
+    # Prepare the Actor input
+    run_input = {
+        "startUrls": list(youtube_urls),
+        "language": "Default",
+        "includeTimestamps": "Yes" if timestamps else "No",
+    }
+
+    # Run the Actor and wait for it to finish; newer apify-client versions also forward the run log
+    # by default, which ends with a fixed multi-second sleep per run, so switch that off where supported
+    actor = client.actor(APIFY_ACTOR_ID)
+    call_options = {"logger": None} if "logger" in inspect.signature(actor.call).parameters else {}
+    metrics = get_metrics()
+    try:
+        with metrics.span("apify_actor_run"):
+            run = actor.call(run_input=run_input, **call_options)
+    except Exception as e:
+        metrics.count("yt_upstream_errors_total", service="apify", error_class=type(e).__name__)
+        raise
+
+    # Check if the run was successful (newer apify-client versions return a model instead of a dict)
+    dataset_id = run.get("defaultDatasetId") if isinstance(run, dict) else getattr(run, "default_dataset_id", None)
+    if not dataset_id:
+        metrics.count("yt_upstream_errors_total", service="apify", error_class="run_failed")
+        raise TranscriptError("Apify actor failed to process the video.")
+
+    # Only the time spent waiting on dataset pages counts towards the dataset stage
+    yield from metrics.timed_iter(client.dataset(dataset_id).iterate_items(), "apify_dataset")
+
+
+def read_item(item: dict, entry: Dict[str, object], timestamps: bool = False) -> List[str]:
+    """Record an item's metadata (and segments) in ``entry`` and return its cleaned text fragments"""
+    # Extract video title if available
+    if 'videoTitle' in item and item['videoTitle']:
+        entry["title"] = item['videoTitle']
+
+    # Extract channel name if available
+    if 'channelName' in item and item['channelName']:
+        entry["channel"] = item['channelName']
+
+    # Extract video date if available
+    if 'videoDate' in item and item['videoDate']:
+        entry["date"] = item['videoDate']
+
+    # Keep caption segments with their start times in timestamped mode
+    if timestamps:
+        entry["segments"].extend(item_segments(item))
+
+    # Extract transcript content, cleaning each item as it arrives
+    if isinstance(item.get('transcript'), str) and item['transcript']:
+        fragments = [item['transcript']]
+    elif isinstance(item.get('text'), str) and item['text']:
+        fragments = [item['text']]
+    else:
+        # Captions may also come as a list of segments
+        fragments = [segment[2] for segment in item_segments(item)]
+    return [fragment for fragment in map(clean_transcript, fragments) if fragment]
+
+
+def new_entry() -> Dict[str, object]:
+    return {"buffer": TranscriptBuffer(), "segments": [], "title": None, "channel": None, "date": None}
+
+
+def run_transcript_actor_bulk(youtube_urls: List[str], timestamps: bool = False) -> Dict[str, object]:
+    """Extract many videos in one Apify actor run
+
+    Returns a dict mapping every input URL to either a (transcript, title, channel, date,
+    segments) tuple or the TranscriptError explaining why that video failed. The transcript is
+    already cleaned; ``segments`` lists (start, end, text) caption segments and is only filled
+    with ``timestamps``.
+    """
+    # Several input URLs may point at the same video, so collect items per video ID
+    urls_by_video = defaultdict(list)
+    for url in youtube_urls:
+        urls_by_video[extract_video_id(url) or url].append(url)
+    collected = {key: new_entry() for key in urls_by_video}
+    only_key = next(iter(collected)) if len(collected) == 1 else None
+
+    # Fetch and process results
+    cleanup = StageTimer("transcript_cleanup")
+    try:
+        for item in iter_actor_items(youtube_urls, timestamps):
+            key = _item_video_key(item, collected) or only_key
+            if key is None:
+                continue
+            entry = collected[key]
+            with cleanup:
+                fragments = read_item(item, entry, timestamps)
+            for fragment in fragments:
+                entry["buffer"].append(fragment)
+    except TranscriptError as e:
+        return {url: e for url in youtube_urls}
+    cleanup.record()
+
+    results = {}
+    for key, entry in collected.items():
+        transcript_text = entry["buffer"].getvalue()
+        video_title = entry["title"] or "YouTube Video"
+        channel_name = entry["channel"] or "Unknown Channel"
+        if transcript_text:
+            result = (transcript_text, video_title, channel_name, entry["date"], entry["segments"])
+        else:
+            result = TranscriptError("No transcript found in the video.", video_title, channel_name, entry["date"])
+        for url in urls_by_video[key]:
+            results[url] = result
+    return results
+
+
+def remember_transcript(video_id: str, transcript: str, title: str, channel: str, date: Optional[str]) -> None:
+    """Cache a freshly extracted transcript and add it to the searchable library"""
+    get_transcript_cache().put(video_id, transcript, title, channel, date)
+    if TRANSCRIPT_LIBRARY:
+        get_transcript_library().add(video_id, transcript, title, channel, date)
+
+
+def cached_transcript(video_id: str) -> Optional[Dict[str, str]]:
+    """A video's transcript from the shared cache or, once it expired there, from the library"""
+    cached = get_transcript_cache().get(video_id)
+    if cached is None and TRANSCRIPT_LIBRARY:
+        cached = get_transcript_library().get(video_id)
+        if cached:
+            get_transcript_cache().put(video_id, cached['transcript'], cached['title'], cached['channel'], cached['date'])
+    return cached
+
+
+def load_transcripts(youtube_urls: List[str], timestamps: bool = False) -> Dict[str, object]:
+    """Load many transcripts, extracting every cache miss in a single Apify run
+
+    Maps each URL to a (transcript, title, channel, date) tuple or a TranscriptError. With
+    ``timestamps``, videos are also extracted with caption start times, which are kept for
+    get_transcript_segments(); a cached transcript without segments counts as a miss.
+    """
+    results = {}
+    misses = []
+
+    # Serve from the shared cache (or library) when any session already extracted a video
+    for url in youtube_urls:
+        video_id = extract_video_id(url)
+        cached = cached_transcript(video_id) if video_id else None
+        if cached and (not timestamps or get_transcript_segments(video_id) is not None):
+            results[url] = (cached['transcript'], cached['title'], cached['channel'], cached['date'])
+        else:
+            misses.append(url)
+    if not misses:
+        return results
+
+    # Videos another session is already extracting are awaited instead of extracted again
+    single_flight = get_single_flight()
+    kind = "transcript+timestamps" if timestamps else "transcript"
+    claims = {}
+    for url in misses:
+        claims[url] = single_flight.claim(kind, extract_video_id(url) or url)
+    leaders = [url for url, (future, leader) in claims.items() if leader]
+
+    released = set()
+    try:
+        extracted_by_url = run_transcript_actor_bulk(leaders, timestamps) if leaders else {}
+
+        # Extract transcript, title, channel, and date using Apify
+        for url in leaders:
+            extracted = extracted_by_url.get(url, TranscriptError("Apify returned no result for this video."))
+            if not isinstance(extracted, TranscriptError):
+                transcript_text, video_title, channel_name, video_date, segment_list = extracted
+                video_id = extract_video_id(url)
+
+                # Timestamped captions give the plain text too; otherwise it was cleaned while read
+                segments = SegmentedTranscript.from_segments(segment_list) if segment_list else None
+                transcript = segments.text if segments else transcript_text
+                if not transcript:
+                    extracted = TranscriptError("No transcript found in the video.", video_title, channel_name, video_date)
+                else:
+                    if video_id:
+                        remember_transcript(video_id, transcript, video_title, channel_name, video_date)
+                    if video_id and timestamps:
+                        # Remember even an empty result so videos without timed captions aren't extracted again
+                        remember_segments(video_id, segments or SegmentedTranscript.from_segments([]))
+                    extracted = (transcript, video_title, channel_name, video_date)
+            single_flight.release(kind, extract_video_id(url) or url, claims[url][0], extracted)
+            released.add(url)
+    except BaseException as e:
+        # Sessions waiting for these videos would otherwise block forever
+        for url in leaders:
+            if url not in released:
+                single_flight.release(kind, extract_video_id(url) or url, claims[url][0], error=e)
+        raise
+
+    for url, (future, leader) in claims.items():
+        try:
+            results[url] = future.result()
+        except CallAbandoned:
+            # The session extracting it stopped; extract it here instead
+            results[url] = load_transcripts([url], timestamps)[url]
+
+    return results
+
+
+def load_transcript(youtube_url, timestamps: bool = False):
+    """Return (transcript, title, channel, date) from the shared cache or Apify; raises TranscriptError"""
+    result = load_transcripts([youtube_url], timestamps)[youtube_url]
+    if isinstance(result, TranscriptError):
+        raise result
+    return result
+
+
+class TranscriptStream:
+    """One video's cleaned transcript fragments, yielded as the Apify dataset is read
+
+    Metadata is known as soon as the stream is open. Once the fragments are exhausted (or the
+    stream is closed), the transcript is cached and shared with sessions waiting for the video.
+    """
+
+    def __init__(self, youtube_url: str, items: Iterator[dict], claim=None):
+        self.url = youtube_url
+        self._items = items
+        self._claim = claim
+        self._entry = new_entry()
+        self._pending = deque()
+        self._exhausted = False
+        self._cleanup = StageTimer("transcript_cleanup")
+        # Read up to the first text so the title and channel are known before any prompt is built
+        self._read_more()
+
+    @classmethod
+    def complete(cls, youtube_url: str, transcript: str, title: str, channel: str, date: Optional[str]) -> "TranscriptStream":
+        """A stream over a transcript that is already loaded"""
+        stream = cls(youtube_url, iter([{"videoTitle": title, "channelName": channel, "videoDate": date}]))
+        stream._entry["buffer"].append(transcript)
+        stream._pending.append(transcript)
+        return stream
+
+    @property
+    def title(self) -> str:
+        return self._entry["title"] or "YouTube Video"
+
+    @property
+    def channel(self) -> str:
+        return self._entry["channel"] or "Unknown Channel"
+
+    @property
+    def date(self) -> Optional[str]:
+        return self._entry["date"]
+
+    def _read_more(self) -> bool:
+        """Read items until one has text; False once the dataset is exhausted"""
+        try:
+            for item in self._items:
+                with self._cleanup:
+                    fragments = read_item(item, self._entry)
+                for fragment in fragments:
+                    self._entry["buffer"].append(fragment)
+                    self._pending.append(fragment)
+                if fragments:
+                    return True
+        except BaseException as e:
+            self._release(e)
+            raise
+        self._exhausted = True
+        if self._claim is not None:
+            self._cleanup.record()
+        self._release()
+        return False
+
+    def __iter__(self) -> Iterator[str]:
+        while self._pending or (not self._exhausted and self._read_more()):
+            yield self._pending.popleft()
+        if not self._entry["buffer"]:
+            raise TranscriptError("No transcript found in the video.", self.title, self.channel, self.date)
+
+    def _release(self, error: Optional[BaseException] = None) -> None:
+        """Cache the finished transcript and hand the outcome to sessions waiting for this video"""
+        if self._claim is None:
+            return
+        future, video_id = self._claim
+        self._claim = None
+        single_flight = get_single_flight()
+        transcript = self._entry["buffer"].getvalue()
+        if error is None and not transcript:
+            error = TranscriptError("No transcript found in the video.", self.title, self.channel, self.date)
+
+        if error is None:
+            try:
+                if video_id:
+                    remember_transcript(video_id, transcript, self.title, self.channel, self.date)
+            finally:
+                # A failed cache write must not leave waiting sessions blocked; they still get the text
+                single_flight.release("transcript", video_id or self.url, future, (transcript, self.title, self.channel, self.date))
+        elif isinstance(error, TranscriptError):
+            single_flight.release("transcript", video_id or self.url, future, error)
+        else:
+            single_flight.release("transcript", video_id or self.url, future, error=error)
+
+    @property
+    def text(self) -> str:
+        """The whole transcript, reading whatever the dataset still holds"""
+        while not self._exhausted:
+            self._read_more()
+        self._pending.clear()
+        return self._entry["buffer"].getvalue()
+
+    def result(self):
+        """(transcript, title, channel, date), like load_transcript(); raises TranscriptError"""
+        transcript = self.text
+        if not transcript:
+            raise TranscriptError("No transcript found in the video.", self.title, self.channel, self.date)
+        return transcript, self.title, self.channel, self.date
+
+    def close(self) -> None:
+        """Finish reading so the transcript is cached even when the consumer stopped early"""
+        try:
+            self.text
+        except Exception:
+            pass
+
+
+def open_transcript(youtube_url: str) -> TranscriptStream:
+    """Stream a video's transcript: served whole from the shared cache, or fragment by fragment from Apify
+
+    Raises TranscriptError (possibly only once the stream is iterated).
+    """
+    video_id = extract_video_id(youtube_url)
+    cached = cached_transcript(video_id) if video_id else None
+    if cached:
+        return TranscriptStream.complete(youtube_url, cached['transcript'], cached['title'], cached['channel'], cached['date'])
+
+    # Another session is already extracting this video, so wait for its transcript
+    future, leader = get_single_flight().claim("transcript", video_id or youtube_url)
+    if not leader:
+        try:
+            result = future.result()
+        except CallAbandoned:
+            return open_transcript(youtube_url)
+        if isinstance(result, TranscriptError):
+            raise result
+        return TranscriptStream.complete(youtube_url, *result)
+
+    return TranscriptStream(youtube_url, iter_actor_items([youtube_url]), (future, video_id))